@@ -0,0 +1,163 @@
+"""
+Circuit breaker for calls to remote TTS providers.
+
+Outcomes of recent calls are kept in a rolling time window. Once the window
+holds enough calls and either the error rate or the share of slow calls
+crosses its threshold, the breaker opens and calls fail immediately with
+CircuitOpenError, so callers can fall back to cached or local audio instead
+of waiting on timeouts. After a cooldown the breaker is half-open: a single
+probe call is let through, and its outcome closes or re-opens the breaker.
+Calls that started before the breaker opened may finish while the probe is
+in flight; their outcomes are counted but do not change the state.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Rolling-window breaker on error rate and slow-call rate"""
+
+    def __init__(self, name: str, window_seconds: float = 30, min_calls: int = 5,
+                 error_threshold: float = 0.5, slow_call_seconds: float = 10,
+                 slow_threshold: float = 0.5, cooldown_seconds: float = 15):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (finished at, failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0}
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, int(self._opened_at + self.cooldown_seconds - now + 0.999))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> bool:
+        """
+        Claim permission to call the provider, or raise CircuitOpenError.
+        Returns True when the call is the half-open probe.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            raise CircuitOpenError(f'{self.name} circuit is open', self._retry_after(now))
+
+    def record(self, failed: bool, seconds: float, probe: bool = False):
+        """Record the outcome of a call allowed by before_call, passing on its probe flag"""
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['failures'] += failed
+            self._stats['slow_calls'] += slow
+            if self._state == HALF_OPEN:
+                if not probe:
+                    return  # A straggler from before the breaker opened
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                return
+            if self._state == OPEN:
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _at, f, _s in self._calls if f)
+            slow_calls = sum(1 for _at, _f, s in self._calls if s)
+            if failures / total >= self.error_threshold or slow_calls / total >= self.slow_threshold:
+                self._open(now)
+
+    def release(self, probe: bool):
+        """
+        Give back a call allowed by before_call without recording an outcome,
+        e.g. when it was cancelled; a cancelled call says nothing about the
+        provider's health
+        """
+        if probe:
+            with self._lock:
+                self._probe_in_flight = False
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self._stats['opened'] += 1
+
+    def stats(self) -> dict:
+        state = self.state
+        with self._lock:
+            return dict(self._stats, state=state, window_calls=len(self._calls))
+
+
+# One breaker per provider, shared by everything in this process
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _settings_from_env() -> dict:
+    return {
+        'window_seconds': float(os.getenv('TTS_BREAKER_WINDOW_SECONDS', 30)),
+        'min_calls': int(os.getenv('TTS_BREAKER_MIN_CALLS', 5)),
+        'error_threshold': float(os.getenv('TTS_BREAKER_ERROR_RATE', 0.5)),
+        'slow_call_seconds': float(os.getenv('TTS_BREAKER_SLOW_SECONDS', 10)),
+        'slow_threshold': float(os.getenv('TTS_BREAKER_SLOW_RATE', 0.5)),
+        'cooldown_seconds': float(os.getenv('TTS_BREAKER_COOLDOWN_SECONDS', 15)),
+    }
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    """Return the shared breaker for a provider, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **_settings_from_env())
+        return breaker
+
+
+def breaker_stats() -> dict:
+    with _breakers_lock:
+        return {name: breaker.stats() for name, breaker in _breakers.items()}
@@ -0,0 +1,211 @@
+"""
+Declarative MongoDB index registry.
+
+Every index the hot query paths depend on is listed in INDEXES, next to the
+query it serves. ensure_indexes() creates whatever is missing and runs at
+startup; an index that already exists with the same definition is left
+alone, so it is cheap to repeat.
+
+Indexes that exist under the registered name but with a different
+definition (other keys, lost unique flag, ...) are reported as drift and not
+touched, because rebuilding an index on a live collection is an operator
+decision. Indexes on registered collections that are not in the registry are
+reported as unmanaged. The TTS store manages its own indexes (see
+TTSResultStore.ensure_indexes).
+
+Usage:
+    python db_indexes.py [--check] [--progress-interval 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+
+class IndexSpec:
+    """One index: collection, key pattern and the options that matter for drift"""
+
+    def __init__(self, collection: str, keys: Sequence[Tuple[str, int]], unique: bool = False,
+                 partial: Optional[Dict[str, Any]] = None, serves: str = ""):
+        self.collection = collection
+        self.keys = list(keys)
+        self.unique = unique
+        self.partial = partial
+        self.serves = serves  # The query this index exists for, shown in reports
+        self.name = "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def options(self) -> Dict[str, Any]:
+        options = {"name": self.name, "unique": self.unique}
+        if self.partial:
+            options["partialFilterExpression"] = self.partial
+        return options
+
+
+INDEXES = [
+    IndexSpec("users", [("id", ASCENDING)], unique=True,
+              serves='get_current_user: users.find_one({"id"}) on every authenticated request'),
+    IndexSpec("users", [("email", ASCENDING)], unique=True,
+              serves='users.find_one({"email"}) at register and login'),
+    IndexSpec("courses", [("id", ASCENDING)], unique=True,
+              serves='courses.find_one({"id"})'),
+    IndexSpec("lessons", [("id", ASCENDING)], unique=True,
+              serves='lessons.find_one({"id"})'),
+    IndexSpec("lessons", [("course_id", ASCENDING), ("order", ASCENDING)],
+              serves='lessons.find({"course_id"}).sort("order")'),
+]
+
+
+def _normalize_keys(keys) -> List[Tuple[str, Any]]:
+    # index_information() reports directions as floats (1.0)
+    return [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys]
+
+
+def _drift(spec: IndexSpec, live: Dict[str, Any]) -> List[str]:
+    """Differences between a registered index and the live one with the same name"""
+    problems = []
+    if _normalize_keys(live["key"]) != spec.keys:
+        problems.append(f"keys {_normalize_keys(live['key'])} != {spec.keys}")
+    if bool(live.get("unique")) != spec.unique:
+        problems.append(f"unique={bool(live.get('unique'))}, expected {spec.unique}")
+    if live.get("partialFilterExpression") != spec.partial:
+        problems.append(f"partialFilterExpression={live.get('partialFilterExpression')}, expected {spec.partial}")
+    return problems
+
+
+async def check_indexes(db, indexes: Sequence[IndexSpec] = INDEXES) -> List[Dict[str, Any]]:
+    """
+    Compare the registry with the database without changing anything.
+    Returns one entry per index with status ok, missing, drift or unmanaged.
+    """
+    report = []
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in indexes:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection_name, specs in by_collection.items():
+        live_indexes = await db[collection_name].index_information()
+        for spec in specs:
+            entry = {"collection": collection_name, "name": spec.name, "serves": spec.serves}
+            live = live_indexes.get(spec.name)
+            if live is None:
+                entry["status"] = "missing"
+            else:
+                problems = _drift(spec, live)
+                entry["status"] = "drift" if problems else "ok"
+                if problems:
+                    entry["detail"] = "; ".join(problems)
+            report.append(entry)
+
+        registered = {spec.name for spec in specs}
+        for name in live_indexes:
+            if name != "_id_" and name not in registered:
+                report.append({"collection": collection_name, "name": name, "status": "unmanaged"})
+    return report
+
+
+async def index_builds_in_progress(db) -> List[str]:
+    """Describe index builds currently running on the server (from currentOp)"""
+    try:
+        result = await db.client.admin.command("currentOp", {
+            "$or": [{"command.createIndexes": {"$exists": True}}, {"msg": {"$regex": "^Index Build"}}]
+        })
+    except OperationFailure:
+        return []  # currentOp needs the inprog privilege
+    builds = []
+    for op in result.get("inprog", []):
+        progress = op.get("progress") or {}
+        namespace = op.get("ns", "?")
+        if progress.get("total"):
+            builds.append(f"{namespace}: {op.get('msg', 'building')} "
+                          f"({progress.get('done', 0)}/{progress['total']})")
+        else:
+            builds.append(f"{namespace}: {op.get('msg', 'building')}")
+    return builds
+
+
+async def _watch_builds(db, interval: float, log):
+    while True:
+        await asyncio.sleep(interval)
+        for line in await index_builds_in_progress(db):
+            log(f"Index build in progress: {line}")
+
+
+async def ensure_indexes(db, indexes: Sequence[IndexSpec] = INDEXES, progress_interval: float = 0, log=print):
+    """
+    Create missing registry indexes and return the check_indexes() report with
+    the outcome of each build. Builds that fail (e.g. duplicate emails block a
+    unique index) are reported as failed instead of raising.
+    """
+    report = await check_indexes(db, indexes)
+    specs = {(spec.collection, spec.name): spec for spec in indexes}
+
+    for entry in report:
+        if entry["status"] == "drift":
+            log(f"Index drift on {entry['collection']}.{entry['name']}: {entry['detail']}")
+        if entry["status"] != "missing":
+            continue
+
+        spec = specs[(entry["collection"], entry["name"])]
+        log(f"Building index {spec.collection}.{spec.name} for {spec.serves}")
+        watcher = asyncio.create_task(_watch_builds(db, progress_interval, log)) if progress_interval > 0 else None
+        started = time.monotonic()
+        try:
+            await db[spec.collection].create_index(spec.keys, **spec.options())
+            entry["status"] = "created"
+            log(f"Built {spec.collection}.{spec.name} in {time.monotonic() - started:.1f}s")
+        except OperationFailure as e:
+            entry["status"] = "failed"
+            entry["detail"] = str(e)
+            log(f"Could not build {spec.collection}.{spec.name}: {e}")
+        finally:
+            if watcher:
+                watcher.cancel()
+    return report
+
+
+def print_report(report):
+    for entry in report:
+        line = f"{entry['status']:>9}  {entry['collection']}.{entry['name']}"
+        if entry.get("detail"):
+            line += f"  ({entry['detail']})"
+        print(line)
+
+
+async def run(check: bool, progress_interval: float) -> bool:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    try:
+        if check:
+            report = await check_indexes(db)
+        else:
+            report = await ensure_indexes(db, progress_interval=progress_interval)
+        print()
+        print_report(report)
+        return not any(entry["status"] in ("missing", "drift", "failed") for entry in report)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or check the MongoDB index registry")
+    parser.add_argument("--check", action="store_true", help="Only report missing and drifted indexes")
+    parser.add_argument("--progress-interval", type=float, default=5,
+                        help="Seconds between build progress reports (0 to disable)")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args.check, args.progress_interval))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-request deadline budget.
+
+The HTTP middleware in server.py starts a budget for every request (the
+``X-Request-Timeout`` header in seconds, capped by
+``REQUEST_DEADLINE_MAX_SECONDS``, or ``REQUEST_DEADLINE_SECONDS`` by default)
+and keeps it in a context variable. Code further down asks for what is left:
+
+- Mongo operations run inside ``pymongo.timeout()``, so the driver sends the
+  remaining budget as ``maxTimeMS`` with every command
+- TTS waits (admission queue, provider call, another worker's synthesis)
+  are capped at ``remaining()``
+
+Once the budget runs out, DeadlineExceeded is raised. It subclasses
+asyncio.TimeoutError, so the existing timeout handling answers with 504.
+"""
+import asyncio
+import os
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when the current request's deadline budget is used up"""
+
+
+def request_budget(header_value: Optional[str]) -> float:
+    """Seconds of budget for a request, from its timeout header or the default"""
+    default = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 30))
+    ceiling = float(os.environ.get("REQUEST_DEADLINE_MAX_SECONDS", 60))
+    try:
+        budget = float(header_value) if header_value else default
+    except ValueError:
+        budget = default
+    return min(max(budget, 0.1), ceiling)
+
+
+def start_deadline(seconds: float):
+    """Start a budget for the current context; returns a token for reset_deadline"""
+    return _deadline.set(asyncio.get_running_loop().time() + seconds)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None outside a request"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+def cap(timeout: Optional[float]) -> Optional[float]:
+    """Shrink a timeout to the remaining budget; raise if nothing is left"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+async def within_deadline(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Await with the smaller of `timeout` and the remaining budget"""
+    try:
+        limit = cap(timeout)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()  # never started; avoid the "never awaited" warning
+        raise
+    if limit is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=limit)
+    except asyncio.TimeoutError:
+        if timeout is not None and limit >= timeout:
+            raise
+        raise DeadlineExceeded("Request deadline exceeded")
@@ -0,0 +1,91 @@
+"""
+Request hedging for remote TTS providers.
+
+When hedging is on (TTS_HEDGING=true), a provider call that has not
+finished by the TTS_HEDGE_PERCENTILE latency of recent calls gets a second,
+identical call, and whichever finishes first wins. Hedges are capped at
+TTS_HEDGE_BUDGET of all calls, so a slow provider can raise our spend by at
+most that fraction. The percentile is only trusted once enough calls have
+been seen, and never drops below TTS_HEDGE_MIN_DELAY_SECONDS.
+"""
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class Hedger:
+    """Tracks provider latency, decides when to hedge and counts outcomes"""
+
+    def __init__(self, name: str, percentile: float = 95, budget: float = 0.05,
+                 min_delay: float = 0.5, min_samples: int = 20, window: int = 200):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'primary_wins': 0, 'over_budget': 0}
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a new call, or None to not hedge"""
+        with self._lock:
+            self._stats['calls'] += 1
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+            return max(self.min_delay, ordered[index])
+
+    def try_hedge(self) -> bool:
+        """Claim budget for one hedge; False once hedges would exceed the budget"""
+        with self._lock:
+            if self._stats['hedged'] + 1 > self.budget * self._stats['calls']:
+                self._stats['over_budget'] += 1
+                return False
+            self._stats['hedged'] += 1
+            return True
+
+    def record_latency(self, seconds: float):
+        """Record how long a successful provider call took"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_winner(self, hedge_won: bool):
+        with self._lock:
+            self._stats['hedge_wins' if hedge_won else 'primary_wins'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, samples=len(self._latencies))
+
+
+# One hedger per provider, shared by everything in this process
+_hedgers: Dict[str, Hedger] = {}
+_hedgers_lock = threading.Lock()
+
+
+def hedging_enabled() -> bool:
+    return os.getenv('TTS_HEDGING', 'false').lower() in ('1', 'true', 'yes')
+
+
+def hedger_for(name: str) -> Optional[Hedger]:
+    """Return the shared hedger for a provider, or None when hedging is off"""
+    if not hedging_enabled():
+        return None
+    with _hedgers_lock:
+        hedger = _hedgers.get(name)
+        if hedger is None:
+            hedger = _hedgers[name] = Hedger(
+                name,
+                percentile=float(os.getenv('TTS_HEDGE_PERCENTILE', 95)),
+                budget=float(os.getenv('TTS_HEDGE_BUDGET', 0.05)),
+                min_delay=float(os.getenv('TTS_HEDGE_MIN_DELAY_SECONDS', 0.5)),
+            )
+        return hedger
+
+
+def hedger_stats() -> dict:
+    with _hedgers_lock:
+        return {name: hedger.stats() for name, hedger in _hedgers.items()}
@@ -0,0 +1,104 @@
+"""
+Helpers for joining MP3 clips without re-encoding.
+
+Independently synthesized clips are sequences of MPEG frames, optionally
+wrapped in ID3 tags. Stripping the tags leaves bare frames that can be
+concatenated into one playable stream. A leading Xing/Info/VBRI frame only
+describes its own clip (frame count, duration, seek table), so it is dropped
+too; otherwise players would stop or mis-seek after the first clip.
+"""
+from typing import Iterable, Optional
+
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and MPEG-2/2.5
+_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def strip_id3(data: bytes) -> bytes:
+    """Remove a leading ID3v2 tag and a trailing ID3v1 tag, if present"""
+    start = 0
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = ((data[6] & 0x7f) << 21) | ((data[7] & 0x7f) << 14) | ((data[8] & 0x7f) << 7) | (data[9] & 0x7f)
+        start = 10 + size + (10 if data[5] & 0x10 else 0)  # 0x10 = footer present
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    return data[start:end]
+
+
+def frame_info(data: bytes, offset: int = 0) -> Optional[dict]:
+    """Parse the MPEG Layer III frame header at `offset`, or return None"""
+    if len(data) < offset + 4 or data[offset] != 0xff or data[offset + 1] & 0xe0 != 0xe0:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    mono = b3 >> 6 == 3
+    return {
+        'version': version,
+        'mpeg1': mpeg1,
+        'sample_rate': sample_rate,
+        'mono': mono,
+        'crc': not (b1 & 1),
+        'channel_byte': b3,
+        'rate_index': rate_index,
+        'length': (144 if mpeg1 else 72) * _BITRATES[mpeg1][bitrate_index] * 1000 // sample_rate + ((b2 >> 1) & 1),
+        'samples': 1152 if mpeg1 else 576,
+    }
+
+
+def _drop_vbr_header(data: bytes) -> bytes:
+    """Remove a leading Xing/Info/VBRI frame, if present"""
+    info = frame_info(data)
+    if info is None:
+        return data
+    side_info = (17 if info['mono'] else 32) if info['mpeg1'] else (9 if info['mono'] else 17)
+    xing_at = 4 + (2 if info['crc'] else 0) + side_info
+    if data[xing_at:xing_at + 4] in (b'Xing', b'Info') or data[36:40] == b'VBRI':
+        return data[info['length']:]
+    return data
+
+
+def concat_mp3(segments: Iterable[bytes]) -> bytes:
+    """Concatenate MP3 clips into a single stream"""
+    return b''.join(_drop_vbr_header(strip_id3(segment)) for segment in segments)
+
+
+# One MPEG-1 Layer III frame (32 kbps, 44.1 kHz, mono) whose all-zero side
+# information decodes to 1152 samples of silence
+_SILENT_FRAME = b'\xff\xfb\x10\xc0' + bytes(100)
+FRAME_SECONDS = 1152 / 44100
+
+
+def silent_mp3(seconds: float) -> bytes:
+    """Return a valid MP3 stream of silence lasting roughly `seconds`"""
+    return _SILENT_FRAME * max(1, round(seconds / FRAME_SECONDS))
+
+
+def silence_like(clip: bytes, seconds: float) -> bytes:
+    """
+    Return silence in the same MPEG version, sample rate and channel mode as
+    `clip`, so it can sit between clips without a format switch mid-stream.
+    """
+    data = strip_id3(clip)
+    info = frame_info(data)
+    if info is None:
+        return silent_mp3(seconds)
+    # Lowest bitrate, no CRC, no padding; all-zero side info decodes to silence
+    header = bytes([
+        0xff,
+        0xe0 | (info['version'] << 3) | (1 << 1) | 1,
+        (1 << 4) | (info['rate_index'] << 2),
+        info['channel_byte'],
+    ])
+    length = (144 if info['mpeg1'] else 72) * _BITRATES[info['mpeg1']][1] * 1000 // info['sample_rate']
+    frame = header + bytes(length - 4)
+    return frame * max(1, round(seconds * info['sample_rate'] / info['samples']))
@@ -0,0 +1,110 @@
+"""
+Password hashing off the event loop.
+
+A bcrypt hash or verify takes a few hundred milliseconds of CPU. Run inline
+in an async handler it stalls every other request on the worker, so a login
+burst at the start of class would freeze course and TTS requests too.
+
+HashingPool runs these calls on a dedicated thread pool of ``workers``
+threads (bcrypt releases the GIL while hashing). At most ``max_queue`` more
+calls may wait for a thread; beyond that, callers get PasswordHashingBusyError
+at once, which the auth endpoints turn into 503 + Retry-After. Waiting is
+also bounded by the request deadline. stats() reports queue depth and wait
+times.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from deadlines import within_deadline
+
+
+class PasswordHashingBusyError(RuntimeError):
+    """Raised when the hashing queue is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Bounded thread pool with a bounded queue for CPU-heavy password work"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+        self._avg_wait = 0.0
+        self._max_wait = 0.0
+        self._avg_seconds = 0.25  # Moving average of one hash/verify, for Retry-After
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained"""
+        return max(1, math.ceil((self.queued + 1) * self._avg_seconds / self.workers))
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) on the pool and return its result"""
+        if self.queued + self.active >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHashingBusyError("Too many sign-ins in progress", self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        state = {"started": False}
+
+        def call():
+            # Counters are only touched on the event loop thread
+            started = time.monotonic()
+            loop.call_soon_threadsafe(self._on_start, started - submitted, state)
+            try:
+                return fn(*args)
+            finally:
+                loop.call_soon_threadsafe(self._on_finish, time.monotonic() - started)
+
+        future = loop.run_in_executor(self._executor, call)
+        try:
+            return await within_deadline(future)
+        finally:
+            if not state["started"]:
+                # Gave up while queued (wait_for cancels the call if it has not begun)
+                state["abandoned"] = True
+                self.queued -= 1
+
+    def _on_start(self, waited: float, state: dict):
+        state["started"] = True
+        if not state.get("abandoned"):
+            self.queued -= 1
+        self.active += 1
+        self._avg_wait = 0.8 * self._avg_wait + 0.2 * waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def _on_finish(self, seconds: float):
+        self.active -= 1
+        self.completed += 1
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._avg_wait * 1000, 1),
+            "max_wait_ms": round(self._max_wait * 1000, 1),
+            "avg_run_ms": round(self._avg_seconds * 1000, 1),
+        }
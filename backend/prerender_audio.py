@@ -0,0 +1,163 @@
+"""
+Pre-render lesson and quiz audio into the shared TTS store.
+
+Walks the lessons and quizzes collections, synthesizes every text field in
+its own language through a bounded worker pool and pins the result in the
+tts_cache collection under its content hash. A field whose text has not
+changed since the last run hashes to an entry that already exists, so only
+new or edited fields are sent to the provider. Entries pinned by an earlier
+run with the same voice and speed whose text is gone (an edited or deleted
+field) are unpinned and left to expire.
+
+Usage:
+    python prerender_audio.py [--workers 4] [--voice alloy] [--speed 1.0] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from tts_engines import engine_for
+from tts_service import DEFAULT_VOICE, resolve_voice, stop_tts_engines, synthesize_chunked, tts_key
+from tts_store import TTSResultStore, normalize_text
+
+# (field, language) pairs rendered for every lesson document
+LESSON_FIELDS = [
+    ("title", "en"),
+    ("title_tamil", "ta"),
+    ("description", "en"),
+    ("description_tamil", "ta"),
+    ("content_text", "en"),
+    ("content_text_tamil", "ta"),
+]
+
+
+def lesson_texts(lesson):
+    """Yield (field, language, text) for every speakable lesson field"""
+    for field, language in LESSON_FIELDS:
+        yield field, language, lesson.get(field)
+    for i, transcription in enumerate(lesson.get("transcriptions") or []):
+        yield f"transcriptions.{i}", transcription.get("language", "en"), transcription.get("text")
+
+
+def quiz_texts(quiz):
+    """Yield (field, language, text) for a quiz title, questions and options"""
+    yield "title", "en", quiz.get("title")
+    for i, question in enumerate(quiz.get("questions") or []):
+        yield f"questions.{i}.question", "en", question.get("question")
+        yield f"questions.{i}.questionTamil", "ta", question.get("questionTamil")
+        for j, option in enumerate(question.get("options") or []):
+            if isinstance(option, dict):
+                yield f"questions.{i}.options.{j}", "en", option.get("text")
+                yield f"questions.{i}.options.{j}.textTamil", "ta", option.get("textTamil")
+            else:
+                yield f"questions.{i}.options.{j}", "en", option
+
+
+async def collect_jobs(db, voice, speed):
+    """Build one render job per distinct content hash"""
+    jobs = {}
+    sources = [("lessons", lesson_texts), ("quizzes", quiz_texts)]
+    for collection_name, extract in sources:
+        async for doc in db[collection_name].find():
+            doc_id = doc.get("id") or str(doc["_id"])
+            for field, language, text in extract(doc):
+                if not isinstance(text, str) or not normalize_text(text):
+                    continue
+                if len(text) > 4096:
+                    print(f"   ⚠️  Skipping {collection_name}/{doc_id}/{field}: longer than 4096 chars")
+                    continue
+                job_voice = resolve_voice(language, voice)
+                key = tts_key(text, language, job_voice, speed)
+                jobs.setdefault(key, {
+                    "key": key,
+                    "text": text,
+                    "language": language,
+                    "voice": job_voice,
+                    "source": f"{collection_name}/{doc_id}/{field}",
+                })
+    return list(jobs.values())
+
+
+def pin_set_for(voice, speed):
+    """Name of the pin set shared by every run with this voice and speed"""
+    return f"prerender:{voice.lower()}:{speed:.2f}"
+
+
+async def render_job(store, job, speed, pin_set, semaphore, counts, dry_run):
+    """Render one job unless its content hash is already stored"""
+    async with semaphore:
+        exists = await store.contains(job["key"]) if dry_run else await store.pin(job["key"], pin_set)
+        if exists:
+            counts["unchanged"] += 1
+            return
+        if dry_run:
+            print(f"   Would render {job['source']} ({job['language']})")
+            counts["rendered"] += 1
+            return
+        try:
+            audio = await synthesize_chunked(
+                engine_for(job["language"]), job["text"], job["language"], job["voice"], speed, store=store
+            )
+            await store.put(
+                job["key"], audio, pinned=True, pin_set=pin_set,
+                language=job["language"], source=job["source"]
+            )
+            counts["rendered"] += 1
+            print(f"   ✅ Rendered {job['source']} ({job['language']}, {len(audio)} bytes)")
+        except Exception as e:
+            counts["failed"] += 1
+            print(f"   ❌ Failed {job['source']}: {str(e)}")
+
+
+async def prerender(workers, voice, speed, dry_run):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    store = TTSResultStore(
+        db.tts_cache,
+        ttl_seconds=int(os.environ.get('TTS_CACHE_TTL_SECONDS', 30 * 24 * 3600)),
+        max_entries=int(os.environ.get('TTS_CACHE_MAX_ENTRIES', 20000)),
+        stale_grace_seconds=int(os.environ.get('TTS_STALE_GRACE_SECONDS', 7 * 24 * 3600))
+    )
+    try:
+        await store.ensure_indexes()
+        jobs = await collect_jobs(db, voice, speed)
+        print(f"\n📦 {len(jobs)} distinct text fields to check")
+
+        counts = {"rendered": 0, "unchanged": 0, "failed": 0}
+        pin_set = pin_set_for(voice, speed)
+        semaphore = asyncio.Semaphore(workers)
+        await asyncio.gather(*[
+            render_job(store, job, speed, pin_set, semaphore, counts, dry_run) for job in jobs
+        ])
+        unpinned = await store.unpin_except(pin_set, [job["key"] for job in jobs], dry_run=dry_run)
+
+        print(f"\nRendered: {counts['rendered']}  Unchanged: {counts['unchanged']}  Failed: {counts['failed']}  "
+              f"Unpinned: {unpinned}")
+        return counts["failed"] == 0
+    finally:
+        await stop_tts_engines()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render lesson and quiz audio")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent provider calls")
+    parser.add_argument("--voice", default=DEFAULT_VOICE, help="Voice used by the frontend (TTSRequest default)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speech speed to render")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be rendered")
+    args = parser.parse_args()
+
+    ok = asyncio.run(prerender(max(1, args.workers), args.voice, args.speed, args.dry_run))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
-from fastapi.responses import Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import pymongo
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
@@ -12,9 +14,21 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
 import base64
-from emergentintegrations.llm.openai import OpenAITextToSpeech
-from passlib.context import CryptContext
+import re
 from jose import JWTError, jwt
+from circuit_breaker import CircuitOpenError, breaker_stats
+from db_indexes import ensure_indexes
+from deadlines import request_budget, reset_deadline, start_deadline
+from hedging import hedger_stats
+from password_hashing import HashingPool, PasswordHashingBusyError
+from passwords import BCRYPT, calibrate_from_env, hasher_from_env
+from tts_renditions import STANDARD, audio_format, choose_rendition, media_type, rendition_available, rendition_key
+from tts_store import TTSResultStore
+from user_cache import USER_PROJECTION, UserCache, UserInvalidationBus
+from tts_service import (
+    TTSConfigurationError, TTSOverloadedError, render_cached, resolve_voice, start_tts_engines, stop_tts_engines,
+    synthesize_cached, tts_admission, tts_key
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -32,13 +46,35 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Shared TTS result store (one collection for every worker)
+tts_store = TTSResultStore(
+    db.tts_cache,
+    ttl_seconds=int(os.environ.get('TTS_CACHE_TTL_SECONDS', 30 * 24 * 3600)),  # 30 days
+    max_entries=int(os.environ.get('TTS_CACHE_MAX_ENTRIES', 20000)),
+    stale_grace_seconds=int(os.environ.get('TTS_STALE_GRACE_SECONDS', 7 * 24 * 3600))  # Served while the provider is down
+)
+
+# Authenticated users by id (no password_hash), evicted on every worker when a user changes
+user_cache = UserCache(
+    max_entries=int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000)),
+    ttl_seconds=float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+)
+user_invalidations = UserInvalidationBus(db, user_cache)
+
 # Security configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production-32-chars-min')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 365 * 10  # 10 years for "permanent" login
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: bcrypt with a cost calibrated to this machine at startup
+# (PASSWORD_HASH_COST fixes it); older or other-format hashes are upgraded at login
+password_hasher = hasher_from_env(BCRYPT)
+
+# Bcrypt runs on its own bounded pool so a login burst never blocks the event loop
+password_pool = HashingPool(
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))),
+    max_queue=int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 64))
+)
 
 # HTTP Bearer security
 security = HTTPBearer()
@@ -64,6 +100,10 @@ class TTSRequest(BaseModel):
     language: str = Field(default="en", description="Language code: en or ta")
     speed: Optional[float] = Field(default=1.0, ge=0.5, le=2.0, description="Speech speed")
     voice: Optional[str] = Field(default="alloy", description="Voice to use")
+    quality: Optional[str] = Field(
+        default=None,
+        description="Audio rendition: standard, low or opus (default: picked from Save-Data/ECT hints)"
+    )
 
 class TTSResponse(BaseModel):
     audio_base64: str
@@ -119,7 +159,7 @@ class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     email: EmailStr
-    password_hash: str
+    password_hash: Optional[str] = None  # Not loaded for authenticated requests
     disability_types: DisabilityType
     age: Optional[int] = None
     language_preference: str = "en"  # en or ta
@@ -168,16 +208,12 @@ class AuthResponse(BaseModel):
 
 # Authentication utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against its bcrypt or werkzeug hash"""
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    # Bcrypt has a 72-byte limit, so truncate if necessary
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password = password_bytes[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(password)
+    """Hash a password (bcrypt only uses the first 72 bytes)"""
+    return password_hasher.hash(password)
 
 def create_access_token(data: dict) -> str:
     """Create JWT access token"""
@@ -204,9 +240,13 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user_doc = await db.users.find_one({"id": user_id})
+    user_doc = user_cache.get(user_id)
     if user_doc is None:
-        raise credentials_exception
+        version = user_cache.version(user_id)
+        user_doc = await db.users.find_one({"id": user_id}, USER_PROJECTION)
+        if user_doc is None:
+            raise credentials_exception
+        user_cache.put(user_id, user_doc, version)
     
     return User(**user_doc)
 
@@ -240,7 +280,7 @@ async def signup(user_data: UserSignup):
         user = User(
             name=user_data.name,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await password_pool.run(get_password_hash, user_data.password),
             disability_types=user_data.disability_types,
             age=user_data.age,
             language_preference=user_data.language_preference,
@@ -262,6 +302,20 @@ async def signup(user_data: UserSignup):
         
     except HTTPException:
         raise
+    except PasswordHashingBusyError as e:
+        logger.warning(f"Signup shed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        # The request deadline ran out while waiting for the hashing pool
+        logger.warning("Signup timed out")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
     except Exception as e:
         logger.error(f"Signup failed: {e}")
         raise HTTPException(
@@ -284,11 +338,20 @@ async def login(credentials: UserLogin):
         user = User(**user_doc)
         
         # Verify password
-        if not verify_password(credentials.password, user.password_hash):
+        valid, new_hash = await password_pool.run(
+            password_hasher.verify_and_update, credentials.password, user.password_hash
+        )
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
+        if new_hash:
+            # Upgrade an outdated hash, unless the password changed in the meantime
+            await db.users.update_one(
+                {"id": user.id, "password_hash": user.password_hash},
+                {"$set": {"password_hash": new_hash}}
+            )
         
         # Create access token
         access_token = create_access_token(data={"sub": user.id})
@@ -302,6 +365,20 @@ async def login(credentials: UserLogin):
         
     except HTTPException:
         raise
+    except PasswordHashingBusyError as e:
+        logger.warning(f"Login shed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        # The request deadline ran out while waiting for the hashing pool
+        logger.warning("Login timed out")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
     except Exception as e:
         logger.error(f"Login failed: {e}")
         raise HTTPException(
@@ -347,6 +424,7 @@ async def update_profile(
             {"id": current_user.id},
             {"$set": update_data}
         )
+        await user_invalidations.invalidate(current_user.id)
         
         # Fetch updated user
         updated_user_doc = await db.users.find_one({"id": current_user.id})
@@ -372,15 +450,18 @@ async def change_password(
 ):
     """Change user password"""
     try:
-        # Verify current password
-        if not verify_password(password_data.current_password, current_user.password_hash):
+        # Verify current password (the authenticated user is loaded without its hash)
+        user_doc = await db.users.find_one({"id": current_user.id}, {"password_hash": 1})
+        if not user_doc or not await password_pool.run(
+            verify_password, password_data.current_password, user_doc["password_hash"]
+        ):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Current password is incorrect"
             )
         
         # Hash new password
-        new_password_hash = get_password_hash(password_data.new_password)
+        new_password_hash = await password_pool.run(get_password_hash, password_data.new_password)
         
         # Update password in database
         await db.users.update_one(
@@ -390,6 +471,7 @@ async def change_password(
                 "updated_at": datetime.utcnow()
             }}
         )
+        await user_invalidations.invalidate(current_user.id)
         
         logger.info(f"Password changed: {current_user.email}")
         
@@ -397,6 +479,20 @@ async def change_password(
         
     except HTTPException:
         raise
+    except PasswordHashingBusyError as e:
+        logger.warning(f"Password change shed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        # The request deadline ran out while waiting for the hashing pool
+        logger.warning("Password change timed out")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
     except Exception as e:
         logger.error(f"Password change failed: {e}")
         raise HTTPException(
@@ -421,50 +517,184 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+def requested_rendition(http_request: Request, tts_request: TTSRequest) -> str:
+    """Rendition for a request: explicit quality first, then client hints"""
+    rendition = choose_rendition(
+        tts_request.quality,
+        http_request.headers.get("save-data"),
+        http_request.headers.get("ect")
+    )
+    return rendition if rendition_available(rendition) else STANDARD
+
 @api_router.post("/tts", response_model=TTSResponse)
-async def text_to_speech(request: TTSRequest):
+async def text_to_speech(request: TTSRequest, http_request: Request):
     """
-    Convert text to speech using OpenAI TTS.
+    Convert text to speech using the engine configured for the language
+    (OpenAI TTS by default).
     Supports English (en) and Tamil (ta) languages.
-    Returns base64 encoded MP3 audio.
+    Returns base64 encoded audio (MP3 unless the opus rendition is requested).
+    Identical requests are served from the shared TTS store.
     """
     try:
-        # Initialize TTS client
-        api_key = os.getenv("EMERGENT_LLM_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="TTS API key not configured")
-        
-        tts = OpenAITextToSpeech(api_key=api_key)
-        
-        # Select appropriate voice based on language
-        voice_map = {
-            "en": "alloy",  # Clear, neutral voice for English
-            "ta": "nova",   # Energetic voice works well for Tamil
-        }
-        voice = request.voice or voice_map.get(request.language, "alloy")
-        
-        # Generate speech with base64 output
-        audio_base64 = await tts.generate_speech_base64(
-            text=request.text,
-            model="tts-1",  # Fast model for real-time use
-            voice=voice,
-            speed=request.speed,
-            response_format="mp3"
+        rendition = requested_rendition(http_request, request)
+        voice = resolve_voice(request.language, request.voice)
+        speed = request.speed or 1.0
+        audio, _ = await synthesize_cached(
+            tts_store,
+            request.text,
+            request.language,
+            voice,
+            speed
+        )
+        audio, rendition = await render_cached(
+            tts_store, tts_key(request.text, request.language, voice, speed), audio, rendition
         )
-        
-        logger.info(f"Generated TTS for {len(request.text)} chars in {request.language}")
         
         return TTSResponse(
-            audio_base64=audio_base64,
-            format="mp3"
+            audio_base64=base64.b64encode(audio).decode("ascii"),
+            format=audio_format(rendition)
         )
         
+    except TTSConfigurationError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except (TTSOverloadedError, CircuitOpenError) as e:
+        logger.warning(f"TTS request shed: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        logger.error("TTS provider timed out")
+        raise HTTPException(status_code=504, detail="TTS provider timed out")
+    except ValueError as e:
+        logger.error(f"TTS validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"TTS generation failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate speech")
+
+_BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def parse_byte_range(range_header: str, size: int):
+    """
+    Parse a single-range Range header into an inclusive (start, end) pair.
+    Returns None when the header should be ignored (malformed or multi-range)
+    and raises ValueError when the range cannot be satisfied.
+    """
+    match = _BYTE_RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+async def tts_audio_response(http_request: Request, tts_request: TTSRequest) -> Response:
+    """Synthesize (or fetch) audio and return it as binary audio with ETag and Range support"""
+    try:
+        rendition = requested_rendition(http_request, tts_request)
+        voice = resolve_voice(tts_request.language, tts_request.voice)
+        speed = tts_request.speed or 1.0
+        key = tts_key(tts_request.text, tts_request.language, voice, speed)
+        etag = f'"{rendition_key(key, rendition)}"'
+        
+        if http_request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Save-Data, ECT"})
+        
+        audio, cache_hit = await synthesize_cached(
+            tts_store, tts_request.text, tts_request.language, voice, speed
+        )
+        audio, served = await render_cached(tts_store, key, audio, rendition)
+        if served != rendition:
+            etag = f'"{rendition_key(key, served)}"'
+        # Audio served while the provider circuit is open is never stored; don't let clients cache it
+        try:
+            degraded = not cache_hit and not await tts_store.contains(key)
+        except Exception:
+            degraded = True
+    except TTSConfigurationError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except (TTSOverloadedError, CircuitOpenError) as e:
+        logger.warning(f"TTS request shed: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        logger.error("TTS provider timed out")
+        raise HTTPException(status_code=504, detail="TTS provider timed out")
     except ValueError as e:
         logger.error(f"TTS validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"TTS generation failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate speech")
+    
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=86400",
+        "X-Cache": "HIT" if cache_hit else "MISS",
+        "Vary": "Save-Data, ECT",
+    }
+    if degraded:
+        del headers["ETag"]
+        headers["Cache-Control"] = "no-store"
+    size = len(audio)
+    range_header = http_request.headers.get("range")
+    if_range = http_request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(
+                content=audio[start:end + 1],
+                status_code=206,
+                media_type=media_type(served),
+                headers=headers
+            )
+    
+    # Response sets Content-Length from the body
+    return Response(content=audio, media_type=media_type(served), headers=headers)
+
+@api_router.get("/tts/audio")
+async def text_to_speech_audio(http_request: Request, tts_request: TTSRequest = Depends()):
+    """
+    Binary variant of /tts for <audio> elements: query parameters mirror
+    TTSRequest and the clip is served as binary audio with Range support.
+    """
+    return await tts_audio_response(http_request, tts_request)
+
+@api_router.post("/tts/audio")
+async def text_to_speech_audio_post(http_request: Request, tts_request: TTSRequest):
+    """Binary variant of /tts for JSON request bodies"""
+    return await tts_audio_response(http_request, tts_request)
+
+@api_router.get("/auth/hashing/stats")
+async def password_hashing_stats():
+    """Queue depth and wait times of the password hashing pool"""
+    return password_pool.stats()
+
+@api_router.get("/tts/cache/stats")
+async def tts_cache_stats():
+    """Hit/miss counters for the shared TTS store and this worker's admission, breaker and hedging state"""
+    return dict(
+        await tts_store.stats(),
+        admission=tts_admission().stats(),
+        breakers=breaker_stats(),
+        hedging=hedger_stats()
+    )
 
 # Course Endpoints
 @api_router.get("/courses", response_model=List[Course])
@@ -714,6 +944,26 @@ async def seed_course_data():
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    """
+    Give every request a deadline budget. Mongo commands get the remaining
+    budget as maxTimeMS through pymongo.timeout(), TTS waits are capped by it,
+    and the request is aborted with 504 once it is spent.
+    """
+    budget = request_budget(request.headers.get("x-request-timeout"))
+    token = start_deadline(budget)
+    try:
+        with pymongo.timeout(budget):
+            # A little slack so handlers can report their own timeouts first
+            return await asyncio.wait_for(call_next(request), timeout=budget + 0.5)
+    except asyncio.TimeoutError:
+        logger.warning(f"Request deadline of {budget:g}s exceeded: {request.method} {request.url.path}")
+        return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+    finally:
+        reset_deadline(token)
+
+# Added after the deadline middleware so it wraps it and 504s still get CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -722,6 +972,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    # Large collections can take a while; set MONGO_ENSURE_INDEXES=false and run db_indexes.py instead
+    if os.environ.get("MONGO_ENSURE_INDEXES", "true").lower() in ("0", "false", "no"):
+        return
+    try:
+        await ensure_indexes(db, log=logger.info)
+    except Exception as e:
+        logger.warning(f"Could not ensure MongoDB indexes: {e}")
+
+@app.on_event("startup")
+async def calibrate_password_hashing():
+    try:
+        await password_pool.run(calibrate_from_env, password_hasher, logger.info)
+    except Exception as e:
+        logger.warning(f"Password hash calibration failed, using {password_hasher.scheme} cost {password_hasher.cost}: {e}")
+
+@app.on_event("startup")
+async def start_user_invalidations():
+    try:
+        await user_invalidations.ensure_collection()
+    except Exception as e:
+        logger.warning(f"Could not create the user cache invalidation collection: {e}")
+    user_invalidations.start()
+
+@app.on_event("startup")
+async def ensure_tts_store_indexes():
+    try:
+        await tts_store.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Could not create TTS store indexes: {e}")
+
+@app.on_event("startup")
+async def start_tts():
+    try:
+        start_tts_engines()
+    except TTSConfigurationError as e:
+        logger.warning(f"TTS engines not started: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await user_invalidations.stop()
+    password_pool.shutdown()
+    await stop_tts_engines()
     client.close()
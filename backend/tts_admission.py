@@ -0,0 +1,82 @@
+"""
+Admission control for TTS synthesis.
+
+Only cache misses that actually call an engine pass through here. At most
+``limit`` syntheses run at once per worker. Up to ``max_queue`` more wait
+for a slot, each for at most ``queue_timeout`` seconds. Anything beyond that
+is rejected at once with TTSOverloadedError, which the endpoints turn into
+503 + Retry-After. A slow provider then costs some requests a fast 503
+instead of an unbounded pile of provider calls.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from deadlines import DeadlineExceeded, within_deadline
+
+
+class TTSOverloadedError(RuntimeError):
+    """Raised when synthesis is shed because the backlog is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-limited wait queue"""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._avg_seconds = 1.0  # Moving average of synthesis time, for Retry-After
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil((self.waiting + 1) * self._avg_seconds / self.limit))
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a synthesis slot for the duration of the block"""
+        if self.active >= self.limit and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise TTSOverloadedError("TTS backlog is full", self.retry_after())
+        self.waiting += 1
+        try:
+            await within_deadline(self._slots.acquire(), timeout=self.queue_timeout)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise TTSOverloadedError("Timed out waiting for a TTS slot", self.retry_after())
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "active": self.active,
+            "waiting": self.waiting,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,61 @@
+"""
+Long-lived TTS provider client.
+
+One client is created when the app starts and reused for every request, so
+the provider SDK keeps its HTTP connections (and TLS sessions) alive instead
+of building a new client per call. Concurrent calls are capped at the pool
+size and each call has its own timeout, shortened to the request's remaining
+deadline budget.
+"""
+import asyncio
+import base64
+import inspect
+import logging
+
+from emergentintegrations.llm.openai import OpenAITextToSpeech
+
+from deadlines import within_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class TTSClient:
+    """Pooled wrapper around the provider SDK"""
+
+    def __init__(self, api_key: str, model: str, pool_size: int, timeout: float):
+        self.model = model
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._tts = OpenAITextToSpeech(api_key=api_key)
+        self._slots = asyncio.Semaphore(pool_size)
+        self.in_flight = 0
+
+    async def synthesize(self, text: str, voice: str, speed: float) -> bytes:
+        """Synthesize MP3 audio, waiting for a free slot in the pool"""
+        await within_deadline(self._slots.acquire())
+        self.in_flight += 1
+        try:
+            audio_base64 = await within_deadline(
+                self._tts.generate_speech_base64(
+                    text=text,
+                    model=self.model,
+                    voice=voice,
+                    speed=speed,
+                    response_format="mp3"
+                ),
+                timeout=self.timeout
+            )
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        return base64.b64decode(audio_base64)
+
+    async def aclose(self):
+        """Close the SDK's HTTP client, if it exposes one"""
+        close = getattr(self._tts, "aclose", None) or getattr(self._tts, "close", None)
+        if close is None:
+            return
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+        logger.info("TTS client closed")
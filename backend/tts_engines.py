@@ -0,0 +1,148 @@
+"""
+Pluggable TTS engines.
+
+Every synthesis goes through an engine picked per language from
+``TTS_ENGINES`` (e.g. ``"en=openai,ta=espeak"``). Languages that are not
+listed use ``TTS_DEFAULT_ENGINE`` (``openai``). Available engines:
+
+- ``openai``: the hosted provider, through the pooled TTSClient
+- ``espeak``: on-box synthesis with espeak-ng, encoded to MP3 by ffmpeg
+- ``silent``: a deterministic stand-in that returns silence sized to the
+  text. It needs no network or binaries, which makes it useful for load
+  tests that should measure only our own overhead.
+
+The engine name is part of the store key, so clips from different engines
+never mix.
+
+Remote engines are guarded by a circuit breaker (see tts_service). While a
+breaker is open, misses are served by ``TTS_FALLBACK_ENGINE`` (``espeak``).
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+from typing import Dict
+
+from mp3_utils import silent_mp3
+from tts_client import TTSClient
+
+TTS_MODEL = "tts-1"  # Fast model for real-time use
+DEFAULT_ENGINE = "openai"
+DEFAULT_FALLBACK_ENGINE = "espeak"
+
+
+class TTSConfigurationError(RuntimeError):
+    """Raised when a TTS engine is not configured or not available"""
+
+
+class TTSEngine:
+    """Base class: turn text into MP3 bytes"""
+
+    name = ""
+    remote = False  # True for engines that call out over the network
+
+    async def synthesize(self, text: str, language: str, voice: str, speed: float) -> bytes:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIEngine(TTSEngine):
+    name = "openai"
+    remote = True
+
+    def __init__(self):
+        api_key = os.getenv("EMERGENT_LLM_KEY")
+        if not api_key:
+            raise TTSConfigurationError("TTS API key not configured")
+        self.client = TTSClient(
+            api_key=api_key,
+            model=TTS_MODEL,
+            pool_size=int(os.environ.get("TTS_POOL_SIZE", 16)),
+            timeout=float(os.environ.get("TTS_TIMEOUT_SECONDS", 30))
+        )
+
+    async def synthesize(self, text: str, language: str, voice: str, speed: float) -> bytes:
+        return await self.client.synthesize(text, voice, speed)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class EspeakEngine(TTSEngine):
+    name = "espeak"
+
+    BASE_WORDS_PER_MINUTE = 160
+
+    def __init__(self):
+        missing = [tool for tool in ("espeak-ng", "ffmpeg") if shutil.which(tool) is None]
+        if missing:
+            raise TTSConfigurationError(f"espeak engine needs {', '.join(missing)} on PATH")
+
+    def _synthesize_sync(self, text: str, language: str, speed: float) -> bytes:
+        wav = subprocess.run(
+            ["espeak-ng", "-v", language, "-s", str(int(self.BASE_WORDS_PER_MINUTE * speed)), "--stdout", "--stdin"],
+            input=text.encode("utf-8"), capture_output=True, check=True
+        ).stdout
+        return subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+             "-ac", "1", "-codec:a", "libmp3lame", "-b:a", "48k", "-f", "mp3", "pipe:1"],
+            input=wav, capture_output=True, check=True
+        ).stdout
+
+    async def synthesize(self, text: str, language: str, voice: str, speed: float) -> bytes:
+        return await asyncio.to_thread(self._synthesize_sync, text, language, speed)
+
+
+class SilentEngine(TTSEngine):
+    name = "silent"
+
+    SECONDS_PER_CHAR = 0.065  # Roughly conversational speaking rate
+
+    async def synthesize(self, text: str, language: str, voice: str, speed: float) -> bytes:
+        return silent_mp3(len(text) * self.SECONDS_PER_CHAR / speed)
+
+
+ENGINE_TYPES = {cls.name: cls for cls in (OpenAIEngine, EspeakEngine, SilentEngine)}
+
+# Engine instances shared by every request in this worker
+_engines: Dict[str, TTSEngine] = {}
+
+
+def engine_name_for(language: str) -> str:
+    """Return the configured engine name for a language"""
+    mapping = {}
+    for item in os.environ.get("TTS_ENGINES", "").split(","):
+        if "=" in item:
+            lang, name = item.split("=", 1)
+            mapping[lang.strip()] = name.strip()
+    return mapping.get(language, os.environ.get("TTS_DEFAULT_ENGINE", DEFAULT_ENGINE))
+
+
+def fallback_engine_name() -> str:
+    """Engine that serves misses while a remote engine's breaker is open"""
+    return os.environ.get("TTS_FALLBACK_ENGINE", DEFAULT_FALLBACK_ENGINE)
+
+
+def get_engine(name: str) -> TTSEngine:
+    """Return the shared instance of an engine, creating it on first use"""
+    engine = _engines.get(name)
+    if engine is None:
+        engine_type = ENGINE_TYPES.get(name)
+        if engine_type is None:
+            raise TTSConfigurationError(f"Unknown TTS engine: {name}")
+        engine = _engines[name] = engine_type()
+    return engine
+
+
+def engine_for(language: str) -> TTSEngine:
+    """Return the engine configured for a language"""
+    return get_engine(engine_name_for(language))
+
+
+async def close_engines():
+    """Close every engine created so far"""
+    while _engines:
+        _name, engine = _engines.popitem()
+        await engine.aclose()
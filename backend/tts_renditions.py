@@ -0,0 +1,81 @@
+"""
+Compact audio renditions for constrained networks.
+
+The provider's MP3 stays the canonical ("standard") rendition. Smaller
+renditions are transcoded from it with ffmpeg, stored under their own keys
+and picked per request from an explicit ``quality`` parameter or, failing
+that, the ``Save-Data`` / ``ECT`` client hints:
+
+- ``low``: mono 16 kbps MP3 at 16 kHz, playable everywhere
+- ``opus``: mono 12 kbps Opus in Ogg, smallest but not supported by every
+  browser, so it is only served when asked for explicitly
+
+Without ffmpeg on PATH every request gets the standard rendition.
+"""
+import asyncio
+import hashlib
+import shutil
+import subprocess
+from typing import Optional
+
+STANDARD = "standard"
+
+RENDITIONS = {
+    STANDARD: {"media_type": "audio/mpeg", "format": "mp3", "ffmpeg_args": None},
+    "low": {
+        "media_type": "audio/mpeg",
+        "format": "mp3",
+        "ffmpeg_args": ["-ac", "1", "-ar", "16000", "-codec:a", "libmp3lame", "-b:a", "16k", "-f", "mp3"],
+    },
+    "opus": {
+        "media_type": "audio/ogg",
+        "format": "ogg",
+        "ffmpeg_args": ["-ac", "1", "-codec:a", "libopus", "-b:a", "12k", "-application", "voip", "-f", "ogg"],
+    },
+}
+
+# Effective connection types that get the low rendition by default
+SLOW_CONNECTION_TYPES = {"slow-2g", "2g", "3g"}
+
+
+def choose_rendition(requested: Optional[str], save_data: Optional[str] = None, ect: Optional[str] = None) -> str:
+    """Pick a rendition from the request parameter, then the client hints"""
+    if requested:
+        if requested not in RENDITIONS:
+            raise ValueError(f"Unknown audio quality: {requested}")
+        return requested
+    if (save_data or "").strip().lower() == "on" or (ect or "").strip().lower() in SLOW_CONNECTION_TYPES:
+        return "low"
+    return STANDARD
+
+
+def rendition_available(name: str) -> bool:
+    """Whether this host can produce a rendition"""
+    return name == STANDARD or shutil.which("ffmpeg") is not None
+
+
+def rendition_key(key: str, name: str) -> str:
+    """Store key for a rendition of the clip stored under `key`"""
+    if name == STANDARD:
+        return key
+    return hashlib.sha256(f"{key}\x1f{name}".encode("ascii")).hexdigest()
+
+
+def media_type(name: str) -> str:
+    return RENDITIONS[name]["media_type"]
+
+
+def audio_format(name: str) -> str:
+    return RENDITIONS[name]["format"]
+
+
+def _transcode_sync(audio: bytes, name: str) -> bytes:
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "mp3", "-i", "pipe:0"] + RENDITIONS[name]["ffmpeg_args"] + ["pipe:1"],
+        input=audio, capture_output=True, check=True
+    ).stdout
+
+
+async def transcode(audio: bytes, name: str) -> bytes:
+    """Transcode standard MP3 audio into a rendition"""
+    return await asyncio.to_thread(_transcode_sync, audio, name)
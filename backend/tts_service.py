@@ -0,0 +1,454 @@
+"""
+TTS synthesis shared by the /api/tts endpoint and offline tooling.
+
+The request handler and the pre-render script both go through
+``synthesize_cached`` so they compute identical store keys.
+
+Synthesis itself is delegated to the engine configured for the request's
+language (see tts_engines).
+
+Long texts are split into sentence chunks that are synthesized concurrently
+and stitched back together in order. Each request keeps at most
+``TTS_CHUNK_CONCURRENCY`` provider calls in flight.
+
+With the sentence tier on (``TTS_SENTENCE_CACHE``), every sentence is also
+stored under its own key. A text that shares sentences with other lessons,
+such as greetings or quiz instructions, only synthesizes the new ones.
+
+Only 1.0x audio goes to the provider when ffmpeg is available: other speeds
+are time-stretched from the cached 1.0x clip (see tts_stretch) and stored
+under their own keys.
+
+Misses that reach an engine are admitted through an AdmissionController
+(``TTS_MAX_CONCURRENT`` running, ``TTS_MAX_QUEUE`` waiting), so a slow
+provider sheds load with TTSOverloadedError. Cache hits never wait.
+
+Calls to remote engines can be hedged (see hedging) and go through a
+per-engine circuit breaker. While it is open, a miss is served from an
+expired-but-unpurged store entry, or else from the fallback engine (stored
+under its own key), instead of waiting on a failing provider.
+
+Concurrent misses for the same key are coalesced: within a worker they share
+one task, and across workers a lock in the shared store lets one worker
+synthesize while the others wait for its result.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import subprocess
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitOpenError, breaker_for
+from deadlines import DeadlineExceeded, within_deadline
+from hedging import Hedger, hedger_for
+from mp3_utils import concat_mp3
+from tts_admission import AdmissionController, TTSOverloadedError
+from tts_engines import (
+    TTSConfigurationError, TTSEngine, close_engines, engine_for, engine_name_for, fallback_engine_name, get_engine
+)
+from tts_store import TTSResultStore, make_tts_key
+from tts_renditions import STANDARD, rendition_available, rendition_key, transcode
+from tts_stretch import BASE_SPEED, stretch_enabled, time_stretch
+from tts_text import pack_chunks, split_sentences
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOICE = "alloy"
+
+# Select appropriate voice based on language
+VOICE_MAP = {
+    "en": "alloy",  # Clear, neutral voice for English
+    "ta": "nova",   # Energetic voice works well for Tamil
+}
+
+
+# In-process single-flight registry: store key -> synthesis task
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Created on first use so it picks up settings from .env
+_admission: Optional[AdmissionController] = None
+
+
+def _env_int(name: str, default: int) -> int:
+    # Read at call time: server.py loads .env after importing this module
+    return int(os.environ.get(name, default))
+
+
+def tts_admission() -> AdmissionController:
+    """The worker's admission controller for engine-bound synthesis"""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(
+            limit=_env_int("TTS_MAX_CONCURRENT", 16),
+            max_queue=_env_int("TTS_MAX_QUEUE", 32),
+            queue_timeout=float(os.environ.get("TTS_QUEUE_TIMEOUT_SECONDS", 5))
+        )
+    return _admission
+
+
+def _sentence_cache_enabled() -> bool:
+    return os.environ.get("TTS_SENTENCE_CACHE", "true").lower() not in ("0", "false", "no")
+
+
+def resolve_voice(language: str, voice: str = None) -> str:
+    """Pick the requested voice, falling back to the language default"""
+    return voice or VOICE_MAP.get(language, DEFAULT_VOICE)
+
+
+def tts_key(text: str, language: str, voice: str, speed: float) -> str:
+    """Store key for a request, including the engine that will serve it"""
+    return make_tts_key(text, language, voice, speed, engine_name_for(language))
+
+
+def start_tts_engines():
+    """Create the engines configured for every supported language"""
+    for language in VOICE_MAP:
+        engine_for(language)
+
+
+async def stop_tts_engines():
+    """Close the engines and their provider connections"""
+    await close_engines()
+
+
+async def _guarded_call(engine: TTSEngine, text: str, language: str, voice: str, speed: float) -> Tuple[bytes, float]:
+    """One remote engine call through its circuit breaker; returns (audio, seconds)"""
+    breaker = breaker_for(engine.name)
+    probe = breaker.before_call()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        audio = await engine.synthesize(text, language, voice, speed)
+    except asyncio.CancelledError:
+        # A hedge loser or abandoned call is no evidence either way
+        breaker.release(probe)
+        raise
+    except DeadlineExceeded:
+        # The caller ran out of budget; the provider may be fine
+        breaker.release(probe)
+        raise
+    except Exception:
+        breaker.record(True, loop.time() - started, probe)
+        raise
+    seconds = loop.time() - started
+    breaker.record(False, seconds, probe)
+    return audio, seconds
+
+
+async def _hedged_call(hedger: Hedger, engine: TTSEngine, text: str, language: str, voice: str, speed: float) -> bytes:
+    """Call the engine, adding a second identical call if the first runs past the hedge delay"""
+    delay = hedger.delay()
+    if delay is None:
+        audio, seconds = await _guarded_call(engine, text, language, voice, speed)
+        hedger.record_latency(seconds)
+        return audio
+
+    primary = asyncio.ensure_future(_guarded_call(engine, text, language, voice, speed))
+    # Primary latencies only, so hedging doesn't skew the percentile it is based on
+    primary.add_done_callback(
+        lambda t: not t.cancelled() and t.exception() is None and hedger.record_latency(t.result()[1])
+    )
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not hedger.try_hedge():
+            return (await primary)[0]
+
+        hedge = asyncio.ensure_future(_guarded_call(engine, text, language, voice, speed))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        hedger.record_winner(task is hedge)
+                        return task.result()[0]
+            return primary.result()[0]
+        finally:
+            for task in pending:
+                task.cancel()
+    except asyncio.CancelledError:
+        primary.cancel()
+        raise
+
+
+async def call_engine(engine: TTSEngine, text: str, language: str, voice: str, speed: float) -> bytes:
+    """Call an engine: remote ones through their circuit breaker, hedged when enabled"""
+    if not engine.remote:
+        return await engine.synthesize(text, language, voice, speed)
+
+    hedger = hedger_for(engine.name)
+    if hedger is None:
+        return (await _guarded_call(engine, text, language, voice, speed))[0]
+    return await _hedged_call(hedger, engine, text, language, voice, speed)
+
+
+async def synthesize_sentences(
+    store: TTSResultStore,
+    engine: TTSEngine,
+    sentences: List[str],
+    language: str,
+    voice: str,
+    speed: float
+) -> bytes:
+    """Assemble text from stored sentence clips, synthesizing only the missing ones"""
+    semaphore = asyncio.Semaphore(max(1, _env_int("TTS_CHUNK_CONCURRENCY", 4)))
+
+    async def sentence_clip(sentence: str) -> bytes:
+        key = tts_key(sentence, language, voice, speed)
+        try:
+            audio = await store.get(key, count=False)
+        except Exception as e:
+            logger.warning(f"TTS store read failed: {e}")
+            audio = None
+        if audio is not None:
+            return audio
+
+        async with semaphore:
+            audio = await call_engine(engine, sentence, language, voice, speed)
+        try:
+            await store.put(key, audio, language=language, sentence=True)
+        except Exception as e:
+            logger.warning(f"TTS store write failed: {e}")
+        return audio
+
+    segments = await asyncio.gather(*[sentence_clip(sentence) for sentence in sentences])
+    return concat_mp3(segments)
+
+
+async def synthesize_chunked(
+    engine: TTSEngine,
+    text: str,
+    language: str,
+    voice: str,
+    speed: float,
+    store: Optional[TTSResultStore] = None
+) -> bytes:
+    """
+    Synthesize text, fanning long inputs out as concurrent engine calls.
+    Given a store, long texts go through the sentence tier instead.
+    """
+    if store is not None and _sentence_cache_enabled():
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            return await call_engine(engine, text, language, voice, speed)
+        return await synthesize_sentences(store, engine, sentences, language, voice, speed)
+
+    chunks = pack_chunks(split_sentences(text), _env_int("TTS_CHUNK_CHARS", 500))
+    if len(chunks) <= 1:
+        return await call_engine(engine, text, language, voice, speed)
+
+    semaphore = asyncio.Semaphore(max(1, _env_int("TTS_CHUNK_CONCURRENCY", 4)))
+
+    async def synthesize_chunk(chunk: str) -> bytes:
+        async with semaphore:
+            return await call_engine(engine, chunk, language, voice, speed)
+
+    # gather() returns results in input order, whatever order they finish in
+    segments = await asyncio.gather(*[synthesize_chunk(chunk) for chunk in chunks])
+    return concat_mp3(segments)
+
+
+async def _wait_for_other_worker(store: TTSResultStore, key: str, timeout: float):
+    """Poll the store until another worker's result lands or timeout passes"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.1
+    while loop.time() < deadline:
+        await asyncio.sleep(delay)
+        try:
+            audio = await store.peek(key)
+        except Exception as e:
+            logger.warning(f"TTS store read failed: {e}")
+            audio = None
+        if audio is not None:
+            return audio
+        delay = min(delay * 2, 1.0)
+    return None
+
+
+async def _synthesize_and_store(store, key, text, language, voice, speed, metadata) -> bytes:
+    """Synthesize once across workers, using the store lock to elect the caller"""
+    owner = uuid.uuid4().hex
+    lock_ttl = _env_int("TTS_LOCK_TTL_SECONDS", 60)
+
+    try:
+        locked = await store.acquire_lock(key, owner, lock_ttl)
+    except Exception as e:
+        # Without the store we can't coordinate, but we can still synthesize
+        logger.warning(f"TTS store lock unavailable: {e}")
+        locked = None
+
+    if locked is False:
+        audio = await _wait_for_other_worker(store, key, lock_ttl)
+        if audio is not None:
+            return audio
+        logger.warning("Timed out waiting for another worker's TTS result; synthesizing locally")
+    try:
+        if locked:
+            # The previous lock holder may have finished between our miss and the lock
+            try:
+                audio = await store.peek(key)
+            except Exception as e:
+                logger.warning(f"TTS store read failed: {e}")
+                audio = None
+            if audio is not None:
+                return audio
+
+        engine = engine_for(language)
+        # Only the engine work takes an admission slot, not the wait for another worker
+        async with tts_admission().admit():
+            try:
+                audio = await synthesize_chunked(engine, text, language, voice, speed, store=store)
+            except CircuitOpenError as e:
+                return await _serve_while_open(store, key, text, language, voice, speed, e)
+        logger.info(f"Generated TTS for {len(text)} chars in {language} with {engine.name}")
+
+        try:
+            await store.put(key, audio, language=language, **metadata)
+        except Exception as e:
+            # A store outage must not fail a successful synthesis
+            logger.warning(f"TTS store write failed: {e}")
+        return audio
+    finally:
+        if locked:
+            try:
+                await store.release_lock(key, owner)
+            except Exception as e:
+                # The lock's TTL will clear it
+                logger.warning(f"TTS store lock release failed: {e}")
+
+
+async def _serve_while_open(store, key, text, language, voice, speed, error: CircuitOpenError) -> bytes:
+    """
+    Serve a miss while the engine's breaker is open: an expired entry that
+    has not been purged yet, else the fallback engine. Nothing is written
+    under `key`, so degraded audio never replaces provider audio.
+    """
+    try:
+        audio = await store.get_stale(key)
+    except Exception as e:
+        logger.warning(f"TTS store read failed: {e}")
+        audio = None
+    if audio is not None:
+        logger.info("Served stale TTS while the provider circuit is open")
+        return audio
+
+    fallback = fallback_engine_name()
+    if fallback == engine_name_for(language):
+        raise error
+    fallback_key = make_tts_key(text, language, voice, speed, fallback)
+    try:
+        audio = await store.get(fallback_key, count=False)
+    except Exception as e:
+        logger.warning(f"TTS store read failed: {e}")
+        audio = None
+    if audio is not None:
+        return audio
+
+    try:
+        # No store: the sentence tier keys clips by the primary engine
+        audio = await synthesize_chunked(get_engine(fallback), text, language, voice, speed)
+    except Exception as e:
+        logger.warning(f"TTS fallback engine {fallback} unavailable: {e}")
+        raise error
+    logger.info(f"Served TTS from {fallback} while the provider circuit is open")
+    try:
+        await store.put(fallback_key, audio, language=language, engine=fallback)
+    except Exception as e:
+        logger.warning(f"TTS store write failed: {e}")
+    return audio
+
+
+async def _derive_and_store(store, key, text, language, voice, speed, metadata) -> bytes:
+    """Time-stretch the 1.0x clip (synthesizing it if needed) to `speed`"""
+    base_audio, _hit = await synthesize_cached(store, text, language, voice, BASE_SPEED, count=False, **metadata)
+    try:
+        audio = await time_stretch(base_audio, speed)
+    except (subprocess.CalledProcessError, OSError) as e:
+        # A clip ffmpeg can't decode, or a broken install: synthesize this speed directly
+        detail = (getattr(e, "stderr", None) or b"").decode(errors="replace").strip()
+        logger.warning(f"TTS time-stretch to {speed:.2f}x failed, synthesizing instead: {e} {detail}")
+        return await _synthesize_and_store(store, key, text, language, voice, speed, metadata)
+    logger.info(f"Derived {speed:.2f}x TTS for {len(text)} chars in {language}")
+
+    base_key = tts_key(text, language, voice, BASE_SPEED)
+    try:
+        # A base clip served while the provider was down is not stored; don't store its derivative either
+        if await store.contains(base_key):
+            await store.put(key, audio, language=language, derived_from=base_key, **metadata)
+    except Exception as e:
+        # A store outage must not fail a successful derivation
+        logger.warning(f"TTS store write failed: {e}")
+    return audio
+
+
+async def synthesize_cached(
+    store: TTSResultStore,
+    text: str,
+    language: str,
+    voice: str,
+    speed: float,
+    count: bool = True,
+    **metadata
+) -> Tuple[bytes, bool]:
+    """Return (audio, cache_hit), synthesizing and storing on a miss"""
+    key = tts_key(text, language, voice, speed)
+    try:
+        audio = await store.get(key, count)
+    except Exception as e:
+        # A store outage degrades to a miss rather than failing the request
+        logger.warning(f"TTS store read failed: {e}")
+        audio = None
+    if audio is not None:
+        return audio, True
+
+    task = _inflight.get(key)
+    if task is None:
+        if abs(speed - BASE_SPEED) >= 0.005 and stretch_enabled():
+            produce = _derive_and_store
+        else:
+            produce = _synthesize_and_store
+        # Run in a fresh context: the shared work must not inherit the first
+        # caller's deadline (or its pymongo.timeout), which other waiters don't share
+        task = contextvars.Context().run(
+            asyncio.ensure_future, produce(store, key, text, language, voice, speed, metadata)
+        )
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one caller disconnecting (or running out of deadline) must not cancel the shared synthesis
+    audio = await within_deadline(asyncio.shield(task))
+    return audio, False
+
+
+async def render_cached(store: TTSResultStore, key: str, audio: bytes, rendition: str) -> Tuple[bytes, str]:
+    """
+    Return (audio, rendition) for a rendition of the clip stored under `key`,
+    transcoding and storing it on a miss. Falls back to the standard
+    rendition when the requested one cannot be produced.
+    """
+    if rendition == STANDARD or not rendition_available(rendition):
+        return audio, STANDARD
+
+    derived_key = rendition_key(key, rendition)
+    try:
+        derived = await store.get(derived_key, count=False)
+    except Exception as e:
+        logger.warning(f"TTS store read failed: {e}")
+        derived = None
+    if derived is not None:
+        return derived, rendition
+
+    try:
+        derived = await transcode(audio, rendition)
+    except Exception as e:
+        logger.warning(f"TTS {rendition} transcode failed: {e}")
+        return audio, STANDARD
+    try:
+        # Skip storing renditions of degraded audio that was never stored itself
+        if await store.contains(key):
+            await store.put(derived_key, derived, rendition=rendition, derived_from=key)
+    except Exception as e:
+        logger.warning(f"TTS store write failed: {e}")
+    return derived, rendition
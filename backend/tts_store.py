@@ -0,0 +1,192 @@
+"""
+Shared TTS result store backed by MongoDB.
+
+Every uvicorn worker talks to the same collection, so a clip synthesized by
+one worker is a cache hit for all of them. Entries expire after
+``ttl_seconds`` and the collection is trimmed least-recently-used first once
+it grows past ``max_entries``. Pinned entries (pre-rendered lesson audio) are
+exempt from both. Each pin belongs to a named ``pin_set`` so a pre-render run
+can release the pins it no longer needs without touching other runs' pins.
+
+Expired entries are kept for a further ``stale_grace_seconds`` before the TTL
+index purges them. ``get`` never returns them, but ``get_stale`` does, so
+audio can still be served while the provider is down.
+
+A companion ``<collection>_locks`` collection holds short-lived synthesis
+locks so only one worker calls the provider for a given key at a time.
+"""
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Pinned entries never reach their TTL
+PINNED_EXPIRY = datetime(9999, 12, 31)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize('NFC', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def make_tts_key(text: str, language: str, voice: str, speed: float, engine: str) -> str:
+    """Build the store key for a normalized (text, language, voice, speed, engine) request"""
+    material = '\x1f'.join([
+        normalize_text(text),
+        language.lower(),
+        voice.lower(),
+        f"{speed:.2f}",
+        engine,
+    ])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class TTSResultStore:
+    """Worker-safe TTS audio store with TTL expiry and LRU trimming"""
+
+    def __init__(self, collection, ttl_seconds: int, max_entries: int, stale_grace_seconds: int = 0):
+        self.collection = collection
+        self.locks = collection.database[f"{collection.name}_locks"]
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.stale_grace = timedelta(seconds=stale_grace_seconds)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    async def ensure_indexes(self):
+        """Create the TTL and LRU indexes (idempotent)"""
+        await self.collection.create_index("purge_at", expireAfterSeconds=0)
+        await self.collection.create_index([("last_accessed", ASCENDING)])
+        await self.locks.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str, count: bool = True) -> Optional[bytes]:
+        """
+        Return cached audio and bump its recency, or None on a miss. Lookups
+        made on behalf of another one (sentence clips, renditions, fallback
+        and base-speed clips) pass ``count=False`` so the hit ratio reflects
+        whole requests.
+        """
+        now = datetime.utcnow()
+        doc = await self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_accessed": now}, "$inc": {"hits": 1}},
+            projection={"audio": 1},
+        )
+        if count:
+            if doc is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return bytes(doc["audio"]) if doc else None
+
+    async def peek(self, key: str) -> Optional[bytes]:
+        """Return cached audio without touching recency or hit/miss counters"""
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            projection={"audio": 1},
+        )
+        return bytes(doc["audio"]) if doc else None
+
+    async def get_stale(self, key: str) -> Optional[bytes]:
+        """Return audio for key even if it has expired but not yet been purged"""
+        doc = await self.collection.find_one({"_id": key}, projection={"audio": 1})
+        return bytes(doc["audio"]) if doc else None
+
+    async def acquire_lock(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """Try to take the synthesis lock for key; expired locks are taken over"""
+        now = datetime.utcnow()
+        try:
+            await self.locks.update_one(
+                {"_id": key, "expires_at": {"$lte": now}},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # A live lock exists, so the upsert collided with it
+            return False
+
+    async def release_lock(self, key: str, owner: str):
+        """Release the synthesis lock if we still own it"""
+        await self.locks.delete_one({"_id": key, "owner": owner})
+
+    async def put(self, key: str, audio: bytes, pinned: bool = False, **metadata):
+        """Store audio for key and trim the collection if it is over capacity"""
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "audio": audio,
+                "size": len(audio),
+                "created_at": now,
+                "last_accessed": now,
+                "expires_at": PINNED_EXPIRY if pinned else now + self.ttl,
+                "purge_at": PINNED_EXPIRY if pinned else now + self.ttl + self.stale_grace,
+                "pinned": pinned,
+                **metadata,
+            }},
+            upsert=True,
+        )
+        await self._evict()
+
+    async def contains(self, key: str) -> bool:
+        """Check for a live entry without touching its recency or counters"""
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            projection={"_id": 1},
+        )
+        return doc is not None
+
+    async def pin(self, key: str, pin_set: Optional[str] = None) -> bool:
+        """Pin an existing entry so it never expires; False if key is absent"""
+        result = await self.collection.update_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"$set": {"pinned": True, "pin_set": pin_set, "expires_at": PINNED_EXPIRY, "purge_at": PINNED_EXPIRY}},
+        )
+        return result.matched_count > 0
+
+    async def unpin_except(self, pin_set: str, keep: List[str], dry_run: bool = False) -> int:
+        """Unpin entries of pin_set whose key is not in keep; they expire after the normal TTL"""
+        query = {"pinned": True, "pin_set": pin_set, "_id": {"$nin": keep}}
+        if dry_run:
+            return await self.collection.count_documents(query)
+        now = datetime.utcnow()
+        result = await self.collection.update_many(query, {"$set": {
+            "pinned": False,
+            "expires_at": now + self.ttl,
+            "purge_at": now + self.ttl + self.stale_grace,
+        }})
+        return result.modified_count
+
+    async def _evict(self):
+        """Delete least recently used entries beyond max_entries"""
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        stale = await self.collection.find({"pinned": {"$ne": True}}, {"_id": 1}) \
+            .sort("last_accessed", ASCENDING).limit(excess).to_list(excess)
+        if stale:
+            result = await self.collection.delete_many({"_id": {"$in": [d["_id"] for d in stale]}})
+            logger.info(f"TTS store evicted {result.deleted_count} entries")
+
+    async def stats(self) -> dict:
+        """Return this worker's hit/miss counters and the shared entry count"""
+        total = self.hits + self.misses
+        return {
+            "pid": os.getpid(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "entries": await self.collection.estimated_document_count(),
+        }
@@ -0,0 +1,53 @@
+"""
+Pitch-preserving time-stretch for cached TTS audio.
+
+Only 1.0x audio is synthesized by the provider. Other speeds are derived
+from it locally with ffmpeg's ``atempo`` filter, which changes tempo without
+shifting pitch, so a student changing playback speed never costs a provider
+call. Without ffmpeg on PATH, or when ffmpeg fails on a clip, callers fall
+back to synthesizing at the requested speed.
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+from typing import List
+
+BASE_SPEED = 1.0
+
+# atempo accepts 0.5-2.0 per filter instance on older ffmpeg builds
+_ATEMPO_MIN = 0.5
+_ATEMPO_MAX = 2.0
+
+
+def stretch_enabled() -> bool:
+    """Whether non-1.0x speeds should be derived instead of synthesized"""
+    if os.environ.get("TTS_DERIVE_SPEEDS", "true").lower() in ("0", "false", "no"):
+        return False
+    return shutil.which("ffmpeg") is not None
+
+
+def _atempo_chain(speed: float) -> str:
+    """Split a tempo factor into atempo filters that each stay within range"""
+    factors: List[float] = []
+    while speed > _ATEMPO_MAX:
+        factors.append(_ATEMPO_MAX)
+        speed /= _ATEMPO_MAX
+    while speed < _ATEMPO_MIN:
+        factors.append(_ATEMPO_MIN)
+        speed /= _ATEMPO_MIN
+    factors.append(speed)
+    return ",".join(f"atempo={factor:.4f}" for factor in factors)
+
+
+def _time_stretch_sync(audio: bytes, speed: float) -> bytes:
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "mp3", "-i", "pipe:0",
+         "-filter:a", _atempo_chain(speed), "-codec:a", "libmp3lame", "-b:a", "64k", "-f", "mp3", "pipe:1"],
+        input=audio, capture_output=True, check=True
+    ).stdout
+
+
+async def time_stretch(audio: bytes, speed: float) -> bytes:
+    """Return `audio` played `speed` times faster, at the original pitch"""
+    return await asyncio.to_thread(_time_stretch_sync, audio, speed)
@@ -0,0 +1,67 @@
+"""
+Text helpers for TTS: language-aware sentence splitting.
+
+English and Tamil lesson text both end sentences with Latin punctuation, but
+Tamil content also uses the danda (U+0964/U+0965) and lesson bodies use
+newlines for bullet lists, so all of those count as boundaries.
+"""
+import re
+from typing import List
+
+from tts_store import normalize_text
+
+# Default upper bound for a single chunk sent to the provider
+MAX_CHUNK_CHARS = 300
+
+# A sentence ends at terminal punctuation (and any closing quote or bracket)
+# followed by whitespace, or at a line break
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?।॥])\s+|(?<=[.!?।॥]["\'”’)\]])\s+|\s*\n\s*')
+_CLAUSE_END_RE = re.compile(r'(?<=[,;:–—])\s+')
+_BULLET_RE = re.compile(r'^[-*•]\s+')
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break an over-long sentence at clause punctuation, then at spaces"""
+    parts = []
+    current = ''
+    for clause in _CLAUSE_END_RE.split(sentence):
+        for word in clause.split(' ') if len(clause) > max_chars else [clause]:
+            candidate = f'{current} {word}'.strip()
+            if current and len(candidate) > max_chars:
+                parts.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_sentences(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Split text into speakable chunks of at most max_chars characters"""
+    chunks = []
+    for raw in _SENTENCE_END_RE.split(text):
+        sentence = _BULLET_RE.sub('', normalize_text(raw))
+        if not sentence:
+            continue
+        if len(sentence) > max_chars:
+            chunks.extend(_split_long(sentence, max_chars))
+        else:
+            chunks.append(sentence)
+    return chunks
+
+
+def pack_chunks(sentences: List[str], max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Join consecutive sentences into chunks of at most max_chars characters"""
+    chunks = []
+    current = ''
+    for sentence in sentences:
+        candidate = f'{current} {sentence}'.strip()
+        if current and len(candidate) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,181 @@
+"""
+Authenticated-user cache.
+
+get_current_user runs on every protected request. Instead of a users
+lookup each time, the slim user document (no password_hash) is kept in a
+bounded in-process cache keyed on user id. Entries expire after
+``ttl_seconds`` and the least recently used ones are evicted beyond
+``max_entries``.
+
+Writes to a user call UserInvalidationBus.invalidate(), which evicts the local entry and
+publishes the id on a capped Mongo collection. Every worker tails that
+collection (UserInvalidationBus) and evicts too, so a profile or password
+change is visible everywhere without waiting for the TTL.
+
+A read that started before an invalidation must not re-cache the old
+document, so each id carries a version that invalidation bumps; put() only
+stores when the version it was given is still current.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Fields never kept in the cache
+USER_PROJECTION = {"_id": 0, "password_hash": 0}
+
+
+class UserCache:
+    """Bounded TTL + LRU cache of user documents keyed on user id"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires at, doc)
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0  # Bumped when _versions is reset, so older reads stay invalid
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def version(self, user_id: str) -> tuple:
+        """Pass to put() so a read that raced an invalidation is dropped"""
+        return self._epoch, self._versions.get(user_id, 0)
+
+    def put(self, user_id: str, doc: Dict[str, Any], version: tuple):
+        if not self.enabled or self.version(user_id) != version:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, doc)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, user_id: str):
+        self._entries.pop(user_id, None)
+        # Versions only matter while a read is in flight; reset them in bulk to stay bounded
+        if len(self._versions) >= max(self.max_entries, 1) * 2:
+            self._versions.clear()
+            self._entries.clear()
+            self._epoch += 1
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+        self._epoch += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class UserInvalidationBus:
+    """
+    Broadcast user invalidations to every worker through a capped collection.
+
+    publish() inserts {user_id, origin}; each worker's listen() task tails the
+    collection and evicts ids published by other workers. If the tail breaks,
+    the listener clears the whole cache before resuming, since it may have
+    missed events.
+    """
+
+    def __init__(self, db, cache: UserCache, collection_name: str = "user_cache_invalidations",
+                 size_bytes: int = 1024 * 1024):
+        self.db = db
+        self.cache = cache
+        self.collection_name = collection_name
+        self.collection = db[collection_name]
+        self.size_bytes = size_bytes
+        self.origin = uuid.uuid4().hex  # Our own events are already applied locally
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_collection(self):
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Already exists
+
+    async def invalidate(self, user_id: str):
+        """Evict a user here and on every other worker"""
+        self.cache.evict(user_id)
+        await self.publish(user_id)
+
+    async def publish(self, user_id: str):
+        try:
+            await self.collection.insert_one({"user_id": user_id, "origin": self.origin, "at": datetime.utcnow()})
+        except PyMongoError as e:
+            # Other workers fall back to the TTL
+            logger.warning(f"Could not publish user cache invalidation: {e}")
+
+    async def listen(self, retry_seconds: float = 5.0):
+        while True:
+            try:
+                await self._tail()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"User cache invalidation feed interrupted: {e}")
+            self.cache.clear()
+            await asyncio.sleep(retry_seconds)
+
+    async def _tail(self):
+        # A tailable cursor on an empty capped collection dies at once, so make sure
+        # there is an event, then skip everything up to the newest one in insertion
+        # order (_ids come from each worker's clock, so they cannot be compared)
+        latest = await self.collection.find_one(sort=[("$natural", -1)])
+        if latest is None:
+            await self.collection.insert_one({"user_id": None, "origin": self.origin, "at": datetime.utcnow()})
+            latest = await self.collection.find_one(sort=[("$natural", -1)])
+        cursor = self.collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+        caught_up = False
+        while cursor.alive:
+            async for event in cursor:
+                if not caught_up:
+                    caught_up = event["_id"] == latest["_id"]
+                    continue
+                if event.get("user_id") and event.get("origin") != self.origin:
+                    self.cache.evict(event["user_id"])
+            await asyncio.sleep(0.1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,6 +1,7 @@
-from flask import Flask, request, send_file, jsonify
-from gtts import gTTS
+from flask import Flask, Response, request, send_file, jsonify, copy_current_request_context
+from functools import wraps
 from io import BytesIO
+import json
 from flask_cors import CORS
 import os
 import uuid
@@ -8,8 +9,22 @@ import jwt
 import secrets
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import CourseModel, LessonModel, VideoModel, QuizModel
+from bulkheads import BulkheadFullError, bulkheads
+from circuit_breaker import CircuitOpenError, breaker_stats
+from db_indexes import MONGO_ENSURE_INDEXES, ensure_indexes
+from hedging import hedger_stats
+from rate_limit import TTS_RATE_HIT_COST, make_limiter
+from tts_cache import audio_cache
+from tts_admission import TTSOverloadedError, tts_admission
+from passwords import SCRYPT, calibrate_from_env, hasher_from_env
+from user_cache import USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS, USER_PROJECTION, UserCache, UserInvalidationBus
+from tts_cache import make_merged_key
+from tts_renditions import STANDARD, choose_rendition, mimetype, rendition_available
+from tts_service import (
+    TTS_MERGE_GAP_SECONDS, cache_key_for, get_or_merge, get_or_synthesize, get_rendition, stream_speech,
+    synthesize_batch
+)
 import firebase_admin
 from firebase_admin import credentials, auth as firebase_auth
 
@@ -38,9 +53,33 @@ app.config['JWT_EXPIRATION_DAYS'] = 365 * 10  # 10 years
 
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm'}
 
+TTS_BATCH_MAX_ITEMS = int(os.environ.get('TTS_BATCH_MAX_ITEMS', 20))
+
 # Import users collection from models
 from models import db
 users_collection = db['users']
+tts_rate_limiter = make_limiter(db)
+
+# Authenticated users by id (no password_hash), evicted on every worker when a user changes
+user_cache = UserCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+user_invalidations = UserInvalidationBus(db, user_cache)
+try:
+    user_invalidations.ensure_collection()
+except Exception as e:
+    print(f"⚠️  Could not create the user cache invalidation collection: {str(e)}")
+user_invalidations.start()
+
+# Password hashes: werkzeug-format scrypt with a cost calibrated to this machine
+# (PASSWORD_HASH_COST fixes it); older or other-format hashes are upgraded at login
+password_hasher = hasher_from_env(SCRYPT)
+calibrate_from_env(password_hasher)
+
+# Create any missing indexes from the registry (a no-op once they exist)
+if MONGO_ENSURE_INDEXES:
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        print(f"⚠️  Could not ensure MongoDB indexes: {str(e)}")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -52,6 +91,32 @@ def cors_headers(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     return response
 
+# Helper function for a 503 telling the client when to retry
+def overloaded_response(error):
+    response = cors_headers(jsonify({'error': str(error)}))
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+# Helper function for a 503 when a bulkhead is saturated
+def busy_response(error):
+    response = cors_headers(jsonify({'error': str(error)}))
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Decorator that runs a view on the named bulkhead's pool instead of the request thread
+def bulkhead(name):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return view(*args, **kwargs)
+            try:
+                return bulkheads[name].run(copy_current_request_context(view), *args, **kwargs)
+            except BulkheadFullError as e:
+                return busy_response(e)
+        return wrapper
+    return decorator
+
 # Helper function to generate JWT token
 def generate_token(user_id):
     payload = {
@@ -71,6 +136,27 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
+# Helper function to identify a client for rate limiting: JWT user id, else client IP
+def rate_limit_key():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        user_id = verify_token(auth_header[len('Bearer '):])
+        if user_id:
+            return f'user:{user_id}'
+    return f'ip:{request.remote_addr}'
+
+# Helper function to charge (text, lang) items against the TTS rate limits.
+# Returns (result, None) when allowed and (result, 429 response) when not.
+def check_tts_rate(items):
+    misses = sum(1 for text, lang in items if not audio_cache.contains(cache_key_for(text, lang, slow=False)))
+    cost = misses + (len(items) - misses) * TTS_RATE_HIT_COST
+    result = tts_rate_limiter.check(rate_limit_key(), cost, synthesis_cost=misses)
+    if result.allowed:
+        return result, None
+    response = cors_headers(jsonify({'error': 'Too many TTS requests'}))
+    response.headers.update(result.headers())
+    return result, (response, 429)
+
 # Helper function to get current user from token
 def get_current_user():
     auth_header = request.headers.get('Authorization')
@@ -80,8 +166,13 @@ def get_current_user():
         token = auth_header.split(' ')[1]  # Bearer <token>
         user_id = verify_token(token)
         if user_id:
-            # MongoDB stores _id as string when we set it as string
-            user = users_collection.find_one({'_id': user_id})
+            user = user_cache.get(user_id)
+            if user is None:
+                version = user_cache.version(user_id)
+                # MongoDB stores _id as string when we set it as string
+                user = users_collection.find_one({'_id': user_id}, USER_PROJECTION)
+                if user:
+                    user_cache.put(user_id, user, version)
             if user:
                 # Ensure id field is set
                 if '_id' in user:
@@ -115,7 +206,7 @@ def signup():
             '_id': str(uuid.uuid4()),
             'name': data['name'],
             'email': data['email'],
-            'password_hash': generate_password_hash(data['password']),
+            'password_hash': bulkheads['hashing'].run(password_hasher.hash, data['password']),
             'disability_types': data.get('disability_types', {
                 'vision': False,
                 'hearing': False,
@@ -150,6 +241,8 @@ def signup():
             'token': token
         })), 201
         
+    except BulkheadFullError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Signup error: {str(e)}")
         return cors_headers(jsonify({'detail': 'Registration failed'})), 500
@@ -171,8 +264,17 @@ def login():
             return cors_headers(jsonify({'detail': 'Incorrect email or password'})), 401
         
         # Verify password
-        if not check_password_hash(user['password_hash'], data['password']):
+        valid, new_hash = bulkheads['hashing'].run(
+            password_hasher.verify_and_update, data['password'], user.get('password_hash')
+        )
+        if not valid:
             return cors_headers(jsonify({'detail': 'Incorrect email or password'})), 401
+        if new_hash:
+            # Upgrade an outdated hash, unless the password changed in the meantime
+            users_collection.update_one(
+                {'_id': user['_id'], 'password_hash': user['password_hash']},
+                {'$set': {'password_hash': new_hash}}
+            )
         
         # Generate token
         token = generate_token(user['_id'])
@@ -194,6 +296,8 @@ def login():
             'token': token
         }))
         
+    except BulkheadFullError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Login error: {str(e)}")
         return cors_headers(jsonify({'detail': 'Login failed'})), 500
@@ -299,6 +403,7 @@ def get_current_user_profile():
 
 # Courses API
 @app.route('/api/courses', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_courses():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -306,6 +411,7 @@ def get_courses():
     return cors_headers(jsonify(courses))
 
 @app.route('/api/courses/<course_id>', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_course(course_id):
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -320,6 +426,7 @@ def get_course(course_id):
     return cors_headers(jsonify(course))
 
 @app.route('/api/courses', methods=['POST'])
+@bulkhead('catalog')
 def create_course():
     data = request.get_json()
     try:
@@ -329,6 +436,7 @@ def create_course():
         return cors_headers(jsonify({'error': str(e)})), 400
 
 @app.route('/api/courses/<course_id>', methods=['PUT'])
+@bulkhead('catalog')
 def update_course(course_id):
     data = request.get_json()
     course = CourseModel.update(course_id, data)
@@ -337,6 +445,7 @@ def update_course(course_id):
     return cors_headers(jsonify({'error': 'Course not found'})), 404
 
 @app.route('/api/courses/<course_id>', methods=['DELETE'])
+@bulkhead('catalog')
 def delete_course(course_id):
     success = CourseModel.delete(course_id)
     if success:
@@ -345,6 +454,7 @@ def delete_course(course_id):
 
 # Lessons API
 @app.route('/api/lessons', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_lessons():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -355,6 +465,7 @@ def get_lessons():
     return cors_headers(jsonify([]))
 
 @app.route('/api/lessons/<lesson_id>', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_lesson(lesson_id):
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -373,6 +484,7 @@ def get_lesson(lesson_id):
     return cors_headers(jsonify(lesson))
 
 @app.route('/api/lessons', methods=['POST'])
+@bulkhead('catalog')
 def create_lesson():
     data = request.get_json()
     try:
@@ -382,6 +494,7 @@ def create_lesson():
         return cors_headers(jsonify({'error': str(e)})), 400
 
 @app.route('/api/lessons/<lesson_id>', methods=['PUT'])
+@bulkhead('catalog')
 def update_lesson(lesson_id):
     data = request.get_json()
     lesson = LessonModel.update(lesson_id, data)
@@ -390,6 +503,7 @@ def update_lesson(lesson_id):
     return cors_headers(jsonify({'error': 'Lesson not found'})), 404
 
 @app.route('/api/lessons/<lesson_id>', methods=['DELETE'])
+@bulkhead('catalog')
 def delete_lesson(lesson_id):
     success = LessonModel.delete(lesson_id)
     if success:
@@ -398,6 +512,7 @@ def delete_lesson(lesson_id):
 
 # Quizzes API
 @app.route('/api/quizzes', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_quizzes():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -414,6 +529,7 @@ def get_quizzes():
     return cors_headers(jsonify(quizzes))
 
 @app.route('/api/quizzes', methods=['POST'])
+@bulkhead('catalog')
 def create_quiz():
     data = request.get_json()
     try:
@@ -423,6 +539,7 @@ def create_quiz():
         return cors_headers(jsonify({'error': str(e)})), 400
 
 @app.route('/api/quizzes/<quiz_id>', methods=['PUT'])
+@bulkhead('catalog')
 def update_quiz(quiz_id):
     data = request.get_json()
     quiz = QuizModel.update(quiz_id, data)
@@ -431,6 +548,7 @@ def update_quiz(quiz_id):
     return cors_headers(jsonify({'error': 'Quiz not found'})), 404
 
 @app.route('/api/quizzes/<quiz_id>', methods=['DELETE'])
+@bulkhead('catalog')
 def delete_quiz(quiz_id):
     success = QuizModel.delete(quiz_id)
     if success:
@@ -439,6 +557,7 @@ def delete_quiz(quiz_id):
 
 # Videos API
 @app.route('/api/videos', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_videos():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -461,6 +580,7 @@ def get_videos():
         return cors_headers(jsonify(videos))
 
 @app.route('/api/videos/upload', methods=['POST'])
+@bulkhead('catalog')
 def upload_video():
     if 'video' not in request.files:
         return cors_headers(jsonify({'error': 'No video file provided'})), 400
@@ -497,6 +617,7 @@ def upload_video():
     return cors_headers(jsonify({'error': 'Invalid file type'})), 400
 
 @app.route('/api/videos/<video_id>', methods=['DELETE'])
+@bulkhead('catalog')
 def delete_video(video_id):
     video = VideoModel.get_by_id(video_id)
     if video:
@@ -518,6 +639,7 @@ def serve_video(filename):
 
 # Student Progress API
 @app.route('/api/progress', methods=['POST', 'OPTIONS'])
+@bulkhead('catalog')
 def save_progress():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -577,6 +699,7 @@ def save_progress():
         return cors_headers(jsonify({'error': 'Failed to save progress'})), 500
 
 @app.route('/api/students/progress', methods=['GET', 'OPTIONS'])
+@bulkhead('catalog')
 def get_student_progress():
     if request.method == 'OPTIONS':
         return cors_headers(jsonify({}))
@@ -644,12 +767,13 @@ def get_student_progress():
     return cors_headers(jsonify(mock_progress))
 
 @app.route('/tts', methods=['POST', 'OPTIONS'])
+@bulkhead('tts')
 def text_to_speech():
     if request.method == 'OPTIONS':
         # Handle preflight request
         response = app.make_default_options_response()
         response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
         return response
 
@@ -665,35 +789,214 @@ def text_to_speech():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
 
-        print(f"Generating speech for text: {text}")  # Debug log
-            
-        # Create gTTS object
-        tts = gTTS(text=text, lang=lang, slow=False)
-        
-        # Save to bytes buffer
-        audio_buffer = BytesIO()
-        tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
+        try:
+            rendition = requested_rendition(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        rate, limited = check_tts_rate([(text, lang)])
+        if limited:
+            return limited
+
+        # Streaming mode: send each sentence's audio as soon as it is ready. Compact
+        # renditions are transcoded from the whole clip, so those clients get the
+        # complete (small) file instead of a stream
+        streaming = data.get('stream') or request.args.get('stream') in ('1', 'true')
+        if streaming and (rendition == STANDARD or not rendition_available(rendition)):
+            # Shed load before the stream starts; once headers are sent we can't 503
+            if tts_admission.overloaded() and not audio_cache.contains(cache_key_for(text, lang, slow=False)):
+                return overloaded_response(TTSOverloadedError('TTS backlog is full', tts_admission.retry_after()))
+            # No stream_with_context: this view runs on a bulkhead thread, and the
+            # generator is consumed on the request thread after the view returns
+            response = Response(stream_speech(text, lang, slow=False), mimetype='audio/mpeg')
+            response.headers['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+            response.headers['Vary'] = 'Save-Data, ECT'
+            response.headers.update(rate.headers())
+            response.headers['Access-Control-Allow-Origin'] = '*'
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+            response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+            return response
+
+        audio, cache_hit = get_or_synthesize(text, lang, slow=False)
+        cache_status = 'HIT' if cache_hit else 'MISS'
+        audio, rendition = get_rendition(cache_key_for(text, lang, slow=False), audio, rendition)
         
         # Create a response with the audio file
         response = send_file(
-            audio_buffer,
-            mimetype='audio/mpeg',
+            BytesIO(audio),
+            mimetype=mimetype(rendition),
             as_attachment=False,
-            download_name='speech.mp3'
+            download_name='speech.ogg' if rendition == 'opus' else 'speech.mp3'
         )
         
+        response.headers['X-Cache'] = cache_status
+        response.headers['Vary'] = 'Save-Data, ECT'
+        response.headers.update(rate.headers())
+        
         # Set CORS headers
         response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
         
         return response
         
+    except (TTSOverloadedError, CircuitOpenError) as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"Error in TTS: {str(e)}")  # Debug log
         return jsonify({'error': str(e)}), 500
 
+# Helper function to pick the audio rendition for a TTS request
+def requested_rendition(data):
+    """Compact rendition for constrained networks: explicit quality, then client hints"""
+    quality = data.get('quality') or request.args.get('quality')
+    if quality is not None and not isinstance(quality, str):
+        raise ValueError('Invalid audio quality')
+    return choose_rendition(quality, request.headers.get('Save-Data'), request.headers.get('ECT'))
+
+# Helper function to build a multipart/form-data body from (name, content_type, body, headers) parts
+def build_multipart(parts):
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, content_type, body, headers in parts:
+        extension = 'ogg' if content_type == 'audio/ogg' else 'mp3'
+        chunks.append(f'--{boundary}\r\n'.encode('ascii'))
+        chunks.append(f'Content-Disposition: form-data; name="{name}"; filename="{name}.{extension}"\r\n'.encode('ascii'))
+        chunks.append(f'Content-Type: {content_type}\r\n'.encode('ascii'))
+        for header, value in headers.items():
+            chunks.append(f'{header}: {value}\r\n'.encode('ascii'))
+        chunks.append(b'\r\n')
+        chunks.append(body)
+        chunks.append(b'\r\n')
+    chunks.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return b''.join(chunks), f'multipart/form-data; boundary={boundary}'
+
+@app.route('/tts/batch', methods=['POST', 'OPTIONS'])
+@bulkhead('tts')
+def text_to_speech_batch():
+    """
+    Synthesize several snippets in one round trip.
+    Body: {"items": [{"text": "...", "lang": "en"}, ...], "quality": "low"} (quality optional)
+    Returns multipart/form-data with one part per item, named by its index,
+    so the browser can read it with `await response.formData()`. Failed items
+    come back as an application/json part with an error message.
+    """
+    if request.method == 'OPTIONS':
+        return cors_headers(jsonify({}))
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return cors_headers(jsonify({'error': 'No items provided'})), 400
+    if len(items) > TTS_BATCH_MAX_ITEMS:
+        return cors_headers(jsonify({'error': f'At most {TTS_BATCH_MAX_ITEMS} items per batch'})), 400
+    
+    batch_items = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('text'):
+            return cors_headers(jsonify({'error': f'Item {index} has no text'})), 400
+        if not isinstance(item['text'], str) or not isinstance(item.get('lang', 'en'), str):
+            return cors_headers(jsonify({'error': f'Item {index} has an invalid text or lang'})), 400
+        batch_items.append((item['text'], item.get('lang', 'en').split('-')[0]))
+    
+    try:
+        rendition = requested_rendition(data)
+    except ValueError as e:
+        return cors_headers(jsonify({'error': str(e)})), 400
+    
+    rate, limited = check_tts_rate(batch_items)
+    if limited:
+        return limited
+    
+    parts = []
+    for index, result in enumerate(synthesize_batch(batch_items)):
+        if 'error' in result:
+            error = {'error': result['error']}
+            if isinstance(result['exception'], (TTSOverloadedError, CircuitOpenError)):
+                error['retryAfter'] = result['exception'].retry_after
+            body = json.dumps(error).encode('utf-8')
+            parts.append((str(index), 'application/json', body, {}))
+        else:
+            text, lang = batch_items[index]
+            audio, part_rendition = get_rendition(cache_key_for(text, lang, slow=False), result['audio'], rendition)
+            headers = {'X-Cache': 'HIT' if result['cache_hit'] else 'MISS'}
+            parts.append((str(index), mimetype(part_rendition), audio, headers))
+    
+    body, content_type = build_multipart(parts)
+    response = Response(body, content_type=content_type)
+    response.headers['Vary'] = 'Save-Data, ECT'
+    response.headers.update(rate.headers())
+    return cors_headers(response)
+
+@app.route('/tts/merged', methods=['POST', 'OPTIONS'])
+@bulkhead('tts')
+def text_to_speech_merged():
+    """
+    Return one MP3 that plays several snippets back to back, e.g. a lesson
+    in English then Tamil for bilingual mode.
+    Body: {"items": [{"text": "...", "lang": "en"}, ...], "gap": seconds, "quality": "low"} (quality optional)
+    """
+    if request.method == 'OPTIONS':
+        return cors_headers(jsonify({}))
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return cors_headers(jsonify({'error': 'No items provided'})), 400
+    if len(items) > TTS_BATCH_MAX_ITEMS:
+        return cors_headers(jsonify({'error': f'At most {TTS_BATCH_MAX_ITEMS} items per request'})), 400
+    
+    merge_items = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('text'):
+            return cors_headers(jsonify({'error': f'Item {index} has no text'})), 400
+        if not isinstance(item['text'], str) or not isinstance(item.get('lang', 'en'), str):
+            return cors_headers(jsonify({'error': f'Item {index} has an invalid text or lang'})), 400
+        merge_items.append((item['text'], item.get('lang', 'en').split('-')[0]))
+    
+    try:
+        rendition = requested_rendition(data)
+    except ValueError as e:
+        return cors_headers(jsonify({'error': str(e)})), 400
+    
+    rate, limited = check_tts_rate(merge_items)
+    if limited:
+        return limited
+    
+    try:
+        gap = min(max(float(data.get('gap', TTS_MERGE_GAP_SECONDS)), 0.0), 5.0)
+    except (TypeError, ValueError):
+        return cors_headers(jsonify({'error': 'Invalid gap'})), 400
+    
+    try:
+        audio, cache_hit = get_or_merge(merge_items, gap)
+        merged_key = make_merged_key([cache_key_for(text, lang, slow=False) for text, lang in merge_items], gap)
+        audio, rendition = get_rendition(merged_key, audio, rendition)
+        response = send_file(
+            BytesIO(audio),
+            mimetype=mimetype(rendition),
+            as_attachment=False,
+            download_name='speech.ogg' if rendition == 'opus' else 'speech.mp3'
+        )
+        response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        response.headers['Vary'] = 'Save-Data, ECT'
+        response.headers.update(rate.headers())
+        return cors_headers(response)
+    except (TTSOverloadedError, CircuitOpenError) as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"Error in merged TTS: {str(e)}")
+        return cors_headers(jsonify({'error': str(e)})), 500
+
+@app.route('/tts/cache/stats', methods=['GET'])
+def tts_cache_stats():
+    return cors_headers(jsonify(dict(audio_cache.stats(), admission=tts_admission.stats(), breakers=breaker_stats(),
+                                     hedging=hedger_stats(), rate_limits=tts_rate_limiter.stats())))
+
+@app.route('/bulkheads/stats', methods=['GET'])
+def bulkhead_stats():
+    return cors_headers(jsonify({name: pool.stats() for name, pool in bulkheads.items()}))
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=True, port=port, host='0.0.0.0')
@@ -0,0 +1,134 @@
+"""
+Bulkheads: separate, bounded thread pools per class of work.
+
+Request threads are shared by every route, so without isolation a slow TTS
+engine or a burst of password hashing can hold all of them and stall course
+browsing. Each class of work instead runs on its own pool:
+
+- tts: engine-bound synthesis routes
+- catalog: Mongo-bound course, lesson, quiz, video and progress routes
+- hashing: CPU-bound password hashing
+
+A pool accepts at most ``workers + max_queue`` pending calls. Beyond that,
+calls are rejected at once with BulkheadFullError.
+
+The request thread waits for the pool's result, so every pending call also
+holds one of the WSGI server's request threads. Isolation therefore only
+holds while the pools together cannot pin all of them. Set WSGI_THREADS to
+the number of request threads per process (e.g. gunicorn --threads). The
+pools' pending limits are then scaled down to fit within it, keeping
+WSGI_RESERVED_THREADS free for unpooled routes. Without WSGI_THREADS the
+server is assumed to start a thread per request, as the Flask development
+server does.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+
+class BulkheadFullError(RuntimeError):
+    """Raised when a bulkhead has no room for more work"""
+
+    def __init__(self, name: str, message: str):
+        super().__init__(message)
+        self.name = name
+
+
+class Bulkhead:
+    """A named thread pool with a bounded backlog and its own metrics"""
+
+    def __init__(self, name: str, workers: int, max_queue: int, timeout: float):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.max_pending = self.workers + self.max_queue  # May be lowered by limit_to_threads()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'bulkhead-{name}')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'completed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0}
+        self._busy_seconds = 0.0
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            self._stats['failed' if future.exception() is not None else 'completed'] += 1
+
+    def _timed(self, fn, args, kwargs):
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._busy_seconds += elapsed
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on this bulkhead's pool and wait for its result"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise BulkheadFullError(self.name, f'{self.name} is at capacity')
+            self._pending += 1
+        future = self._executor.submit(self._timed, fn, args, kwargs)
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            future.cancel()
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise BulkheadFullError(self.name, f'{self.name} did not finish in {self.timeout:g}s')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                pending=self._pending,
+                workers=self.workers,
+                max_queue=self.max_queue,
+                max_pending=self.max_pending,
+                busy_seconds=round(self._busy_seconds, 3),
+            )
+
+
+def _bulkhead(name: str, workers: int, max_queue: int, timeout: float) -> Bulkhead:
+    prefix = f'BULKHEAD_{name.upper()}_'
+    return Bulkhead(
+        name,
+        workers=int(os.getenv(prefix + 'WORKERS', workers)),
+        max_queue=int(os.getenv(prefix + 'QUEUE', max_queue)),
+        timeout=float(os.getenv(prefix + 'TIMEOUT_SECONDS', timeout)),
+    )
+
+
+def limit_to_threads(pools, threads: int, reserved: int):
+    """
+    Scale the pools' pending limits down so that together they hold at most
+    `threads - reserved` request threads
+    """
+    budget = max(len(pools), threads - reserved)
+    total = sum(pool.max_pending for pool in pools)
+    if total <= budget:
+        return
+    for pool in pools:
+        pool.max_pending = max(1, pool.max_pending * budget // total)
+    print(f"⚠️  Bulkheads could pin {total} of {threads} request threads; "
+          f"limited to {', '.join(f'{pool.name}={pool.max_pending}' for pool in pools)}")
+
+
+bulkheads = {
+    'tts': _bulkhead('tts', workers=16, max_queue=32, timeout=120),
+    'catalog': _bulkhead('catalog', workers=16, max_queue=64, timeout=15),
+    'hashing': _bulkhead('hashing', workers=os.cpu_count() or 2, max_queue=32, timeout=10),
+}
+
+if os.getenv('WSGI_THREADS'):
+    limit_to_threads(
+        list(bulkheads.values()),
+        threads=int(os.getenv('WSGI_THREADS')),
+        reserved=int(os.getenv('WSGI_RESERVED_THREADS', 4)),
+    )
@@ -0,0 +1,203 @@
+"""
+Declarative MongoDB index registry.
+
+Every index the hot query paths depend on is listed in INDEXES, next to the
+query it serves. ensure_indexes() creates whatever is missing and is safe to
+run on every start: an index that already exists with the same definition
+is left alone.
+
+Indexes that exist under the registered name but with a different
+definition (other keys, lost unique flag, ...) are reported as drift and not
+touched, because rebuilding an index on a live collection is an operator
+decision. Indexes on registered collections that are not in the registry are
+reported as unmanaged.
+
+Usage:
+    python db_indexes.py [--check] [--progress-interval 5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+MONGO_ENSURE_INDEXES = os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() not in ('0', 'false', 'no')
+
+
+class IndexSpec:
+    """One index: collection, key pattern and the options that matter for drift"""
+
+    def __init__(self, collection: str, keys: Sequence[Tuple[str, int]], unique: bool = False,
+                 partial: Optional[Dict[str, Any]] = None, serves: str = ''):
+        self.collection = collection
+        self.keys = list(keys)
+        self.unique = unique
+        self.partial = partial
+        self.serves = serves  # The query this index exists for, shown in reports
+        self.name = '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+
+    def options(self) -> Dict[str, Any]:
+        options = {'name': self.name, 'unique': self.unique}
+        if self.partial:
+            options['partialFilterExpression'] = self.partial
+        return options
+
+
+INDEXES = [
+    IndexSpec('users', [('email', ASCENDING)], unique=True,
+              serves="users.find_one({'email'}) at signup and login"),
+    IndexSpec('lessons', [('courseId', ASCENDING), ('order', ASCENDING)],
+              serves="LessonModel.get_by_course: find({'courseId'}).sort('order')"),
+    IndexSpec('videos', [('lessonId', ASCENDING)],
+              serves="VideoModel.get_by_lesson"),
+    IndexSpec('videos', [('courseId', ASCENDING)],
+              serves='VideoModel.get_by_course and course deletes'),
+    IndexSpec('quizzes', [('lessonId', ASCENDING)],
+              serves='QuizModel.get_by_lesson'),
+    IndexSpec('quizzes', [('courseId', ASCENDING)],
+              serves='QuizModel.get_by_course and course deletes'),
+    IndexSpec('student_progress', [('userId', ASCENDING), ('courseId', ASCENDING)], unique=True,
+              serves="progress upsert on {'userId', 'courseId'}"),
+]
+
+
+def _normalize_keys(keys) -> List[Tuple[str, Any]]:
+    # index_information() reports directions as floats (1.0)
+    return [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys]
+
+
+def _drift(spec: IndexSpec, live: Dict[str, Any]) -> List[str]:
+    """Differences between a registered index and the live one with the same name"""
+    problems = []
+    if _normalize_keys(live['key']) != spec.keys:
+        problems.append(f"keys {_normalize_keys(live['key'])} != {spec.keys}")
+    if bool(live.get('unique')) != spec.unique:
+        problems.append(f"unique={bool(live.get('unique'))}, expected {spec.unique}")
+    if live.get('partialFilterExpression') != spec.partial:
+        problems.append(f"partialFilterExpression={live.get('partialFilterExpression')}, expected {spec.partial}")
+    return problems
+
+
+def check_indexes(db, indexes: Sequence[IndexSpec] = INDEXES) -> List[Dict[str, Any]]:
+    """
+    Compare the registry with the database without changing anything.
+    Returns one entry per index with status ok, missing, drift or unmanaged.
+    """
+    report = []
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in indexes:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection_name, specs in by_collection.items():
+        live_indexes = db[collection_name].index_information()
+        for spec in specs:
+            entry = {'collection': collection_name, 'name': spec.name, 'serves': spec.serves}
+            live = live_indexes.get(spec.name)
+            if live is None:
+                entry['status'] = 'missing'
+            else:
+                problems = _drift(spec, live)
+                entry['status'] = 'drift' if problems else 'ok'
+                if problems:
+                    entry['detail'] = '; '.join(problems)
+            report.append(entry)
+
+        registered = {spec.name for spec in specs}
+        for name in live_indexes:
+            if name != '_id_' and name not in registered:
+                report.append({'collection': collection_name, 'name': name, 'status': 'unmanaged'})
+    return report
+
+
+def index_builds_in_progress(db) -> List[str]:
+    """Describe index builds currently running on the server (from currentOp)"""
+    try:
+        result = db.client.admin.command('currentOp', {
+            '$or': [{'command.createIndexes': {'$exists': True}}, {'msg': {'$regex': '^Index Build'}}]
+        })
+    except OperationFailure:
+        return []  # currentOp needs the inprog privilege
+    builds = []
+    for op in result.get('inprog', []):
+        progress = op.get('progress') or {}
+        namespace = op.get('ns', '?')
+        if progress.get('total'):
+            builds.append(f"{namespace}: {op.get('msg', 'building')} "
+                          f"({progress.get('done', 0)}/{progress['total']})")
+        else:
+            builds.append(f"{namespace}: {op.get('msg', 'building')}")
+    return builds
+
+
+def _watch_builds(db, stop: threading.Event, interval: float, log):
+    while not stop.wait(interval):
+        for line in index_builds_in_progress(db):
+            log(f"   ⏳ {line}")
+
+
+def ensure_indexes(db, indexes: Sequence[IndexSpec] = INDEXES, progress_interval: float = 0, log=print):
+    """
+    Create missing registry indexes and return the check_indexes() report with
+    the outcome of each build. Builds that fail (e.g. duplicate emails block a
+    unique index) are reported as failed instead of raising.
+    """
+    report = check_indexes(db, indexes)
+    specs = {(spec.collection, spec.name): spec for spec in indexes}
+
+    for entry in report:
+        if entry['status'] == 'drift':
+            log(f"⚠️  Index drift on {entry['collection']}.{entry['name']}: {entry['detail']}")
+        if entry['status'] != 'missing':
+            continue
+
+        spec = specs[(entry['collection'], entry['name'])]
+        log(f"🔨 Building index {spec.collection}.{spec.name} for {spec.serves}")
+        stop = threading.Event()
+        if progress_interval > 0:
+            threading.Thread(
+                target=_watch_builds, args=(db, stop, progress_interval, log), daemon=True
+            ).start()
+        started = time.monotonic()
+        try:
+            db[spec.collection].create_index(spec.keys, **spec.options())
+            entry['status'] = 'created'
+            log(f"   ✅ Built {spec.collection}.{spec.name} in {time.monotonic() - started:.1f}s")
+        except OperationFailure as e:
+            entry['status'] = 'failed'
+            entry['detail'] = str(e)
+            log(f"   ❌ Could not build {spec.collection}.{spec.name}: {e}")
+        finally:
+            stop.set()
+    return report
+
+
+def print_report(report):
+    for entry in report:
+        line = f"{entry['status']:>9}  {entry['collection']}.{entry['name']}"
+        if entry.get('detail'):
+            line += f"  ({entry['detail']})"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply or check the MongoDB index registry')
+    parser.add_argument('--check', action='store_true', help='Only report missing and drifted indexes')
+    parser.add_argument('--progress-interval', type=float, default=5,
+                        help='Seconds between build progress reports (0 to disable)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from models import db
+
+    if args.check:
+        report = check_indexes(db)
+    else:
+        report = ensure_indexes(db, progress_interval=args.progress_interval)
+    print()
+    print_report(report)
+    bad = [entry for entry in report if entry['status'] in ('missing', 'drift', 'failed')]
+    sys.exit(1 if bad else 0)
@@ -0,0 +1,209 @@
+"""
+Password hashing with a calibrated work factor.
+
+Both backends store password hashes, in different formats:
+
+- bcrypt: ``$2b$<rounds>$...`` (FastAPI, formerly through passlib)
+- werkzeug: ``pbkdf2:sha256:<iterations>$salt$hex`` and
+  ``scrypt:<n>:<r>:<p>$salt$hex`` (Flask, generate_password_hash)
+
+PasswordHasher verifies all of them and writes new hashes in one scheme
+with one cost. The cost is either fixed (PASSWORD_HASH_COST) or calibrated
+at startup: the highest work factor whose hash time stays within
+PASSWORD_HASH_TARGET_MS on this machine, clamped to a per-scheme floor and
+ceiling.
+
+verify_and_update() also returns a fresh hash when the stored one uses
+another scheme or a lower cost, so callers can rehash on a successful
+login. Hashes with a higher cost are kept. Otherwise two workers that
+calibrated slightly differently would keep rehashing each other's output.
+
+Usage (print the calibrated cost for this machine):
+    python passwords.py [--scheme bcrypt] [--target-ms 250]
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import secrets
+import string
+import time
+from typing import Optional, Tuple
+
+import bcrypt
+
+BCRYPT = 'bcrypt'
+PBKDF2 = 'pbkdf2:sha256'
+SCRYPT = 'scrypt'
+
+# Cost meaning per scheme: bcrypt log2 rounds, pbkdf2 iterations, scrypt log2 N
+DEFAULT_COST = {BCRYPT: 12, PBKDF2: 600000, SCRYPT: 15}
+MIN_COST = {BCRYPT: 10, PBKDF2: 210000, SCRYPT: 14}
+# scrypt needs 128 * r * N bytes per hash (128 MiB at N=2^17), and the
+# hashing pools run several at once, so its ceiling is set by memory, not time
+MAX_COST = {BCRYPT: 16, PBKDF2: 5000000, SCRYPT: 17}
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+_SALT_CHARS = string.ascii_letters + string.digits
+
+
+def _bcrypt_bytes(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes; cut on a character boundary like before
+    return password.encode('utf-8')[:72].decode('utf-8', errors='ignore').encode('utf-8')
+
+
+def _scrypt(password: str, salt: str, n: int, r: int, p: int) -> str:
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p, maxmem=132 * n * r * p
+    ).hex()
+
+
+def _pbkdf2(password: str, salt: str, hash_name: str, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac(hash_name, password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+def identify(stored: Optional[str]) -> Tuple[Optional[str], int]:
+    """Return (scheme, cost) of a stored hash, or (None, 0) if unrecognized"""
+    if not stored:
+        return None, 0
+    try:
+        if stored.startswith(('$2a$', '$2b$', '$2y$')):
+            return BCRYPT, int(stored[4:6])
+        method = stored.split('$', 1)[0]
+        if method.startswith('pbkdf2:'):
+            _, hash_name, iterations = method.split(':')
+            return f'pbkdf2:{hash_name}', int(iterations)
+        if method.startswith('scrypt:'):
+            _, n, _, _ = method.split(':')
+            return SCRYPT, int(n).bit_length() - 1
+    except ValueError:
+        pass
+    return None, 0
+
+
+def verify(password: str, stored: Optional[str]) -> bool:
+    """Check a password against a bcrypt or werkzeug hash"""
+    scheme, _ = identify(stored)
+    if scheme is None:
+        return False
+    try:
+        if scheme == BCRYPT:
+            return bcrypt.checkpw(_bcrypt_bytes(password), stored.encode('utf-8'))
+        method, salt, expected = stored.split('$', 2)
+        parts = method.split(':')
+        if scheme == SCRYPT:
+            actual = _scrypt(password, salt, int(parts[1]), int(parts[2]), int(parts[3]))
+        else:
+            actual = _pbkdf2(password, salt, parts[1], int(parts[2]))
+    except ValueError:
+        return False  # Malformed hash or unsupported parameters
+    return hmac.compare_digest(actual, expected)
+
+
+class PasswordHasher:
+    """Writes hashes in one scheme and cost; verifies every supported format"""
+
+    def __init__(self, scheme: str, cost: Optional[int] = None):
+        if scheme not in DEFAULT_COST:
+            raise ValueError(f'Unknown password hash scheme: {scheme}')
+        self.scheme = scheme
+        self.cost = cost or DEFAULT_COST[scheme]
+
+    def hash(self, password: str) -> str:
+        return hash_with(self.scheme, self.cost, password)
+
+    def verify(self, password: str, stored: Optional[str]) -> bool:
+        return verify(password, stored)
+
+    def needs_rehash(self, stored: Optional[str]) -> bool:
+        scheme, cost = identify(stored)
+        return scheme != self.scheme or cost < self.cost
+
+    def verify_and_update(self, password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Verify; on success also return a new hash if the stored one is outdated"""
+        if not self.verify(password, stored):
+            return False, None
+        return True, (self.hash(password) if self.needs_rehash(stored) else None)
+
+    def calibrate(self, target_ms: float) -> dict:
+        """Set cost to what meets target_ms here; returns the measurements"""
+        self.cost, timings = calibrate(self.scheme, target_ms)
+        return timings
+
+
+def hash_with(scheme: str, cost: int, password: str) -> str:
+    if scheme == BCRYPT:
+        return bcrypt.hashpw(_bcrypt_bytes(password), bcrypt.gensalt(rounds=cost)).decode('utf-8')
+    salt = ''.join(secrets.choice(_SALT_CHARS) for _ in range(16))
+    if scheme == SCRYPT:
+        n = 2 ** cost
+        return f'scrypt:{n}:{SCRYPT_R}:{SCRYPT_P}${salt}${_scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)}'
+    return f'{scheme}:{cost}${salt}${_pbkdf2(password, salt, scheme.split(":")[1], cost)}'
+
+
+def _time_hash(scheme: str, cost: int) -> float:
+    """Best of three hash times in milliseconds"""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        hash_with(scheme, cost, 'calibration-password')
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def calibrate(scheme: str, target_ms: float) -> Tuple[int, dict]:
+    """
+    Return the highest cost whose hash time fits target_ms on this machine
+    (never below MIN_COST), plus the measured {cost: ms}.
+    """
+    floor, ceiling = MIN_COST[scheme], MAX_COST[scheme]
+    timings = {floor: _time_hash(scheme, floor)}
+    if scheme == PBKDF2:
+        # Time is linear in iterations; round down to 10k
+        cost = int(floor * target_ms / timings[floor]) // 10000 * 10000
+        cost = min(max(cost, floor), ceiling)
+        timings[cost] = _time_hash(scheme, cost)
+        if timings[cost] > target_ms and cost > floor:
+            cost = max(floor, int(cost * target_ms / timings[cost]) // 10000 * 10000)
+            timings[cost] = _time_hash(scheme, cost)
+        return cost, timings
+
+    # bcrypt and scrypt double per step; stop before the next step overshoots
+    cost = floor
+    while cost < ceiling and timings[cost] * 2 <= target_ms:
+        cost += 1
+        timings[cost] = _time_hash(scheme, cost)
+        if timings[cost] > target_ms:
+            cost -= 1
+            break
+    return cost, timings
+
+
+def hasher_from_env(default_scheme: str) -> PasswordHasher:
+    """Build the hasher from PASSWORD_HASH_SCHEME and PASSWORD_HASH_COST"""
+    cost = os.getenv('PASSWORD_HASH_COST')
+    return PasswordHasher(os.getenv('PASSWORD_HASH_SCHEME', default_scheme), int(cost) if cost else None)
+
+
+def calibrate_from_env(hasher: PasswordHasher, log=print):
+    """Calibrate to PASSWORD_HASH_TARGET_MS unless PASSWORD_HASH_COST fixes the cost"""
+    if os.getenv('PASSWORD_HASH_COST'):
+        return
+    target_ms = float(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+    timings = hasher.calibrate(target_ms)
+    log(f"Password hashing: {hasher.scheme} cost {hasher.cost} "
+        f"({timings.get(hasher.cost, 0):.0f}ms, target {target_ms:.0f}ms)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibrate the password hash cost for this machine')
+    parser.add_argument('--scheme', default=BCRYPT, choices=sorted(DEFAULT_COST))
+    parser.add_argument('--target-ms', type=float, default=250, help='Target hash/verify time')
+    args = parser.parse_args()
+
+    cost, timings = calibrate(args.scheme, args.target_ms)
+    for measured_cost, ms in sorted(timings.items()):
+        print(f"   {args.scheme} cost {measured_cost}: {ms:.0f}ms")
+    print(f"\nPASSWORD_HASH_SCHEME={args.scheme}")
+    print(f"PASSWORD_HASH_COST={cost}")
@@ -0,0 +1,133 @@
+"""
+Script to pre-render lesson and quiz audio into the TTS cache
+
+Walks the lessons and quizzes collections and synthesizes every text field
+in its own language through a bounded thread pool. Clips are stored and
+pinned in the content-addressed cache, so normal traffic never evicts them
+and a field whose text has not changed since the last run is skipped.
+Clips pinned for text that no longer exists (an edited or deleted field)
+are unpinned, so the LRU can reclaim them.
+
+Usage:
+    python prerender_audio.py [--workers 4] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Fix Unicode encoding for Windows console
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import lessons_collection, quizzes_collection
+from tts_cache import audio_cache, normalize_text
+from tts_service import cache_key_for, synthesize_chunked
+
+# (field, lang) pairs rendered for every lesson document
+LESSON_FIELDS = [
+    ('title', 'en'),
+    ('titleTamil', 'ta'),
+    ('content', 'en'),
+    ('contentTamil', 'ta'),
+]
+
+
+def lesson_texts(lesson):
+    """Yield (field, lang, text) for every speakable lesson field"""
+    for field, lang in LESSON_FIELDS:
+        yield field, lang, lesson.get(field)
+
+
+def quiz_texts(quiz):
+    """Yield (field, lang, text) for a quiz title, questions and options"""
+    yield 'title', 'en', quiz.get('title')
+    for i, question in enumerate(quiz.get('questions') or []):
+        yield f'questions.{i}.question', 'en', question.get('question')
+        yield f'questions.{i}.questionTamil', 'ta', question.get('questionTamil')
+        for j, option in enumerate(question.get('options') or []):
+            if isinstance(option, dict):
+                yield f'questions.{i}.options.{j}', 'en', option.get('text')
+                yield f'questions.{i}.options.{j}.textTamil', 'ta', option.get('textTamil')
+            else:
+                yield f'questions.{i}.options.{j}', 'en', option
+
+
+def collect_jobs():
+    """Build one render job per distinct content hash"""
+    jobs = {}
+    sources = [('lessons', lessons_collection, lesson_texts), ('quizzes', quizzes_collection, quiz_texts)]
+    for name, collection, extract in sources:
+        for doc in collection.find():
+            for field, lang, text in extract(doc):
+                if not isinstance(text, str) or not normalize_text(text):
+                    continue
+                key = cache_key_for(text, lang)
+                jobs.setdefault(key, {
+                    'key': key,
+                    'text': text,
+                    'lang': lang,
+                    'source': f"{name}/{doc['_id']}/{field}",
+                })
+    return list(jobs.values())
+
+
+def render_job(job):
+    """Render one job; returns 'rendered', 'unchanged' or 'failed'"""
+    if audio_cache.pin(job['key']):
+        return 'unchanged'
+    try:
+        audio = synthesize_chunked(job['text'], job['lang'])
+        audio_cache.put(job['key'], audio, pinned=True)
+        print(f"   ✅ Rendered {job['source']} ({job['lang']}, {len(audio)} bytes)")
+        return 'rendered'
+    except Exception as e:
+        print(f"   ❌ Failed {job['source']}: {str(e)}")
+        return 'failed'
+
+
+def unpin_stale(jobs, dry_run=False):
+    """Unpin clips whose text is no longer in any lesson or quiz; returns how many"""
+    current = {job['key'] for job in jobs}
+    stale = audio_cache.pinned_keys() - current
+    if not dry_run:
+        for key in stale:
+            audio_cache.unpin(key)
+    return len(stale)
+
+
+def prerender(workers, dry_run=False):
+    jobs = collect_jobs()
+    print(f"\n📦 {len(jobs)} distinct text fields to check")
+
+    if dry_run:
+        pending = [job for job in jobs if not audio_cache.contains(job['key'])]
+        for job in pending:
+            print(f"   Would render {job['source']} ({job['lang']})")
+        print(f"\nWould render: {len(pending)}  Unchanged: {len(jobs) - len(pending)}  "
+              f"Would unpin: {unpin_stale(jobs, dry_run=True)}")
+        return True
+
+    counts = {'rendered': 0, 'unchanged': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for outcome in executor.map(render_job, jobs):
+            counts[outcome] += 1
+
+    unpinned = unpin_stale(jobs)
+    print(f"\nRendered: {counts['rendered']}  Unchanged: {counts['unchanged']}  Failed: {counts['failed']}  "
+          f"Unpinned: {unpinned}")
+    return counts['failed'] == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render lesson and quiz audio')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent synthesis jobs')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be rendered')
+    args = parser.parse_args()
+
+    ok = prerender(max(1, args.workers), args.dry_run)
+    sys.exit(0 if ok else 1)
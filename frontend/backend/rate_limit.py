@@ -0,0 +1,184 @@
+"""
+Token-bucket rate limiting for TTS requests.
+
+Every client (the user id from the JWT, else the client IP) has a bucket
+that holds up to ``burst`` tokens and refills at ``per_minute``. A global
+bucket caps total synthesis across all clients. Requests spend tokens
+according to their cost: a cache hit is much cheaper than a miss that has
+to be synthesized.
+
+Bucket state lives behind a small store interface:
+
+- MongoBucketStore keeps buckets in a shared collection and updates them
+  atomically, so limits hold across every worker process
+- LocalBucketStore keeps them in memory, for tests and single-process runs
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from pymongo import ReturnDocument
+
+# Rate limit configuration
+TTS_RATE_LIMIT_BACKEND = os.getenv('TTS_RATE_LIMIT_BACKEND', 'mongo')  # mongo or local
+TTS_RATE_CLIENT_BURST = float(os.getenv('TTS_RATE_CLIENT_BURST', 30))
+TTS_RATE_CLIENT_PER_MINUTE = float(os.getenv('TTS_RATE_CLIENT_PER_MINUTE', 60))
+TTS_RATE_GLOBAL_BURST = float(os.getenv('TTS_RATE_GLOBAL_BURST', 100))
+TTS_RATE_GLOBAL_PER_MINUTE = float(os.getenv('TTS_RATE_GLOBAL_PER_MINUTE', 600))
+TTS_RATE_HIT_COST = float(os.getenv('TTS_RATE_HIT_COST', 0.1))  # Cost of a cached clip; a miss costs 1
+
+
+class LocalBucketStore:
+    """In-process bucket store"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated at)
+
+    def take(self, key: str, cost: float, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        """Refill, then spend `cost` tokens if available; returns (allowed, tokens left)"""
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+    def refund(self, key: str, amount: float, capacity: float):
+        """Give back tokens spent by a request that was then refused elsewhere"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + amount), updated_at)
+
+
+class MongoBucketStore:
+    """Bucket store shared by every worker through one Mongo collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    def take(self, key: str, cost: float, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        """Refill, then spend `cost` tokens if available; returns (allowed, tokens left)"""
+        if not self._indexed:
+            # Idle buckets are full again by expires_at, so they can simply be dropped
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            self._indexed = True
+        now = time.time()
+        refill_seconds = capacity / refill_per_second if refill_per_second else 86400
+        # One atomic pipeline update: refill by elapsed time, then spend if there is enough
+        doc = self.collection.find_one_and_update(
+            {'_id': key},
+            [
+                {'$set': {'tokens': {'$min': [capacity, {'$add': [
+                    {'$ifNull': ['$tokens', capacity]},
+                    {'$multiply': [{'$subtract': [now, {'$ifNull': ['$updated_at', now]}]}, refill_per_second]},
+                ]}]}}},
+                {'$set': {'allowed': {'$gte': ['$tokens', cost]}}},
+                {'$set': {
+                    'tokens': {'$cond': ['$allowed', {'$subtract': ['$tokens', cost]}, '$tokens']},
+                    'updated_at': now,
+                    'expires_at': datetime.utcnow() + timedelta(seconds=refill_seconds),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc['allowed'], doc['tokens']
+
+    def refund(self, key: str, amount: float, capacity: float):
+        """Give back tokens spent by a request that was then refused elsewhere"""
+        self.collection.update_one(
+            {'_id': key},
+            [{'$set': {'tokens': {'$min': [capacity, {'$add': ['$tokens', amount]}]}}}],
+        )
+
+
+class RateLimitResult:
+    """Outcome of a rate limit check, with the headers to send back"""
+
+    def __init__(self, allowed: bool, limit: float, remaining: float, refill_per_second: float, cost: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        missing = max(0.0, (cost if not allowed else 0.0) - remaining)
+        self.retry_after = math.ceil(missing / refill_per_second) if refill_per_second else 60
+        self.reset_after = math.ceil((limit - remaining) / refill_per_second) if refill_per_second else 60
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            'RateLimit-Limit': str(int(self.limit)),
+            'RateLimit-Remaining': str(int(self.remaining)),
+            'RateLimit-Reset': str(self.reset_after),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, self.retry_after))
+        return headers
+
+
+class TokenBucketLimiter:
+    """Per-client and global token buckets over a pluggable store"""
+
+    def __init__(self, store, client_burst: float, client_per_minute: float,
+                 global_burst: float, global_per_minute: float):
+        self.store = store
+        self.client_burst = client_burst
+        self.client_rate = client_per_minute / 60
+        self.global_burst = global_burst
+        self.global_rate = global_per_minute / 60
+        self._stats = {'allowed': 0, 'limited_client': 0, 'limited_global': 0, 'errors': 0}
+
+    def check(self, client_key: str, cost: float, synthesis_cost: float = 0.0) -> RateLimitResult:
+        """
+        Spend `cost` from the client's bucket and `synthesis_cost` (the part
+        of the request that needs synthesis) from the global bucket. When the
+        global bucket refuses, the client's tokens are refunded. If the store
+        is unreachable, the request is allowed.
+        """
+        try:
+            allowed, remaining = self.store.take(f'client:{client_key}', cost, self.client_burst, self.client_rate)
+            result = RateLimitResult(allowed, self.client_burst, remaining, self.client_rate, cost)
+            if not allowed:
+                self._stats['limited_client'] += 1
+                return result
+            if synthesis_cost > 0:
+                allowed, remaining = self.store.take('global', synthesis_cost, self.global_burst, self.global_rate)
+                if not allowed:
+                    self._stats['limited_global'] += 1
+                    self._refund_client(client_key, cost)
+                    return RateLimitResult(False, self.global_burst, remaining, self.global_rate, synthesis_cost)
+        except Exception as e:
+            print(f"Rate limit store unavailable: {str(e)}")
+            self._stats['errors'] += 1
+            return RateLimitResult(True, self.client_burst, self.client_burst, self.client_rate, cost)
+        self._stats['allowed'] += 1
+        return result
+
+    def _refund_client(self, client_key: str, cost: float):
+        # The request was refused, so it must not count against the client
+        try:
+            self.store.refund(f'client:{client_key}', cost, self.client_burst)
+        except Exception as e:
+            print(f"Rate limit refund failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+def make_limiter(db) -> TokenBucketLimiter:
+    """Build the TTS limiter on the configured store"""
+    store = LocalBucketStore() if TTS_RATE_LIMIT_BACKEND == 'local' else MongoBucketStore(db['tts_rate_limits'])
+    return TokenBucketLimiter(
+        store,
+        client_burst=TTS_RATE_CLIENT_BURST,
+        client_per_minute=TTS_RATE_CLIENT_PER_MINUTE,
+        global_burst=TTS_RATE_GLOBAL_BURST,
+        global_per_minute=TTS_RATE_GLOBAL_PER_MINUTE,
+    )
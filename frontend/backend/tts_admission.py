@@ -0,0 +1,91 @@
+"""
+Admission control for TTS synthesis.
+
+Only cache misses that actually call an engine pass through here. At most
+``limit`` syntheses run at once. Up to ``max_queue`` more wait for a slot,
+each for at most ``queue_timeout`` seconds. Anything beyond that is rejected
+at once with TTSOverloadedError, which the endpoints turn into
+503 + Retry-After. A slow engine then costs some requests a fast 503 instead
+of tying up every request thread.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Admission configuration
+TTS_MAX_CONCURRENT = int(os.getenv('TTS_MAX_CONCURRENT', 8))  # Syntheses running at once
+TTS_MAX_QUEUE = int(os.getenv('TTS_MAX_QUEUE', 16))  # Syntheses allowed to wait for a slot
+TTS_QUEUE_TIMEOUT_SECONDS = float(os.getenv('TTS_QUEUE_TIMEOUT_SECONDS', 5))  # Longest wait for a slot
+
+
+class TTSOverloadedError(RuntimeError):
+    """Raised when synthesis is shed because the backlog is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-limited wait queue"""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self._avg_seconds = 1.0  # Moving average of synthesis time, for Retry-After
+        self._stats = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil((self.waiting + 1) * self._avg_seconds / self.limit))
+
+    def overloaded(self) -> bool:
+        """True when a new caller would be rejected right now"""
+        with self._cond:
+            return self.active >= self.limit and self.waiting >= self.max_queue
+
+    @contextmanager
+    def admit(self):
+        """Hold a synthesis slot for the duration of the block"""
+        with self._cond:
+            if self.active >= self.limit and self.waiting >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise TTSOverloadedError('TTS backlog is full', self.retry_after())
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.limit, timeout=self.queue_timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self._stats['timed_out'] += 1
+                raise TTSOverloadedError('Timed out waiting for a TTS slot', self.retry_after())
+            self.active += 1
+            self._stats['admitted'] += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(
+                self._stats,
+                active=self.active,
+                waiting=self.waiting,
+                limit=self.limit,
+                max_queue=self.max_queue,
+            )
+
+
+tts_admission = AdmissionController(TTS_MAX_CONCURRENT, TTS_MAX_QUEUE, TTS_QUEUE_TIMEOUT_SECONDS)
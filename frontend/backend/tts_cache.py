@@ -0,0 +1,296 @@
+"""
+Content-addressed audio cache for the /tts endpoint.
+
+Clips are stored on disk under a sha256 of (normalized text, lang, slow,
+engine) so repeat requests never go back to the TTS provider. The disk tier
+is bounded by total size and evicts least recently used clips; a small
+in-memory tier keeps the hottest clips out of the filesystem entirely.
+
+Lock files next to the clips let one worker process synthesize a key while
+other processes sharing the directory wait for the result.
+
+Pinned clips (pre-rendered lesson audio) are never evicted. A pin is a
+marker file next to the clip, so pins made by the pre-render script are
+honored by every server process sharing the directory.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+# Cache configuration
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'tts'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512MB on disk
+TTS_CACHE_MEMORY_BYTES = int(os.getenv('TTS_CACHE_MEMORY_BYTES', 32 * 1024 * 1024))  # 32MB hot tier
+
+AUDIO_EXTENSION = '.mp3'
+PIN_EXTENSION = '.pin'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize('NFC', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def make_cache_key(text: str, lang: str, slow: bool, engine: str) -> str:
+    """Build the content hash used to address a clip"""
+    material = '\x1f'.join([normalize_text(text), lang.lower(), '1' if slow else '0', engine])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def make_merged_key(segment_keys: List[str], gap_seconds: float) -> str:
+    """Build the hash for a clip assembled from cached segments"""
+    material = '\x1f'.join(['merge', f'{gap_seconds:.2f}'] + list(segment_keys))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """Size-bounded LRU audio cache with a disk tier and a warm memory tier"""
+
+    def __init__(self, directory: str, max_bytes: int, memory_max_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._lock = threading.Lock()
+        self._index: 'OrderedDict[str, int]' = OrderedDict()  # key -> size on disk
+        self._disk_bytes = 0
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_bytes = 0
+        self._pinned = set()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + AUDIO_EXTENSION)
+
+    def _pin_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + PIN_EXTENSION)
+
+    def _load_index(self):
+        """Rebuild the LRU order from files already on disk (oldest first)"""
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(PIN_EXTENSION):
+                    self._pinned.add(name[:-len(PIN_EXTENSION)])
+                if not name.endswith(AUDIO_EXTENSION):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, name[:-len(AUDIO_EXTENSION)], st.st_size))
+        entries.sort()
+        for _mtime, key, size in entries:
+            self._index[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio for key, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._index:
+                    self._index.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+                self._stats['misses'] += 1
+            return None
+
+        try:
+            # Persist recency so LRU order survives restarts
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            if key not in self._index:
+                # Written by another worker sharing the same directory
+                self._index[key] = len(data)
+                self._disk_bytes += len(data)
+            self._index.move_to_end(key)
+            self._remember(key, data)
+            self._stats['disk_hits'] += 1
+        return data
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """Read a clip without touching recency or hit/miss counters"""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Check whether a clip is on disk without counting a hit or miss"""
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes, pinned: bool = False):
+        """Store audio atomically and evict old entries past the size bound"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if pinned:
+            self._write_pin(key)
+
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._disk_bytes += len(data)
+            self._remember(key, data)
+            self._evict()
+
+    def pin(self, key: str) -> bool:
+        """Exempt a cached clip from eviction; returns False if it is not cached"""
+        if not self.contains(key):
+            return False
+        self._write_pin(key)
+        if not self.contains(key):
+            # Evicted by another process before the pin landed
+            self.unpin(key)
+            return False
+        return True
+
+    def unpin(self, key: str):
+        """Make a pinned clip evictable again"""
+        with self._lock:
+            self._pinned.discard(key)
+        try:
+            os.remove(self._pin_path(key))
+        except FileNotFoundError:
+            pass
+
+    def pinned_keys(self) -> Set[str]:
+        """Keys pinned by any process sharing the directory"""
+        keys = set()
+        for _root, _dirs, files in os.walk(self.directory):
+            keys.update(name[:-len(PIN_EXTENSION)] for name in files if name.endswith(PIN_EXTENSION))
+        return keys
+
+    def _write_pin(self, key: str):
+        path = self._pin_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb'):
+            pass
+        with self._lock:
+            self._pinned.add(key)
+
+    def acquire_lock(self, key: str, stale_after: float) -> bool:
+        """Try to take the cross-process synthesis lock for key"""
+        path = self._path(key) + '.lock'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for _attempt in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode('ascii'))
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    age = time.time() - os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue  # Released between our open and stat; try again
+                if age < stale_after:
+                    return False
+                # The holder died without releasing; take the lock over
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def release_lock(self, key: str):
+        """Release the synthesis lock for key"""
+        try:
+            os.remove(self._path(key) + '.lock')
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current tier sizes"""
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._index),
+                disk_bytes=self._disk_bytes,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                pinned_entries=len(self._pinned),
+            )
+
+    def _remember(self, key: str, data: bytes):
+        """Promote a clip into the memory tier (caller holds the lock)"""
+        if len(data) > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _forget(self, key: str):
+        """Drop a key from both in-process indexes (caller holds the lock)"""
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._memory_bytes -= len(data)
+
+    def _is_pinned(self, key: str) -> bool:
+        """Check for a pin on disk, where other processes pin and unpin (caller holds the lock)"""
+        if os.path.exists(self._pin_path(key)):
+            self._pinned.add(key)
+            return True
+        self._pinned.discard(key)
+        return False
+
+    def _evict(self):
+        """Remove least recently used unpinned clips until under max_bytes (caller holds the lock)"""
+        for key in list(self._index):
+            if self._disk_bytes <= self.max_bytes:
+                break
+            if self._is_pinned(key):
+                continue
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._stats['evictions'] += 1
+
+
+audio_cache = AudioCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES, memory_max_bytes=TTS_CACHE_MEMORY_BYTES)
@@ -0,0 +1,123 @@
+"""
+Pluggable TTS engines.
+
+Every synthesis goes through an engine picked per language from
+TTS_ENGINES (e.g. "en=gtts,ta=espeak"). Languages that are not listed use
+TTS_DEFAULT_ENGINE (gtts). Available engines:
+
+- gtts: Google Translate TTS over the network
+- espeak: on-box synthesis with espeak-ng, encoded to MP3 by ffmpeg
+- silent: a deterministic stand-in that returns silence sized to the text.
+  It needs no network or binaries, which makes it useful for load tests
+  that should measure only our own overhead.
+
+The engine name is part of the cache key, so clips from different engines
+never mix.
+
+Remote engines are guarded by a circuit breaker (see tts_service). While a
+breaker is open, requests are served by TTS_FALLBACK_ENGINE (espeak).
+"""
+import os
+import shutil
+import subprocess
+import threading
+from io import BytesIO
+from typing import Dict
+
+from gtts import gTTS
+
+from mp3_utils import silent_mp3
+
+# Engine configuration
+TTS_DEFAULT_ENGINE = os.getenv('TTS_DEFAULT_ENGINE', 'gtts')
+TTS_FALLBACK_ENGINE = os.getenv('TTS_FALLBACK_ENGINE', 'espeak')  # Used while a remote engine's breaker is open
+TTS_ENGINES = dict(
+    item.split('=', 1) for item in os.getenv('TTS_ENGINES', '').replace(' ', '').split(',') if '=' in item
+)
+
+
+class TTSEngineError(RuntimeError):
+    """Raised when a TTS engine is unknown or not available on this host"""
+
+
+class TTSEngine:
+    """Base class: turn text into MP3 bytes"""
+
+    name = ''
+    remote = False  # True for engines that call out over the network
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    name = 'gtts'
+    remote = True
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        tts = gTTS(text=text, lang=lang, slow=slow)
+        audio_buffer = BytesIO()
+        tts.write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
+
+class EspeakEngine(TTSEngine):
+    name = 'espeak'
+
+    WORDS_PER_MINUTE = 160
+    SLOW_WORDS_PER_MINUTE = 110
+
+    def __init__(self):
+        missing = [tool for tool in ('espeak-ng', 'ffmpeg') if shutil.which(tool) is None]
+        if missing:
+            raise TTSEngineError(f"espeak engine needs {', '.join(missing)} on PATH")
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        wpm = self.SLOW_WORDS_PER_MINUTE if slow else self.WORDS_PER_MINUTE
+        wav = subprocess.run(
+            ['espeak-ng', '-v', lang, '-s', str(wpm), '--stdout', '--stdin'],
+            input=text.encode('utf-8'), capture_output=True, check=True
+        ).stdout
+        return subprocess.run(
+            ['ffmpeg', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0',
+             '-ac', '1', '-codec:a', 'libmp3lame', '-b:a', '48k', '-f', 'mp3', 'pipe:1'],
+            input=wav, capture_output=True, check=True
+        ).stdout
+
+
+class SilentEngine(TTSEngine):
+    name = 'silent'
+
+    SECONDS_PER_CHAR = 0.065  # Roughly conversational speaking rate
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        return silent_mp3(len(text) * self.SECONDS_PER_CHAR * (1.5 if slow else 1.0))
+
+
+ENGINE_TYPES = {cls.name: cls for cls in (GTTSEngine, EspeakEngine, SilentEngine)}
+
+# Engine instances shared by every request in this process
+_engines: Dict[str, TTSEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def engine_name_for(lang: str) -> str:
+    """Return the configured engine name for a language"""
+    return TTS_ENGINES.get(lang, TTS_DEFAULT_ENGINE)
+
+
+def get_engine(name: str) -> TTSEngine:
+    """Return the shared instance of an engine, creating it on first use"""
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine_type = ENGINE_TYPES.get(name)
+            if engine_type is None:
+                raise TTSEngineError(f'Unknown TTS engine: {name}')
+            engine = _engines[name] = engine_type()
+        return engine
+
+
+def engine_for(lang: str) -> TTSEngine:
+    """Return the engine configured for a language"""
+    return get_engine(engine_name_for(lang))
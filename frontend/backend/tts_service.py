@@ -0,0 +1,528 @@
+"""
+TTS synthesis shared by the /tts endpoint and offline tooling.
+
+Everything that produces audio goes through ``get_or_synthesize`` so the
+endpoint and the pre-render script address the cache identically. Synthesis
+itself is delegated to the engine configured for the language (see
+tts_engines).
+
+Long texts are split into sentence chunks that are synthesized in parallel
+on a shared thread pool and stitched back together in order. Each request
+keeps at most ``TTS_CHUNK_CONCURRENCY`` chunks in flight, so one long lesson
+cannot occupy the whole pool.
+
+With the sentence tier on (``TTS_SENTENCE_CACHE``), every sentence is also
+cached under its own key. A text that differs from a cached one by a single
+sentence, or repeats stock phrasing from another lesson, only synthesizes
+the sentences that are new.
+
+Concurrent misses for the same key are coalesced, streamed or not: threads
+in this process wait on the first caller's future (or replay its stream),
+and other processes sharing the cache directory wait on its lock file.
+
+Cache misses that reach an engine are admitted through ``tts_admission``,
+so a slow engine sheds load with TTSOverloadedError instead of piling up
+request threads. A slot is held only while the engine works: cache hits,
+waits on another caller's synthesis and sending a stream to the client
+never take one.
+
+Calls to remote engines can be hedged (see hedging) and go through a
+per-engine circuit breaker. While it is open, misses are served by the
+fallback engine (cached under its own key) instead of waiting on a failing
+provider.
+
+Bilingual playback merges per-language clips into one MP3 at the frame
+level (no re-encode) and caches the result as its own entry.
+"""
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from circuit_breaker import OPEN, CircuitOpenError, breaker_for
+from hedging import Hedger, hedger_for
+from mp3_utils import concat_mp3, silence_like
+from tts_admission import TTSOverloadedError, tts_admission
+from tts_cache import audio_cache, make_cache_key, make_merged_key
+from tts_engines import TTS_FALLBACK_ENGINE, TTSEngine, TTSEngineError, engine_for, engine_name_for, get_engine
+from tts_renditions import STANDARD, rendition_available, rendition_key, transcode
+from tts_text import pack_chunks, split_sentences
+
+# Synthesis configuration
+TTS_SYNTH_WORKERS = int(os.getenv('TTS_SYNTH_WORKERS', 16))  # Shared pool size
+TTS_CHUNK_CONCURRENCY = int(os.getenv('TTS_CHUNK_CONCURRENCY', 4))  # Chunks in flight per request
+TTS_CHUNK_CHARS = int(os.getenv('TTS_CHUNK_CHARS', 200))  # Target chunk size for parallel synthesis
+TTS_LOCK_TTL_SECONDS = int(os.getenv('TTS_LOCK_TTL_SECONDS', 60))  # Max wait on another caller's synthesis
+TTS_BATCH_WORKERS = int(os.getenv('TTS_BATCH_WORKERS', 8))  # Concurrent misses across batch requests
+TTS_MERGE_GAP_SECONDS = float(os.getenv('TTS_MERGE_GAP_SECONDS', 0.8))  # Pause between merged segments
+TTS_HEDGE_WORKERS = int(os.getenv('TTS_HEDGE_WORKERS', 32))  # Remote calls in flight when hedging is on
+TTS_STREAM_WORKERS = int(os.getenv('TTS_STREAM_WORKERS', 8))  # Streamed syntheses producing at once
+TTS_SENTENCE_CACHE = os.getenv('TTS_SENTENCE_CACHE', 'true').lower() not in ('0', 'false', 'no')
+
+synth_executor = ThreadPoolExecutor(max_workers=TTS_SYNTH_WORKERS, thread_name_prefix='tts-synth')
+# Separate pool: batch items wait on chunk futures from synth_executor, so
+# running them there could starve it
+batch_executor = ThreadPoolExecutor(max_workers=TTS_BATCH_WORKERS, thread_name_prefix='tts-batch')
+# Produces streamed audio independently of how fast the client reads it
+stream_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_WORKERS, thread_name_prefix='tts-stream')
+# Runs primary and hedge calls so the caller can wait for whichever finishes first
+hedge_executor = ThreadPoolExecutor(max_workers=TTS_HEDGE_WORKERS, thread_name_prefix='tts-hedge')
+
+# In-process single-flight registry: cache key -> future for the audio
+_inflight: Dict[str, Future] = {}
+# Streamed syntheses in flight (also in _inflight), replayable by later streams
+_streams: Dict[str, '_SegmentFeed'] = {}
+_inflight_lock = threading.Lock()
+
+
+def cache_key_for(text: str, lang: str, slow: bool = False) -> str:
+    """Cache key for a request, including the engine that will serve it"""
+    return make_cache_key(text, lang, slow, engine_name_for(lang))
+
+
+def _guarded_call(engine: TTSEngine, text: str, lang: str, slow: bool) -> Tuple[bytes, float]:
+    """One remote engine call through its circuit breaker; returns (audio, seconds)"""
+    breaker = breaker_for(engine.name)
+    probe = breaker.before_call()
+    started = time.monotonic()
+    try:
+        audio = engine.synthesize(text, lang, slow)
+    except Exception:
+        breaker.record(True, time.monotonic() - started, probe)
+        raise
+    seconds = time.monotonic() - started
+    breaker.record(False, seconds, probe)
+    return audio, seconds
+
+
+def _hedged_call(hedger: Hedger, engine: TTSEngine, text: str, lang: str, slow: bool) -> bytes:
+    """Call the engine, adding a second identical call if the first runs past the hedge delay"""
+    delay = hedger.delay()
+    if delay is None:
+        audio, seconds = _guarded_call(engine, text, lang, slow)
+        hedger.record_latency(seconds)
+        return audio
+
+    primary = hedge_executor.submit(_guarded_call, engine, text, lang, slow)
+    # Primary latencies only, so hedging doesn't skew the percentile it is based on
+    primary.add_done_callback(lambda f: f.exception() is None and hedger.record_latency(f.result()[1]))
+    done, _ = wait([primary], timeout=delay)
+    if done or not hedger.try_hedge():
+        return primary.result()[0]
+
+    hedge = hedge_executor.submit(_guarded_call, engine, text, lang, slow)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                hedger.record_winner(future is hedge)
+                # A running loser can't be interrupted; its result is discarded
+                return future.result()[0]
+    return primary.result()[0]
+
+
+def synthesize_speech(text: str, lang: str, slow: bool = False) -> bytes:
+    """Synthesize MP3 bytes with the engine configured for lang"""
+    engine = engine_for(lang)
+    if not engine.remote:
+        return engine.synthesize(text, lang, slow)
+
+    hedger = hedger_for(engine.name)
+    if hedger is None:
+        return _guarded_call(engine, text, lang, slow)[0]
+    return _hedged_call(hedger, engine, text, lang, slow)
+
+
+def primary_available(lang: str) -> bool:
+    """False while the breaker for lang's remote engine is open"""
+    engine = engine_for(lang)
+    return not engine.remote or breaker_for(engine.name).state != OPEN
+
+
+def synthesize_fallback(text: str, lang: str, slow: bool, error: CircuitOpenError) -> bytes:
+    """
+    Serve a clip from the fallback engine while the primary's breaker is
+    open. Fallback clips are cached under the fallback engine's own key, so
+    they never shadow primary audio once the provider recovers.
+    """
+    if TTS_FALLBACK_ENGINE == engine_name_for(lang):
+        raise error
+    cache_key = make_cache_key(text, lang, slow, TTS_FALLBACK_ENGINE)
+    audio = audio_cache.get(cache_key)
+    if audio is not None:
+        return audio
+    try:
+        audio = get_engine(TTS_FALLBACK_ENGINE).synthesize(text, lang, slow)
+    except (TTSEngineError, OSError, subprocess.CalledProcessError) as e:
+        print(f"TTS fallback engine unavailable: {str(e)}")
+        raise error
+    print(f"Served {lang} TTS from {TTS_FALLBACK_ENGINE} while the primary circuit is open")
+    try:
+        audio_cache.put(cache_key, audio)
+    except OSError as e:
+        print(f"TTS cache write failed: {str(e)}")
+    return audio
+
+
+def synthesize_in_order(chunks: List[str], lang: str, slow: bool = False) -> Iterator[bytes]:
+    """Synthesize chunks on the shared pool and yield the clips in input order"""
+    remaining = iter(chunks)
+    window = deque(
+        synth_executor.submit(synthesize_speech, chunk, lang, slow)
+        for chunk in islice(remaining, max(1, TTS_CHUNK_CONCURRENCY))
+    )
+    try:
+        while window:
+            segment = window.popleft().result()
+            next_chunk = next(remaining, None)
+            if next_chunk is not None:
+                window.append(synth_executor.submit(synthesize_speech, next_chunk, lang, slow))
+            yield segment
+    finally:
+        # Client went away or a chunk failed: don't leave queued work behind
+        for future in window:
+            future.cancel()
+
+
+def synthesize_sentences(sentences: List[str], lang: str, slow: bool = False) -> Iterator[bytes]:
+    """
+    Yield one clip per sentence in order. Cached sentence clips are reused;
+    the missing sentences are synthesized on the pool and cached.
+    """
+    keys = [cache_key_for(sentence, lang, slow) for sentence in sentences]
+    cached = {}
+    for index, key in enumerate(keys):
+        audio = audio_cache.get(key)
+        if audio is not None:
+            cached[index] = audio
+    fresh = synthesize_in_order([s for i, s in enumerate(sentences) if i not in cached], lang, slow)
+
+    try:
+        for index, key in enumerate(keys):
+            if index in cached:
+                yield cached[index]
+                continue
+            audio = next(fresh)
+            try:
+                audio_cache.put(key, audio)
+            except OSError as e:
+                print(f"TTS cache write failed: {str(e)}")
+            yield audio
+    finally:
+        fresh.close()
+
+
+def synthesize_chunked(text: str, lang: str, slow: bool = False) -> bytes:
+    """Synthesize text, fanning long inputs out across the pool"""
+    if TTS_SENTENCE_CACHE:
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            return synthesize_speech(text, lang, slow)
+        return concat_mp3(synthesize_sentences(sentences, lang, slow))
+
+    chunks = pack_chunks(split_sentences(text), TTS_CHUNK_CHARS)
+    if len(chunks) <= 1:
+        return synthesize_speech(text, lang, slow)
+    return concat_mp3(synthesize_in_order(chunks, lang, slow))
+
+
+def _wait_for_other_process(cache_key: str, timeout: float) -> Optional[bytes]:
+    """Poll the cache until another process's result lands or timeout passes"""
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        audio = audio_cache.peek(cache_key)
+        if audio is not None:
+            return audio
+        delay = min(delay * 2, 1.0)
+    return None
+
+
+def _synthesize_and_cache(cache_key: str, text: str, lang: str, slow: bool) -> bytes:
+    """Synthesize once across processes, using a lock file to elect the caller"""
+    locked = audio_cache.acquire_lock(cache_key, TTS_LOCK_TTL_SECONDS)
+    if not locked:
+        audio = _wait_for_other_process(cache_key, TTS_LOCK_TTL_SECONDS)
+        if audio is not None:
+            return audio
+        print("Timed out waiting for another process's TTS result; synthesizing locally")
+    try:
+        if locked:
+            # The previous lock holder may have finished between our miss and the lock
+            audio = audio_cache.peek(cache_key)
+            if audio is not None:
+                return audio
+
+        print(f"Generating speech for text: {text}")  # Debug log
+        with tts_admission.admit():
+            audio = synthesize_chunked(text, lang, slow)
+
+        try:
+            audio_cache.put(cache_key, audio)
+        except OSError as e:
+            # A full or read-only cache must not break playback
+            print(f"TTS cache write failed: {str(e)}")
+        return audio
+    finally:
+        if locked:
+            audio_cache.release_lock(cache_key)
+
+
+def get_or_synthesize(text: str, lang: str, slow: bool = False) -> Tuple[bytes, bool]:
+    """Return (audio, cache_hit), synthesizing and caching on a miss"""
+    cache_key = cache_key_for(text, lang, slow)
+    audio = audio_cache.get(cache_key)
+    if audio is not None:
+        return audio, True
+    return _synthesize_miss(cache_key, text, lang, slow), False
+
+
+def _synthesize_miss(cache_key: str, text: str, lang: str, slow: bool) -> bytes:
+    """Synthesize a clip the cache has just missed, coalescing concurrent callers"""
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[cache_key] = future
+
+    if not leader:
+        return future.result(timeout=TTS_LOCK_TTL_SECONDS)
+
+    try:
+        try:
+            audio = _synthesize_and_cache(cache_key, text, lang, slow)
+        except CircuitOpenError as e:
+            audio = synthesize_fallback(text, lang, slow, e)
+        future.set_result(audio)
+        return audio
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+
+def synthesize_batch(items: List[Tuple[str, str]], slow: bool = False) -> List[dict]:
+    """
+    Resolve a list of (text, lang) items, returning one result per item in
+    order: {'audio', 'cache_hit'} on success or {'error', 'exception'} on
+    failure.
+    Cache hits are answered inline; misses are synthesized concurrently.
+    """
+    results: List[Optional[dict]] = [None] * len(items)
+    futures = {}
+    for index, (text, lang) in enumerate(items):
+        cache_key = cache_key_for(text, lang, slow)
+        audio = audio_cache.get(cache_key)
+        if audio is not None:
+            results[index] = {'audio': audio, 'cache_hit': True}
+        else:
+            # Already counted as a miss; don't probe the cache again
+            futures[index] = batch_executor.submit(_synthesize_miss, cache_key, text, lang, slow)
+
+    for index, future in futures.items():
+        try:
+            results[index] = {'audio': future.result(), 'cache_hit': False}
+        except Exception as e:
+            print(f"Error in batch TTS item {index}: {str(e)}")
+            results[index] = {'error': str(e), 'exception': e}
+    return results
+
+
+def get_or_merge(items: List[Tuple[str, str]], gap_seconds: float = TTS_MERGE_GAP_SECONDS,
+                 slow: bool = False) -> Tuple[bytes, bool]:
+    """
+    Return (audio, cache_hit) for the (text, lang) items played back to back
+    with `gap_seconds` of silence between them. Segments come from the
+    per-language cache (synthesized on a miss) and are joined frame by frame.
+    """
+    segment_keys = [cache_key_for(text, lang, slow) for text, lang in items]
+    merged_key = make_merged_key(segment_keys, gap_seconds)
+    audio = audio_cache.get(merged_key)
+    if audio is not None:
+        return audio, True
+
+    segments = []
+    for index, result in enumerate(synthesize_batch(items, slow)):
+        if isinstance(result.get('exception'), (TTSOverloadedError, CircuitOpenError)):
+            raise result['exception']
+        if 'error' in result:
+            raise RuntimeError(f"Segment {index} failed: {result['error']}")
+        if segments and gap_seconds > 0:
+            segments.append(silence_like(result['audio'], gap_seconds))
+        segments.append(result['audio'])
+
+    audio = concat_mp3(segments)
+    # Fallback segments are never cached under their primary keys; don't cache a merge of them either
+    if all(audio_cache.contains(key) for key in segment_keys):
+        try:
+            audio_cache.put(merged_key, audio)
+        except OSError as e:
+            # A full or read-only cache must not fail a merge that is already done
+            print(f"TTS cache write failed: {str(e)}")
+    return audio, False
+
+
+class _SegmentFeed:
+    """Clips produced by one streamed synthesis, read as they arrive"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._segments: List[bytes] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+
+    def append(self, segment: bytes):
+        with self._condition:
+            self._segments.append(segment)
+            self._condition.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self._condition:
+            self._done = True
+            self._error = error
+            self._condition.notify_all()
+
+    def read(self, timeout: float) -> Iterator[bytes]:
+        """Yield every clip from the first, waiting up to `timeout` for each"""
+        index = 0
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(lambda: index < len(self._segments) or self._done, timeout):
+                    raise TimeoutError('Timed out waiting for streamed TTS audio')
+                if index < len(self._segments):
+                    segment = self._segments[index]
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+            index += 1
+            yield segment
+
+
+def _produce_stream(cache_key: str, text: str, lang: str, slow: bool, feed: _SegmentFeed, future: Future):
+    """
+    Synthesize sentence by sentence into `feed` and cache the whole clip,
+    resolving `future` for callers that joined without streaming. Like
+    _synthesize_and_cache, only the holder of the lock file synthesizes.
+    """
+    synthesize = synthesize_sentences if TTS_SENTENCE_CACHE else synthesize_in_order
+    segments = []
+    locked = audio_cache.acquire_lock(cache_key, TTS_LOCK_TTL_SECONDS)
+    try:
+        if locked:
+            audio = audio_cache.peek(cache_key)
+        else:
+            audio = _wait_for_other_process(cache_key, TTS_LOCK_TTL_SECONDS)
+            if audio is None:
+                print("Timed out waiting for another process's TTS result; synthesizing locally")
+
+        if audio is None:
+            with tts_admission.admit():
+                for segment in synthesize(split_sentences(text), lang, slow):
+                    segments.append(segment)
+                    feed.append(segment)
+            audio = concat_mp3(segments)
+            try:
+                audio_cache.put(cache_key, audio)
+            except OSError as e:
+                print(f"TTS cache write failed: {str(e)}")
+        else:
+            feed.append(audio)
+        feed.finish()
+        future.set_result(audio)
+    except BaseException as e:
+        if isinstance(e, CircuitOpenError) and not segments:
+            # Nothing sent yet, so the whole clip can still come from the fallback engine
+            try:
+                audio = synthesize_fallback(text, lang, slow, e)
+                feed.append(audio)
+                feed.finish()
+                future.set_result(audio)
+                return
+            except BaseException as fallback_error:
+                e = fallback_error
+        feed.finish(e)
+        future.set_exception(e)
+    finally:
+        if locked:
+            audio_cache.release_lock(cache_key)
+        with _inflight_lock:
+            _streams.pop(cache_key, None)
+            _inflight.pop(cache_key, None)
+
+
+def stream_speech(text: str, lang: str, slow: bool = False) -> Iterator[bytes]:
+    """
+    Yield MP3 audio sentence by sentence so playback can start early.
+
+    gTTS output is a plain sequence of MPEG frames, so the per-sentence clips
+    concatenate into one valid stream. Synthesis runs on stream_executor and
+    does not wait for the client: the admission slot is released as soon as
+    the last sentence is synthesized, however slowly the stream is read. The
+    assembled clip is then cached under the whole-text key.
+
+    Concurrent requests for the same text share one synthesis: later streams
+    replay the first one's clips from the start, and a stream that arrives
+    while a non-streamed miss is in flight waits for its result.
+    """
+    cache_key = cache_key_for(text, lang, slow)
+    audio = audio_cache.get(cache_key)
+    if audio is not None:
+        yield audio
+        return
+
+    if not primary_available(lang):
+        yield synthesize_fallback(text, lang, slow, CircuitOpenError('TTS provider circuit is open', 1))
+        return
+
+    with _inflight_lock:
+        feed = _streams.get(cache_key)
+        future = _inflight.get(cache_key)
+        leader = future is None
+        if leader:
+            feed = _streams[cache_key] = _SegmentFeed()
+            future = _inflight[cache_key] = Future()
+
+    if leader:
+        stream_executor.submit(_produce_stream, cache_key, text, lang, slow, feed, future)
+    if feed is None:
+        yield future.result(timeout=TTS_LOCK_TTL_SECONDS)
+        return
+    yield from feed.read(TTS_LOCK_TTL_SECONDS)
+
+
+def get_rendition(cache_key: str, audio: bytes, rendition: str) -> Tuple[bytes, str]:
+    """
+    Return (audio, rendition) for a rendition of the clip cached under
+    `cache_key`, transcoding and caching it on a miss. Falls back to the
+    standard rendition when the requested one cannot be produced.
+    """
+    if rendition == STANDARD or not rendition_available(rendition):
+        return audio, STANDARD
+
+    derived_key = rendition_key(cache_key, rendition)
+    derived = audio_cache.get(derived_key)
+    if derived is not None:
+        return derived, rendition
+
+    try:
+        derived = transcode(audio, rendition)
+    except Exception as e:
+        print(f"TTS {rendition} transcode failed: {str(e)}")
+        return audio, STANDARD
+    try:
+        # Skip caching renditions of fallback audio that was never cached itself
+        if audio_cache.contains(cache_key):
+            audio_cache.put(derived_key, derived)
+    except OSError as e:
+        print(f"TTS cache write failed: {str(e)}")
+    return derived, rendition
@@ -0,0 +1,178 @@
+"""
+Authenticated-user cache.
+
+get_current_user runs on every protected request. Instead of a users
+lookup each time, the slim user document (no password_hash) is kept in a
+bounded in-process cache keyed on user id. Entries expire after
+``ttl_seconds`` and the least recently used ones are evicted beyond
+``max_entries``.
+
+Code that changes a user calls UserInvalidationBus.invalidate(), which
+evicts the local entry and publishes the id on a capped Mongo collection.
+Every worker tails that collection in a daemon thread and evicts too, so the
+change is visible everywhere without waiting for the TTL.
+
+A read that started before an invalidation must not re-cache the old
+document, so each id carries a version that invalidation bumps; put() only
+stores when the version it was given is still current.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+# User cache configuration
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 60))
+
+# Fields never kept in the cache
+USER_PROJECTION = {'password_hash': 0}
+
+
+class UserCache:
+    """Thread-safe bounded TTL + LRU cache of user documents keyed on user id"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # id -> (expires at, doc)
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0  # Bumped when _versions is reset, so older reads stay invalid
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            # Callers add fields (e.g. 'id'); keep the cached copy clean
+            return dict(entry[1])
+
+    def version(self, user_id: str) -> tuple:
+        """Pass to put() so a read that raced an invalidation is dropped"""
+        with self._lock:
+            return self._epoch, self._versions.get(user_id, 0)
+
+    def put(self, user_id: str, doc: Dict[str, Any], version: tuple):
+        with self._lock:
+            if not self.enabled or (self._epoch, self._versions.get(user_id, 0)) != version:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(doc))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            # Versions only matter while a read is in flight; reset them in bulk to stay bounded
+            if len(self._versions) >= max(self.max_entries, 1) * 2:
+                self._versions.clear()
+                self._entries.clear()
+                self._epoch += 1
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._epoch += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+class UserInvalidationBus:
+    """
+    Broadcast user invalidations to every worker through a capped collection.
+
+    publish() inserts {user_id, origin}; each worker's listener thread tails
+    the collection and evicts ids published by other workers. If the tail
+    breaks, the listener clears the whole cache before resuming, since it may
+    have missed events.
+    """
+
+    def __init__(self, db, cache: UserCache, collection_name: str = 'user_cache_invalidations',
+                 size_bytes: int = 1024 * 1024):
+        self.db = db
+        self.cache = cache
+        self.collection_name = collection_name
+        self.collection = db[collection_name]
+        self.size_bytes = size_bytes
+        self.origin = uuid.uuid4().hex  # Our own events are already applied locally
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_collection(self):
+        try:
+            self.db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Already exists
+
+    def invalidate(self, user_id: str):
+        """Evict a user here and on every other worker"""
+        self.cache.evict(user_id)
+        try:
+            self.collection.insert_one({'user_id': user_id, 'origin': self.origin, 'at': datetime.utcnow()})
+        except PyMongoError as e:
+            # Other workers fall back to the TTL
+            print(f"⚠️  Could not publish user cache invalidation: {str(e)}")
+
+    def listen(self, retry_seconds: float = 5.0):
+        while True:
+            try:
+                self._tail()
+            except PyMongoError as e:
+                print(f"⚠️  User cache invalidation feed interrupted: {str(e)}")
+            self.cache.clear()
+            time.sleep(retry_seconds)
+
+    def _tail(self):
+        # A tailable cursor on an empty capped collection dies at once, so make sure
+        # there is an event, then skip everything up to the newest one in insertion
+        # order (_ids come from each worker's clock, so they cannot be compared)
+        latest = self.collection.find_one(sort=[('$natural', -1)])
+        if latest is None:
+            self.collection.insert_one({'user_id': None, 'origin': self.origin, 'at': datetime.utcnow()})
+            latest = self.collection.find_one(sort=[('$natural', -1)])
+        cursor = self.collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+        caught_up = False
+        while cursor.alive:
+            for event in cursor:
+                if not caught_up:
+                    caught_up = event['_id'] == latest['_id']
+                    continue
+                if event.get('user_id') and event.get('origin') != self.origin:
+                    self.cache.evict(event['user_id'])
+            time.sleep(0.1)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.listen, name='user-cache-invalidations', daemon=True)
+            self._thread.start()
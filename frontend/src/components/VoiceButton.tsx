@@ -1,6 +1,6 @@
 import { Volume2 } from "lucide-react";
 import { Button } from "@/components/ui/button";
-import { speakWithTTS } from "@/lib/tts";
+import { speakWithTTS, speakMergedWithTTS } from "@/lib/tts";
 import { useSettings } from "@/contexts/SettingsContext";
 import { useAuth } from "@/contexts/AuthContext";
 
@@ -45,22 +45,13 @@ const VoiceButton = ({ englishText, tamilText, className = "" }: VoiceButtonProp
           languageCode: 'en-US'
         });
       } else {
-        // Bilingual: Play both
-        if (englishText) {
-          await speakWithTTS({
-            text: englishText,
-            languageCode: 'en-US'
-          });
-        }
-        
-        if (tamilText) {
-          setTimeout(() => {
-            speakWithTTS({
-              text: tamilText,
-              languageCode: 'ta-IN'
-            });
-          }, 1000);
-        }
+        // Bilingual: Play both as one merged clip
+        await speakMergedWithTTS({
+          segments: [
+            { text: englishText, languageCode: 'en-US' },
+            { text: tamilText, languageCode: 'ta-IN' }
+          ]
+        });
       }
     } catch (error) {
       console.error('Error in VoiceButton:', error);
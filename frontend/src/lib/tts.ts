@@ -1,5 +1,8 @@
 const API_BASE = import.meta.env.VITE_API_URL || import.meta.env.VITE_BACKEND_URL || 'http://localhost:5000';
 const API_URL = `${API_BASE}/tts`;
+const MERGED_API_URL = `${API_BASE}/tts/merged`;
+const BATCH_API_URL = `${API_BASE}/tts/batch`;
+const PREFETCH_MAX_CLIPS = 20;
 
 interface TTSOptions {
   text: string;
@@ -8,13 +11,22 @@ interface TTSOptions {
   speed?: number; // Speech speed multiplier (0.5 to 2.0, default 1.0)
 }
 
-// Global queue for TTS requests
-const ttsQueue: Array<{text: string, languageCode: string, speed?: number}> = [];
+interface MergedTTSOptions {
+  segments: Array<{ text: string; languageCode: string }>;
+  force?: boolean;
+  speed?: number;
+}
+
+// Global queue for TTS requests; items with segments play as one merged clip
+const ttsQueue: Array<{text: string, languageCode: string, speed?: number, segments?: MergedTTSOptions['segments']}> = [];
 let isPlaying = false;
 let isPaused = false;
 let currentAudio: HTMLAudioElement | null = null;
 let isInitialized = false;
 const queuedSpeeches = new Set<string>(); // Track queued speeches to prevent duplicates
+const prefetchedClips = new Map<string, Promise<Blob | undefined>>(); // Clips fetched ahead of playback, used once
+
+const clipKey = (text: string, languageCode: string): string => `${languageCode.split('-')[0]}\u001f${text}`;
 
 // Get default TTS speed from localStorage
 const getDefaultSpeed = (): number => {
@@ -30,11 +42,29 @@ const getDefaultSpeed = (): number => {
   return 1.0;
 };
 
+// Ask for the compact rendition on data-saver or slow connections. Client
+// hints such as ECT are not sent on cross-origin requests, so check here.
+const getAudioQuality = (): string | undefined => {
+  const connection = (navigator as Navigator & {
+    connection?: { saveData?: boolean; effectiveType?: string };
+  }).connection;
+  if (connection?.saveData || ['slow-2g', '2g', '3g'].includes(connection?.effectiveType ?? '')) {
+    return 'low';
+  }
+  return undefined;
+};
+
+// Signed-in users are rate-limited per account instead of sharing their network's bucket
+const authHeaders = (): Record<string, string> => {
+  const token = localStorage.getItem('auth_token');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 const processQueue = async (): Promise<void> => {
   if ((isPlaying && !isPaused) || ttsQueue.length === 0) return;
   
   isPlaying = true;
-  const { text, languageCode, speed } = ttsQueue.shift()!;
+  const { text, languageCode, speed, segments } = ttsQueue.shift()!;
   
   // Skip if this exact text is already in the queue
   if (queuedSpeeches.has(text)) {
@@ -46,24 +76,34 @@ const processQueue = async (): Promise<void> => {
   queuedSpeeches.add(text);
   
   try {
-    const response = await fetch(API_URL, {
+    const prefetched = segments ? undefined : await prefetchedClips.get(clipKey(text, languageCode));
+    prefetchedClips.delete(clipKey(text, languageCode));
+    const response = prefetched ? null : await fetch(segments ? MERGED_API_URL : API_URL, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...authHeaders(),
       },
-      body: JSON.stringify({
+      body: JSON.stringify(segments ? {
+        items: segments.map(segment => ({
+          text: segment.text,
+          lang: segment.languageCode.split('-')[0]
+        })),
+        quality: getAudioQuality()
+      } : {
         text,
         lang: languageCode.split('-')[0], // Extract language code (en, ta)
-        speed: speed ?? getDefaultSpeed()
+        speed: speed ?? getDefaultSpeed(),
+        quality: getAudioQuality()
       })
     });
 
-    if (!response.ok) {
+    if (response && !response.ok) {
       throw new Error('Failed to generate speech');
     }
 
     // Flask backend returns audio file directly, not JSON with base64
-    const audioBlob = await response.blob();
+    const audioBlob = prefetched ?? await response!.blob();
     const audioUrl = URL.createObjectURL(audioBlob);
     
     return new Promise((resolve) => {
@@ -146,6 +186,73 @@ export const speakWithTTS = async ({ text, languageCode, force = false, speed }:
   }
 };
 
+// Play several snippets (e.g. English then Tamil) as one server-merged clip
+export const speakMergedWithTTS = async ({ segments, force = false, speed }: MergedTTSOptions): Promise<void> => {
+  const parts = segments.filter(segment => segment.text);
+  if (parts.length === 0) return;
+  if (parts.length === 1) {
+    return speakWithTTS({ ...parts[0], force, speed });
+  }
+  
+  if (force) {
+    stopTTS();
+  }
+  
+  const text = parts.map(segment => segment.text).join('\n');
+  if (queuedSpeeches.has(text) && !force) {
+    return;
+  }
+  
+  ttsQueue.push({ text, languageCode: parts[0].languageCode, speed: speed ?? getDefaultSpeed(), segments: parts });
+  
+  if (!isPlaying) {
+    await processQueue();
+  }
+};
+
+// Fetch several clips (e.g. every field of a lesson) in one /tts/batch round
+// trip; speakWithTTS plays a prefetched clip instead of requesting it, and
+// waits for the batch if it is still in flight
+export const prefetchTTS = (snippets: Array<{ text: string; languageCode: string }>): void => {
+  const pending = snippets.filter(snippet => snippet.text && !prefetchedClips.has(clipKey(snippet.text, snippet.languageCode)));
+  if (pending.length === 0) return;
+
+  const parts = fetch(BATCH_API_URL, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...authHeaders(),
+    },
+    body: JSON.stringify({
+      items: pending.map(snippet => ({
+        text: snippet.text,
+        lang: snippet.languageCode.split('-')[0]
+      })),
+      quality: getAudioQuality()
+    })
+  }).then(response => {
+    if (!response.ok) {
+      throw new Error('Failed to prefetch speech');
+    }
+    // One part per item, named by its index; failed items are JSON parts
+    return response.formData();
+  }).catch(error => {
+    // Playback falls back to one /tts request per clip
+    console.error('TTS prefetch failed:', error);
+    return undefined;
+  });
+
+  pending.forEach((snippet, index) => {
+    prefetchedClips.set(clipKey(snippet.text, snippet.languageCode), parts.then(form => {
+      const part = form?.get(String(index));
+      return part instanceof Blob && part.type.startsWith('audio/') ? part : undefined;
+    }));
+  });
+  while (prefetchedClips.size > PREFETCH_MAX_CLIPS) {
+    prefetchedClips.delete(prefetchedClips.keys().next().value!);
+  }
+};
+
 export const stopTTS = (): void => {
   // Clear the queue
   ttsQueue.length = 0;
@@ -12,7 +12,7 @@ import VoiceButton from "@/components/VoiceButton";
 import { useCourse, useLessons, type Lesson } from "@/hooks/useAdminApi";
 import { useSettings } from "@/contexts/SettingsContext";
 import { useAuth } from "@/contexts/AuthContext";
-import { speakWithTTS, pauseTTS, resumeTTS, stopTTS } from "@/lib/tts";
+import { speakWithTTS, speakMergedWithTTS, prefetchTTS, pauseTTS, resumeTTS, stopTTS } from "@/lib/tts";
 import { useCourseProgress } from "@/hooks/useCourseProgress";
 import { CourseVoiceControlProvider } from "@/contexts/CourseVoiceControlContext";
 
@@ -76,6 +76,21 @@ const CoursePage = () => {
     return 'bilingual';
   };
 
+  // Fetch the audio for this lesson and the next one in a single batch request
+  // ahead of playback (bilingual playback uses one merged clip instead)
+  useEffect(() => {
+    if (!selectedLesson) return;
+    const languagePref = getLanguagePreference();
+    if (languagePref === 'bilingual') return;
+
+    const currentIndex = lessons.findIndex((l: Lesson) => l.id === selectedLesson.id);
+    const upcoming = [selectedLesson, lessons[currentIndex + 1]].filter(Boolean) as Lesson[];
+    prefetchTTS(upcoming.map(lesson => languagePref === 'tamil'
+      ? { text: lesson.contentTamil ?? '', languageCode: 'ta-IN' }
+      : { text: lesson.content, languageCode: 'en-US' }
+    ));
+  }, [selectedLessonId, selectedLesson, lessons, settings.language]);
+
   // Auto-play lesson content when lesson changes (if single language selected)
   useEffect(() => {
     if (selectedLesson && settings.language !== 'bilingual') {
@@ -152,19 +167,13 @@ const CoursePage = () => {
           languageCode: 'en-US'
         });
       } else {
-        // Bilingual: Play both
-        if (selectedLesson.content) {
-          await speakWithTTS({
-            text: selectedLesson.content,
-            languageCode: 'en-US'
-          });
-        }
-        if (selectedLesson.contentTamil) {
-          await speakWithTTS({
-            text: selectedLesson.contentTamil,
-            languageCode: 'ta-IN'
-          });
-        }
+        // Bilingual: Play both as one merged clip
+        await speakMergedWithTTS({
+          segments: [
+            { text: selectedLesson.content, languageCode: 'en-US' },
+            { text: selectedLesson.contentTamil, languageCode: 'ta-IN' }
+          ]
+        });
       }
     } catch (error) {
       console.error('Error playing audio:', error);
@@ -0,0 +1,15 @@
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules duplicated in both backends, which must behave the same
+BACKEND_DIRS = ['backend', 'frontend/backend']
+
+
+def load_module(name, path):
+    """Import a backend module by path; both backends reuse module names"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
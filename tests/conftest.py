@@ -0,0 +1,64 @@
+import importlib
+import sys
+import time
+import types
+
+import pytest
+
+from tests import BACKEND_DIRS, ROOT, load_module
+
+
+@pytest.fixture(params=BACKEND_DIRS)
+def both_backends(request):
+    """Loader for a module duplicated in both backends; tests run once per copy"""
+    def load(name):
+        return load_module(f'{name}_under_test', ROOT / request.param / f'{name}.py')
+    return load
+
+
+class FakeClock:
+    """Stands in for the time module of the modules it is installed on"""
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        self._monkeypatch = monkeypatch
+
+    def install(self, module):
+        fake = types.SimpleNamespace(**{name: getattr(time, name) for name in dir(time) if not name.startswith('_')})
+        fake.monotonic = fake.time = lambda: self.now
+        self._monkeypatch.setattr(module, 'time', fake)
+        return module
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+
+@pytest.fixture
+def flask_backend(monkeypatch, tmp_path):
+    """
+    Import frontend/backend modules by name (they import each other that
+    way), with the audio cache in tmp_path. The modules are dropped again
+    afterwards so each test, and the FastAPI copies, start clean.
+    """
+    monkeypatch.setenv('TTS_CACHE_DIR', str(tmp_path / 'tts'))
+    monkeypatch.setenv('MONGO_URI', 'mongodb://localhost:1/')
+    monkeypatch.syspath_prepend(str(ROOT / 'frontend' / 'backend'))
+    before = set(sys.modules)
+    yield importlib.import_module
+    for name in set(sys.modules) - before:
+        del sys.modules[name]
+
+
+@pytest.fixture
+def fastapi_backend(monkeypatch):
+    """Import backend/ modules by name, dropping them again afterwards"""
+    monkeypatch.syspath_prepend(str(ROOT / 'backend'))
+    before = set(sys.modules)
+    yield importlib.import_module
+    for name in set(sys.modules) - before:
+        del sys.modules[name]
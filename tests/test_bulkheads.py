@@ -0,0 +1,79 @@
+"""
+Bounded per-class thread pools in frontend/backend/bulkheads.py.
+"""
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def bulkheads(flask_backend):
+    return flask_backend('bulkheads')
+
+
+def fill(pool, count):
+    """Start `count` blocking calls on the pool; returns the release event"""
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def blocking():
+        started.release()
+        release.wait(5)
+
+    for _ in range(count):
+        threading.Thread(target=pool.run, args=(blocking,), daemon=True).start()
+    for _ in range(min(count, pool.workers)):
+        assert started.acquire(timeout=5)
+    return release
+
+
+def test_runs_calls_and_returns_their_result(bulkheads):
+    pool = bulkheads.Bulkhead('test', workers=2, max_queue=0, timeout=5)
+    assert pool.run(lambda a, b=0: a + b, 1, b=2) == 3
+    with pytest.raises(ZeroDivisionError):
+        pool.run(lambda: 1 / 0)
+    stats = pool.stats()
+    assert (stats['completed'], stats['failed'], stats['pending']) == (1, 1, 0)
+
+
+def test_rejects_once_workers_and_queue_are_full(bulkheads):
+    pool = bulkheads.Bulkhead('test', workers=1, max_queue=1, timeout=5)
+    release = fill(pool, 2)
+    deadline = time.monotonic() + 5
+    while pool.stats()['pending'] < 2:  # Wait for the queued call to register
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with pytest.raises(bulkheads.BulkheadFullError) as excinfo:
+        pool.run(lambda: None)
+    release.set()
+    assert excinfo.value.name == 'test'
+    assert pool.stats()['rejected'] == 1
+
+
+def test_slow_call_times_out(bulkheads):
+    pool = bulkheads.Bulkhead('test', workers=1, max_queue=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(bulkheads.BulkheadFullError, match='did not finish'):
+        pool.run(release.wait, 5)
+    release.set()
+    assert pool.stats()['timed_out'] == 1
+
+
+def test_pools_are_scaled_to_the_request_threads(bulkheads):
+    pools = [bulkheads.Bulkhead(name, workers=10, max_queue=30, timeout=5) for name in ('a', 'b')]
+    bulkheads.limit_to_threads(pools, threads=24, reserved=4)
+    assert [pool.max_pending for pool in pools] == [10, 10]
+
+
+def test_pools_that_fit_are_left_alone(bulkheads):
+    pools = [bulkheads.Bulkhead('a', workers=2, max_queue=2, timeout=5)]
+    bulkheads.limit_to_threads(pools, threads=24, reserved=4)
+    assert pools[0].max_pending == 4
+
+
+def test_environment_overrides_pool_settings(bulkheads, monkeypatch):
+    monkeypatch.setenv('BULKHEAD_TTS_WORKERS', '3')
+    monkeypatch.setenv('BULKHEAD_TTS_QUEUE', '5')
+    pool = bulkheads._bulkhead('tts', workers=16, max_queue=32, timeout=120)
+    assert (pool.workers, pool.max_queue, pool.max_pending) == (3, 5, 8)
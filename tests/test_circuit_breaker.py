@@ -0,0 +1,132 @@
+"""
+State transitions of the TTS circuit breaker (closed -> open -> half-open).
+
+Both backends carry a copy of circuit_breaker.py; every test runs on each.
+"""
+import pytest
+
+
+@pytest.fixture
+def cb(both_backends, clock):
+    return clock.install(both_backends('circuit_breaker'))
+
+
+def make_breaker(cb, **settings):
+    options = dict(window_seconds=30, min_calls=4, error_threshold=0.5, slow_call_seconds=10,
+                   slow_threshold=0.5, cooldown_seconds=15)
+    options.update(settings)
+    return cb.CircuitBreaker('test', **options)
+
+
+def open_breaker(cb, breaker):
+    for _ in range(breaker.min_calls):
+        assert breaker.before_call() is False
+        breaker.record(True, 0.1)
+    assert breaker.state == cb.OPEN
+
+
+def test_stays_closed_below_min_calls(cb):
+    breaker = make_breaker(cb)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(True, 0.1)
+    assert breaker.state == cb.CLOSED
+
+
+def test_opens_on_error_rate(cb):
+    breaker = make_breaker(cb)
+    for failed in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(failed, 0.1)
+    assert breaker.state == cb.OPEN
+
+    with pytest.raises(cb.CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 15
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_opens_on_slow_call_rate(cb):
+    breaker = make_breaker(cb)
+    for seconds in (12, 0.1, 11, 0.1):
+        breaker.before_call()
+        breaker.record(False, seconds)
+    assert breaker.state == cb.OPEN
+
+
+def test_calls_outside_the_window_are_forgotten(cb, clock):
+    breaker = make_breaker(cb)
+    for _ in range(3):
+        breaker.record(True, 0.1)
+    clock.advance(31)
+    breaker.record(True, 0.1)
+    assert breaker.state == cb.CLOSED
+    assert breaker.stats()['window_calls'] == 1
+
+
+def test_half_open_after_cooldown_lets_one_probe_through(cb, clock):
+    breaker = make_breaker(cb)
+    open_breaker(cb, breaker)
+    clock.advance(14)
+    assert breaker.state == cb.OPEN
+    clock.advance(1)
+    assert breaker.state == cb.HALF_OPEN
+
+    assert breaker.before_call() is True
+    with pytest.raises(cb.CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes(cb, clock):
+    breaker = make_breaker(cb)
+    open_breaker(cb, breaker)
+    clock.advance(15)
+    probe = breaker.before_call()
+    breaker.record(False, 0.1, probe)
+    assert breaker.state == cb.CLOSED
+    assert breaker.before_call() is False
+
+
+@pytest.mark.parametrize('failed, seconds', [(True, 0.1), (False, 12)])
+def test_failed_or_slow_probe_reopens(cb, clock, failed, seconds):
+    breaker = make_breaker(cb)
+    open_breaker(cb, breaker)
+    clock.advance(15)
+    probe = breaker.before_call()
+    breaker.record(failed, seconds, probe)
+    assert breaker.state == cb.OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+def test_released_probe_lets_the_next_call_probe(cb, clock):
+    breaker = make_breaker(cb)
+    open_breaker(cb, breaker)
+    clock.advance(15)
+    probe = breaker.before_call()
+    breaker.release(probe)
+    assert breaker.state == cb.HALF_OPEN
+    assert breaker.before_call() is True
+
+
+def test_release_of_a_closed_call_records_nothing(cb):
+    breaker = make_breaker(cb)
+    breaker.release(breaker.before_call())
+    assert breaker.stats()['calls'] == 0
+    assert breaker.state == cb.CLOSED
+
+
+@pytest.mark.parametrize('failed', [False, True])
+def test_straggler_does_not_decide_for_the_probe(cb, clock, failed):
+    breaker = make_breaker(cb)
+    straggler = breaker.before_call()  # Started while still closed
+    open_breaker(cb, breaker)
+    clock.advance(15)
+    probe = breaker.before_call()
+
+    breaker.record(failed, 0.1, straggler)
+    assert breaker.state == cb.HALF_OPEN
+    with pytest.raises(cb.CircuitOpenError):
+        breaker.before_call()  # The probe is still in flight
+
+    breaker.record(False, 0.1, probe)
+    assert breaker.state == cb.CLOSED
@@ -0,0 +1,107 @@
+"""
+Index registry reconciliation in db_indexes.py, against in-memory stand-ins
+for the collections. The Flask copy is synchronous and the FastAPI copy is
+async; every test runs on each.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('pymongo')
+from pymongo.errors import OperationFailure  # noqa: E402
+
+
+class FakeCollection:
+    def __init__(self, live=None, fail=None):
+        self.live = {'_id_': {'key': [('_id', 1)]}}
+        self.live.update(live or {})
+        self.fail = fail
+        self.created = []
+
+    def index_information(self):
+        return dict(self.live)
+
+    def create_index(self, keys, **options):
+        if self.fail:
+            raise OperationFailure(self.fail)
+        self.created.append(options['name'])
+        self.live[options['name']] = {'key': [(field, float(direction)) for field, direction in keys],
+                                      'unique': options['unique']}
+
+
+class AsyncCollection:
+    def __init__(self, sync):
+        self.sync = sync
+
+    async def index_information(self):
+        return self.sync.index_information()
+
+    async def create_index(self, keys, **options):
+        return self.sync.create_index(keys, **options)
+
+
+@pytest.fixture
+def registry(both_backends):
+    """(module, run) where run(fn, collections, *args) calls fn on a fake db"""
+    module = both_backends('db_indexes')
+    is_async = asyncio.iscoroutinefunction(module.check_indexes)
+
+    def run(fn, collections, *args, **kwargs):
+        if not is_async:
+            return fn(collections, *args, **kwargs)
+        return asyncio.run(fn({name: AsyncCollection(c) for name, c in collections.items()}, *args, **kwargs))
+    return module, run
+
+
+def specs(module):
+    return [
+        module.IndexSpec('users', [('email', 1)], unique=True, serves='login'),
+        module.IndexSpec('lessons', [('courseId', 1), ('order', 1)], serves='lesson list'),
+    ]
+
+
+def statuses(report):
+    return {(entry['collection'], entry['name']): entry['status'] for entry in report}
+
+
+def test_creates_missing_indexes_and_is_idempotent(registry):
+    module, run = registry
+    db = {'users': FakeCollection(), 'lessons': FakeCollection()}
+    report = run(module.ensure_indexes, db, specs(module), log=lambda line: None)
+    assert set(statuses(report).values()) == {'created'}
+
+    report = run(module.ensure_indexes, db, specs(module), log=lambda line: None)
+    assert set(statuses(report).values()) == {'ok'}
+    assert db['users'].created == ['email_1']
+
+
+def test_drift_and_unmanaged_indexes_are_reported_not_touched(registry):
+    module, run = registry
+    db = {
+        'users': FakeCollection({'email_1': {'key': [('email', 1.0)]}}),  # Lost its unique flag
+        'lessons': FakeCollection({'courseId_1_order_1': {'key': [('courseId', 1.0), ('order', 1.0)]},
+                                   'title_1': {'key': [('title', 1.0)]}}),
+    }
+    report = run(module.ensure_indexes, db, specs(module), log=lambda line: None)
+    assert statuses(report) == {
+        ('users', 'email_1'): 'drift',
+        ('lessons', 'courseId_1_order_1'): 'ok',
+        ('lessons', 'title_1'): 'unmanaged',
+    }
+    assert 'unique=False' in report[0]['detail']
+    assert db['users'].created == []
+
+
+def test_failed_build_is_reported(registry):
+    module, run = registry
+    db = {'users': FakeCollection(fail='E11000 duplicate key'), 'lessons': FakeCollection()}
+    report = run(module.ensure_indexes, db, specs(module), log=lambda line: None)
+    assert statuses(report)[('users', 'email_1')] == 'failed'
+    assert statuses(report)[('lessons', 'courseId_1_order_1')] == 'created'
+
+
+def test_check_changes_nothing(registry):
+    module, run = registry
+    db = {'users': FakeCollection(), 'lessons': FakeCollection()}
+    assert set(statuses(run(module.check_indexes, db, specs(module))).values()) == {'missing'}
+    assert db['users'].created == []
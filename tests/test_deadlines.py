@@ -0,0 +1,91 @@
+"""
+Per-request deadline budgets in backend/deadlines.py.
+"""
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def deadlines(fastapi_backend):
+    return fastapi_backend('deadlines')
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, 30.0),
+    ('', 30.0),
+    ('5', 5.0),
+    ('2.5', 2.5),
+    ('not a number', 30.0),
+    ('0', 0.1),
+    ('600', 60.0),
+])
+def test_request_budget(deadlines, monkeypatch, header, expected):
+    monkeypatch.delenv('REQUEST_DEADLINE_SECONDS', raising=False)
+    monkeypatch.delenv('REQUEST_DEADLINE_MAX_SECONDS', raising=False)
+    assert deadlines.request_budget(header) == expected
+
+
+def test_no_budget_outside_a_request(deadlines):
+    async def run():
+        assert deadlines.remaining() is None
+        assert deadlines.cap(3.0) == 3.0
+        return await deadlines.within_deadline(asyncio.sleep(0, 'done'))
+
+    assert asyncio.run(run()) == 'done'
+
+
+def test_timeouts_shrink_to_the_remaining_budget(deadlines):
+    async def run():
+        token = deadlines.start_deadline(1.0)
+        try:
+            return deadlines.cap(10.0), deadlines.cap(None), deadlines.cap(0.5)
+        finally:
+            deadlines.reset_deadline(token)
+
+    shrunk, unlimited, shorter = asyncio.run(run())
+    assert 0.9 < shrunk <= 1.0 and 0.9 < unlimited <= 1.0
+    assert shorter == 0.5
+
+
+def test_running_out_of_budget_raises_deadline_exceeded(deadlines):
+    async def run():
+        token = deadlines.start_deadline(0.05)
+        try:
+            await deadlines.within_deadline(asyncio.sleep(1), timeout=5)
+        finally:
+            deadlines.reset_deadline(token)
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        asyncio.run(run())
+
+
+def test_own_timeout_is_a_plain_timeout(deadlines):
+    async def run():
+        token = deadlines.start_deadline(5)
+        try:
+            await deadlines.within_deadline(asyncio.sleep(1), timeout=0.05)
+        finally:
+            deadlines.reset_deadline(token)
+
+    with pytest.raises(asyncio.TimeoutError) as excinfo:
+        asyncio.run(run())
+    assert not isinstance(excinfo.value, deadlines.DeadlineExceeded)
+
+
+def test_spent_budget_never_starts_the_call(deadlines):
+    started = []
+
+    async def call():
+        started.append(True)
+
+    async def run():
+        token = deadlines.start_deadline(0)
+        try:
+            await deadlines.within_deadline(call())
+        finally:
+            deadlines.reset_deadline(token)
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        asyncio.run(run())
+    assert started == []
@@ -0,0 +1,258 @@
+"""
+Synthesis paths in frontend/backend/tts_service.py, with the engine stubbed.
+"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('gtts')
+
+
+@pytest.fixture
+def tts(flask_backend):
+    service = flask_backend('tts_service')
+    mp3_utils = flask_backend('mp3_utils')
+    service.engine_calls = []
+
+    def fake_synthesize_speech(text, lang, slow=False):
+        service.engine_calls.append(text)
+        return mp3_utils.silent_mp3(0.1)
+
+    service.synthesize_speech = fake_synthesize_speech
+    return service
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.01)
+
+
+def test_stream_releases_admission_before_the_client_reads(tts):
+    stream = tts.stream_speech('One. Two. Three.', 'en')
+    next(stream)  # A slow client: one clip read, the rest still unsent
+    wait_until(lambda: tts.audio_cache.contains(tts.cache_key_for('One. Two. Three.', 'en')))
+    assert tts.tts_admission.active == 0
+    assert len(list(stream)) == 2
+
+
+def test_waiting_on_another_process_takes_no_admission_slot(tts, monkeypatch):
+    monkeypatch.setattr(tts, 'TTS_LOCK_TTL_SECONDS', 5)
+    key = tts.cache_key_for('Hello', 'en')
+    assert tts.audio_cache.acquire_lock(key, 60)  # Another process is synthesizing
+
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(audio=tts.get_or_synthesize('Hello', 'en')))
+    waiter.start()
+    time.sleep(0.3)
+    assert tts.tts_admission.active == 0
+
+    tts.audio_cache.put(key, b'other process')
+    waiter.join(5)
+    assert result['audio'] == (b'other process', False)
+    assert tts.engine_calls == []
+
+
+def gate_engine(tts, monkeypatch):
+    """Make the stubbed engine block until the returned event is set"""
+    release = threading.Event()
+    synthesize = tts.synthesize_speech
+
+    def gated(text, lang, slow=False):
+        release.wait(5)
+        return synthesize(text, lang, slow)
+
+    monkeypatch.setattr(tts, 'synthesize_speech', gated)
+    return release
+
+
+def test_concurrent_streams_share_one_synthesis(tts, monkeypatch):
+    release = gate_engine(tts, monkeypatch)
+    first = tts.stream_speech('One. Two.', 'en')
+    second = tts.stream_speech('One. Two.', 'en')
+    results = []
+    readers = [threading.Thread(target=lambda s=s: results.append(list(s))) for s in (first, second)]
+    for reader in readers:
+        reader.start()
+    wait_until(lambda: tts._streams)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert len(results) == 2 and results[0] == results[1]
+    assert sorted(tts.engine_calls) == ['One.', 'Two.']
+
+
+def test_get_joins_an_inflight_stream(tts, monkeypatch):
+    release = gate_engine(tts, monkeypatch)
+    stream = tts.stream_speech('One. Two.', 'en')
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(streamed=b''.join(stream)))
+    reader.start()
+    wait_until(lambda: tts._streams)
+
+    getter = threading.Thread(target=lambda: result.update(audio=tts.get_or_synthesize('One. Two.', 'en')))
+    getter.start()
+    release.set()
+    reader.join(5)
+    getter.join(5)
+
+    assert result['audio'] == (result['streamed'], False)
+    assert sorted(tts.engine_calls) == ['One.', 'Two.']
+
+
+def test_stream_waits_for_another_process(tts, monkeypatch):
+    monkeypatch.setattr(tts, 'TTS_LOCK_TTL_SECONDS', 5)
+    key = tts.cache_key_for('One. Two.', 'en')
+    assert tts.audio_cache.acquire_lock(key, 60)
+
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(audio=list(tts.stream_speech('One. Two.', 'en'))))
+    reader.start()
+    time.sleep(0.3)
+    tts.audio_cache.put(key, b'other process')
+    reader.join(5)
+
+    assert result['audio'] == [b'other process']
+    assert tts.engine_calls == []
+
+
+def test_batch_answers_hits_and_synthesizes_misses_in_order(tts):
+    cached, _ = tts.get_or_synthesize('Cached', 'en')
+    tts.engine_calls.clear()
+
+    results = tts.synthesize_batch([('New', 'en'), ('Cached', 'en'), ('Also new', 'ta')])
+    assert [result['cache_hit'] for result in results] == [False, True, False]
+    assert results[1]['audio'] == cached
+    assert sorted(tts.engine_calls) == ['Also new', 'New']
+
+
+def test_batch_reports_a_failed_item_without_failing_the_rest(tts, monkeypatch):
+    synthesize = tts.synthesize_speech
+
+    def flaky(text, lang, slow=False):
+        if text == 'Bad':
+            raise RuntimeError('engine error')
+        return synthesize(text, lang, slow)
+
+    monkeypatch.setattr(tts, 'synthesize_speech', flaky)
+    good, bad = tts.synthesize_batch([('Good', 'en'), ('Bad', 'en')])
+    assert 'audio' in good
+    assert bad['error'] == 'engine error' and isinstance(bad['exception'], RuntimeError)
+
+
+def echo_engine(tts, monkeypatch):
+    """Make each clip the bytes of its own text, so order can be checked"""
+    def echo(text, lang, slow=False):
+        tts.engine_calls.append(text)
+        return f'<{text}>'.encode('utf-8')
+
+    monkeypatch.setattr(tts, 'synthesize_speech', echo)
+
+
+def test_stream_yields_one_clip_per_sentence_in_order(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    assert list(tts.stream_speech('One. Two. Three.', 'en')) == [b'<One.>', b'<Two.>', b'<Three.>']
+
+
+def test_streamed_text_is_cached_whole(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    list(tts.stream_speech('One. Two.', 'en'))
+    wait_until(lambda: not tts._streams)
+
+    assert list(tts.stream_speech('One. Two.', 'en')) == [b'<One.><Two.>']
+    assert tts.get_or_synthesize('One. Two.', 'en') == (b'<One.><Two.>', True)
+    assert tts.engine_calls == ['One.', 'Two.']
+
+
+def test_stream_reports_a_failed_sentence(tts, monkeypatch):
+    def failing(text, lang, slow=False):
+        if text == 'Two.':
+            raise RuntimeError('engine error')
+        return b'<ok>'
+
+    monkeypatch.setattr(tts, 'synthesize_speech', failing)
+    stream = tts.stream_speech('One. Two.', 'en')
+    assert next(stream) == b'<ok>'
+    with pytest.raises(RuntimeError):
+        next(stream)
+    assert not tts.audio_cache.contains(tts.cache_key_for('One. Two.', 'en'))
+
+
+def test_chunks_are_reassembled_in_input_order(tts, monkeypatch):
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_first(text, lang, slow=False):
+        with lock:
+            in_flight.append(text)
+            peak.append(len(in_flight))
+        time.sleep(0.05 * (5 - int(text)))  # Later chunks finish first
+        with lock:
+            in_flight.remove(text)
+        return text.encode('ascii')
+
+    monkeypatch.setattr(tts, 'synthesize_speech', slow_first)
+    monkeypatch.setattr(tts, 'TTS_CHUNK_CONCURRENCY', 2)
+    assert b''.join(tts.synthesize_in_order(['1', '2', '3', '4'], 'en')) == b'1234'
+    assert max(peak) <= 2
+
+
+def test_without_the_sentence_tier_chunks_are_packed(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    monkeypatch.setattr(tts, 'TTS_SENTENCE_CACHE', False)
+    monkeypatch.setattr(tts, 'TTS_CHUNK_CHARS', 10)
+    assert tts.synthesize_chunked('One. Two. Three.', 'en') == b'<One. Two.><Three.>'
+    assert sorted(tts.engine_calls) == ['One. Two.', 'Three.']
+
+
+def test_packing_never_splits_a_sentence(flask_backend):
+    tts_text = flask_backend('tts_text')
+    assert tts_text.pack_chunks(['aaaa', 'bb', 'cccccc', 'd'], max_chars=7) == ['aaaa bb', 'cccccc', 'd']
+
+
+def test_merged_clip_is_cached_under_its_own_key(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    items = [('Hello', 'en'), ('வணக்கம்', 'ta')]
+    audio, hit = tts.get_or_merge(items, gap_seconds=0)
+    assert (audio, hit) == ('<Hello><வணக்கம்>'.encode('utf-8'), False)
+
+    assert tts.get_or_merge(items, gap_seconds=0) == (audio, True)
+    assert tts.get_or_merge(items[::-1], gap_seconds=0)[1] is False  # Order is part of the key
+    assert sorted(tts.engine_calls) == sorted(['Hello', 'வணக்கம்'])
+
+
+def test_merge_puts_silence_between_segments(tts, flask_backend):
+    mp3_utils = flask_backend('mp3_utils')
+    audio, _ = tts.get_or_merge([('One', 'en'), ('Two', 'ta')], gap_seconds=0.5)
+    clip = tts.synthesize_speech('One', 'en')
+    assert audio == clip + mp3_utils.silence_like(clip, 0.5) + clip
+
+
+def test_merge_fails_when_a_segment_fails(tts, monkeypatch):
+    def failing(text, lang, slow=False):
+        raise RuntimeError('engine error')
+
+    monkeypatch.setattr(tts, 'synthesize_speech', failing)
+    with pytest.raises(RuntimeError, match='Segment 0 failed'):
+        tts.get_or_merge([('One', 'en'), ('Two', 'ta')])
+
+
+def test_texts_share_cached_sentences(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    tts.get_or_synthesize('Plants need light. Roots take water.', 'en')
+    tts.engine_calls.clear()
+
+    audio, hit = tts.get_or_synthesize('Plants need light. Leaves make food.', 'en')
+    assert (audio, hit) == (b'<Plants need light.><Leaves make food.>', False)
+    assert tts.engine_calls == ['Leaves make food.']
+
+
+def test_without_the_sentence_tier_sentences_are_not_cached(tts, monkeypatch):
+    echo_engine(tts, monkeypatch)
+    monkeypatch.setattr(tts, 'TTS_SENTENCE_CACHE', False)
+    tts.get_or_synthesize('Plants need light. Roots take water.', 'en')
+    assert not tts.audio_cache.contains(tts.cache_key_for('Plants need light.', 'en'))
@@ -0,0 +1,98 @@
+"""
+Hedge delay, budget and winner accounting in hedging.py.
+
+Both backends carry a copy; the Hedger tests run on each. The hedged call
+itself is exercised through frontend/backend/tts_service.py.
+"""
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def hedging(both_backends):
+    return both_backends('hedging')
+
+
+def warmed(hedging, latencies, **settings):
+    hedger = hedging.Hedger('test', **settings)
+    for seconds in latencies:
+        hedger.record_latency(seconds)
+    return hedger
+
+
+def test_no_hedging_until_enough_samples(hedging):
+    hedger = warmed(hedging, [1.0] * 19, min_samples=20)
+    assert hedger.delay() is None
+
+
+def test_delay_is_the_latency_percentile(hedging):
+    hedger = warmed(hedging, [i / 10 for i in range(1, 101)], percentile=95, min_delay=0)
+    assert hedger.delay() == pytest.approx(9.6)
+
+
+def test_delay_has_a_floor(hedging):
+    hedger = warmed(hedging, [0.01] * 50, min_delay=0.5)
+    assert hedger.delay() == 0.5
+
+
+def test_hedges_stay_within_budget(hedging):
+    hedger = warmed(hedging, [1.0] * 20, budget=0.1)
+    granted = 0
+    for _ in range(50):
+        hedger.delay()
+        granted += hedger.try_hedge()
+    assert granted == 5
+    assert hedger.stats()['over_budget'] == 45
+
+
+def test_hedger_is_shared_and_off_by_default(hedging, monkeypatch):
+    monkeypatch.delenv('TTS_HEDGING', raising=False)
+    assert hedging.hedger_for('gtts') is None
+    monkeypatch.setenv('TTS_HEDGING', 'true')
+    assert hedging.hedger_for('gtts') is hedging.hedger_for('gtts')
+
+
+class SlowOnceEngine:
+    """Remote engine whose first call stalls"""
+    name = 'stalling'
+    remote = True
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def synthesize(self, text, lang, slow=False):
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait(5)
+            return b'primary'
+        return b'hedge'
+
+
+@pytest.fixture
+def tts(flask_backend):
+    pytest.importorskip('gtts')
+    return flask_backend('tts_service')
+
+
+def test_stalled_call_is_hedged_and_the_hedge_wins(tts):
+    hedger = tts.Hedger('stalling', budget=1.0, min_delay=0.05, min_samples=1)
+    hedger.record_latency(0.01)
+    engine = SlowOnceEngine()
+    started = time.monotonic()
+    assert tts._hedged_call(hedger, engine, 'Hi', 'en', False) == b'hedge'
+    assert time.monotonic() - started < 2
+    engine.release.set()
+    assert hedger.stats()['hedge_wins'] == 1
+
+
+def test_fast_call_is_not_hedged(tts):
+    hedger = tts.Hedger('fast', budget=1.0, min_delay=1.0, min_samples=1)
+    hedger.record_latency(0.01)
+    engine = SlowOnceEngine()
+    engine.release.set()
+    assert tts._hedged_call(hedger, engine, 'Hi', 'en', False) == b'primary'
+    assert engine.calls == 1
+    assert hedger.stats()['hedged'] == 0
@@ -0,0 +1,50 @@
+"""
+Frame-level MP3 joining in mp3_utils.py.
+
+Both backends carry a copy; every test runs on each.
+"""
+import pytest
+
+# MPEG-1 Layer III, 32 kbps, 44.1 kHz, mono: 104-byte frames, side info 17 bytes
+HEADER = b'\xff\xfb\x10\xc0'
+FRAME = HEADER + bytes(100)
+XING_FRAME = HEADER + bytes(17) + b'Xing' + bytes(100 - 21)
+
+
+@pytest.fixture
+def mp3(both_backends):
+    return both_backends('mp3_utils')
+
+
+def id3v2(payload=b'title'):
+    size = len(payload)
+    return b'ID3\x04\x00\x00' + bytes([0, 0, size >> 7, size & 0x7f]) + payload
+
+
+def test_strips_leading_and_trailing_tags(mp3):
+    tagged = id3v2() + FRAME + b'TAG' + bytes(125)
+    assert mp3.strip_id3(tagged) == FRAME
+
+
+def test_parses_frame_headers(mp3):
+    info = mp3.frame_info(FRAME)
+    assert (info['mpeg1'], info['mono'], info['sample_rate'], info['length']) == (True, True, 44100, 104)
+    assert mp3.frame_info(b'not audio') is None
+
+
+def test_concat_drops_each_clips_vbr_header(mp3):
+    clip = id3v2() + XING_FRAME + FRAME * 2
+    assert mp3.concat_mp3([clip, clip]) == FRAME * 4
+
+
+def test_silence_matches_the_clip_format(mp3):
+    # MPEG-2, 22.05 kHz, joint stereo
+    clip = b'\xff\xf3\x80\x40' + bytes(200)
+    silence = mp3.silence_like(clip, 1.0)
+    info = mp3.frame_info(silence)
+    assert (info['version'], info['sample_rate'], info['channel_byte']) == (2, 22050, 0x40)
+    assert len(silence) // info['length'] == round(22050 / 576)
+
+
+def test_silence_for_unparseable_audio_is_generic(mp3):
+    assert mp3.silence_like(b'junk', 0.5) == mp3.silent_mp3(0.5)
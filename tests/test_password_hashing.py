@@ -0,0 +1,89 @@
+"""
+The bounded password hashing pool in backend/password_hashing.py.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def hashing(fastapi_backend):
+    return fastapi_backend('password_hashing')
+
+
+def test_runs_off_the_event_loop(hashing):
+    async def run():
+        pool = hashing.HashingPool(workers=1, max_queue=0)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        result = await pool.run(lambda: time.sleep(0.2) or threading.current_thread().name)
+        task.cancel()
+        pool.shutdown()
+        return result, ticks, pool.stats()
+
+    thread_name, ticks, stats = asyncio.run(run())
+    assert thread_name.startswith('password-hash')
+    assert ticks >= 5  # The loop kept serving while the hash ran
+    assert (stats['completed'], stats['active'], stats['queued']) == (1, 0, 0)
+
+
+def test_rejects_once_workers_and_queue_are_full(hashing):
+    async def run():
+        pool = hashing.HashingPool(workers=1, max_queue=1)
+        release = threading.Event()
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(hashing.PasswordHashingBusyError) as excinfo:
+            await pool.run(lambda: None)
+        release.set()
+        await asyncio.gather(*running)
+        pool.shutdown()
+        return excinfo.value.retry_after, pool.stats()
+
+    retry_after, stats = asyncio.run(run())
+    assert retry_after >= 1
+    assert (stats['rejected'], stats['completed'], stats['max_queued']) == (1, 2, 2)
+
+
+def test_errors_reach_the_caller(hashing):
+    async def run():
+        pool = hashing.HashingPool(workers=1, max_queue=0)
+        try:
+            await pool.run(lambda: 1 / 0)
+        finally:
+            pool.shutdown()
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(run())
+
+
+def test_a_caller_out_of_budget_leaves_the_queue(hashing, fastapi_backend):
+    deadlines = fastapi_backend('deadlines')
+
+    async def run():
+        pool = hashing.HashingPool(workers=1, max_queue=1)
+        release = threading.Event()
+        busy = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        token = deadlines.start_deadline(0.05)
+        try:
+            with pytest.raises(deadlines.DeadlineExceeded):
+                await pool.run(lambda: None)
+        finally:
+            deadlines.reset_deadline(token)
+        queued = pool.queued
+        release.set()
+        await busy
+        pool.shutdown()
+        return queued
+
+    assert asyncio.run(run()) == 0
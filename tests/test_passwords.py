@@ -0,0 +1,111 @@
+"""
+Verification of every stored hash format and the rehash decision.
+
+Both backends carry a copy of passwords.py; every test runs on each. Costs
+are kept at each scheme's cheapest setting so the suite stays fast.
+"""
+import pytest
+
+bcrypt = pytest.importorskip('bcrypt')
+
+
+@pytest.fixture
+def pw(both_backends):
+    return both_backends('passwords')
+
+
+@pytest.mark.parametrize('method', ['pbkdf2:sha256:1000', 'scrypt:1024:8:1'])
+def test_verifies_werkzeug_hashes(pw, method):
+    security = pytest.importorskip('werkzeug.security')
+    stored = security.generate_password_hash('s3cret', method=method)
+    assert pw.verify('s3cret', stored)
+    assert not pw.verify('wrong', stored)
+
+
+@pytest.mark.parametrize('prefix', [b'2a', b'2b'])
+def test_verifies_bcrypt_hashes(pw, prefix):
+    stored = bcrypt.hashpw(b's3cret', bcrypt.gensalt(rounds=4, prefix=prefix)).decode('utf-8')
+    assert pw.verify('s3cret', stored)
+    assert not pw.verify('wrong', stored)
+
+
+def test_bcrypt_uses_the_first_72_bytes(pw):
+    stored = pw.hash_with(pw.BCRYPT, 4, 'é' * 40)  # 80 bytes; the cut falls inside a character
+    assert pw.verify('é' * 36, stored)
+
+
+@pytest.mark.parametrize('scheme, cost', [('bcrypt', 4), ('pbkdf2:sha256', 1000), ('scrypt', 10)])
+def test_own_hashes_round_trip(pw, scheme, cost):
+    stored = pw.hash_with(scheme, cost, 's3cret')
+    assert pw.identify(stored) == (scheme, cost)
+    assert pw.verify('s3cret', stored)
+    assert not pw.verify('wrong', stored)
+
+
+@pytest.mark.parametrize('stored', [None, '', 'plaintext', '$2b$xx$abc', 'pbkdf2:sha256$salt$hex',
+                                    'scrypt:abc:8:1$salt$hex', 'pbkdf2:sha256:1000$nohash'])
+def test_unrecognized_or_malformed_hashes_never_verify(pw, stored):
+    assert not pw.verify('s3cret', stored)
+
+
+def test_identify_reports_scheme_and_cost(pw):
+    assert pw.identify('$2b$12$' + 'a' * 53) == (pw.BCRYPT, 12)
+    assert pw.identify('pbkdf2:sha256:600000$salt$hex') == (pw.PBKDF2, 600000)
+    assert pw.identify('scrypt:32768:8:1$salt$hex') == (pw.SCRYPT, 15)
+    assert pw.identify('md5$salt$hex') == (None, 0)
+
+
+@pytest.mark.parametrize('stored, outdated', [
+    ('$2b$11$' + 'a' * 53, True),           # Lower cost
+    ('$2b$12$' + 'a' * 53, False),          # Same cost
+    ('$2b$13$' + 'a' * 53, False),          # Higher cost is kept
+    ('pbkdf2:sha256:600000$salt$hex', True),  # Other scheme
+    (None, True),
+])
+def test_needs_rehash(pw, stored, outdated):
+    assert pw.PasswordHasher(pw.BCRYPT, 12).needs_rehash(stored) is outdated
+
+
+def test_verify_and_update_upgrades_outdated_hashes(pw):
+    hasher = pw.PasswordHasher(pw.BCRYPT, 5)
+    valid, new_hash = hasher.verify_and_update('s3cret', pw.hash_with(pw.PBKDF2, 1000, 's3cret'))
+    assert valid
+    assert pw.identify(new_hash) == (pw.BCRYPT, 5)
+    assert pw.verify('s3cret', new_hash)
+
+
+def test_verify_and_update_keeps_current_hashes(pw):
+    hasher = pw.PasswordHasher(pw.BCRYPT, 4)
+    assert hasher.verify_and_update('s3cret', hasher.hash('s3cret')) == (True, None)
+
+
+def test_verify_and_update_rejects_wrong_passwords(pw):
+    hasher = pw.PasswordHasher(pw.BCRYPT, 4)
+    assert hasher.verify_and_update('wrong', hasher.hash('s3cret')) == (False, None)
+
+
+def test_unknown_scheme_is_rejected(pw):
+    with pytest.raises(ValueError):
+        pw.PasswordHasher('md5')
+
+
+def test_calibrate_picks_the_highest_cost_within_target(pw, monkeypatch):
+    monkeypatch.setattr(pw, '_time_hash', lambda scheme, cost: 40.0 * 2 ** (cost - 10))
+    cost, timings = pw.calibrate(pw.BCRYPT, 250)
+    assert cost == 12  # 160ms; 13 would take 320ms
+    assert timings[12] == 160
+
+
+def test_calibrate_never_goes_below_the_floor(pw, monkeypatch):
+    monkeypatch.setattr(pw, '_time_hash', lambda scheme, cost: 1000.0)
+    assert pw.calibrate(pw.BCRYPT, 250)[0] == pw.MIN_COST[pw.BCRYPT]
+
+
+def test_calibrate_caps_scrypt_by_memory(pw, monkeypatch):
+    monkeypatch.setattr(pw, '_time_hash', lambda scheme, cost: 1.0)
+    assert pw.calibrate(pw.SCRYPT, 250)[0] == pw.MAX_COST[pw.SCRYPT] == 17
+
+
+def test_calibrate_scales_pbkdf2_iterations_linearly(pw, monkeypatch):
+    monkeypatch.setattr(pw, '_time_hash', lambda scheme, cost: cost / 1000)
+    assert pw.calibrate(pw.PBKDF2, 250)[0] == 250000
@@ -0,0 +1,319 @@
+"""
+Query-plan regression gate for the hot MongoDB queries.
+
+Seeds a scratch database per backend on a local mongod, applies each
+backend's index registry (db_indexes.py) and runs explain() on every hot
+query shape. A shape fails when its winning plan stops using the expected
+index, falls back to a COLLSCAN or a blocking SORT, or examines more than
+EXAMINED_PER_RETURNED documents per document returned.
+
+Shapes are captured from the real models.py calls and server.py handlers
+through a command listener, so changing a filter there is checked as
+written. Queries issued from app.py cannot be captured without importing
+the whole Flask app, so those shapes are listed here and must be kept in
+step with the code.
+
+The tests are skipped when no mongod is reachable. Point them at one with
+QUERY_PLAN_MONGO_URL (default mongodb://localhost:27017). The server.py
+shapes are also skipped when server.py's own dependencies are missing.
+"""
+import asyncio
+import difflib
+import os
+import sys
+import uuid
+
+import pytest
+
+pymongo = pytest.importorskip('pymongo')
+from pymongo import monitoring  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+from tests import ROOT, load_module  # noqa: E402
+
+MONGO_URL = os.environ.get('QUERY_PLAN_MONGO_URL', 'mongodb://localhost:27017')
+
+EXAMINED_PER_RETURNED = 2
+COURSES = 40
+LESSONS_PER_COURSE = 25
+USERS = 2000
+
+# Driver fields that are not part of the query itself
+_SESSION_FIELDS = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'signature'}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keep the query commands a client sends"""
+
+    QUERY_COMMANDS = {'find', 'update', 'delete', 'count', 'aggregate'}
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in self.QUERY_COMMANDS:
+            self.commands.append({k: v for k, v in event.command.items() if k not in _SESSION_FIELDS})
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class Shape:
+    """
+    A query shape and the plan it must get.
+
+    Either `call` runs real app code (Flask models.py, FastAPI server.py
+    handlers) and its commands are recorded, or `command` builds the
+    command the app sends.
+    """
+
+    def __init__(self, name, backend, index, call=None, command=None, index_sort=False):
+        self.name = name
+        self.backend = backend
+        self.index = index
+        self.call = call
+        self.command = command
+        self.index_sort = index_sort  # The sort must come from the index, not a SORT stage
+
+    def __repr__(self):
+        return self.name
+
+
+SHAPES = [
+    # frontend/backend/models.py (recorded)
+    Shape('LessonModel.get_by_course', 'flask', 'courseId_1_order_1', index_sort=True,
+          call=lambda env: env.models.LessonModel.get_by_course(env.seed['course_id'])),
+    Shape('LessonModel.get_by_id', 'flask', '_id_',
+          call=lambda env: env.models.LessonModel.get_by_id(env.seed['lesson_id'])),
+    Shape('CourseModel.get_by_id', 'flask', '_id_',
+          call=lambda env: env.models.CourseModel.get_by_id(env.seed['course_id'])),
+    Shape('VideoModel.get_by_course', 'flask', 'courseId_1',
+          call=lambda env: env.models.VideoModel.get_by_course(env.seed['course_id'])),
+    Shape('VideoModel.get_by_lesson', 'flask', 'lessonId_1',
+          call=lambda env: env.models.VideoModel.get_by_lesson(env.seed['lesson_id'])),
+    Shape('QuizModel.get_by_course', 'flask', 'courseId_1',
+          call=lambda env: env.models.QuizModel.get_by_course(env.seed['course_id'])),
+    Shape('QuizModel.get_by_lesson', 'flask', 'lessonId_1',
+          call=lambda env: env.models.QuizModel.get_by_lesson(env.seed['lesson_id'])),
+    # frontend/backend/app.py
+    Shape('app.login email lookup', 'flask', 'email_1',
+          command=lambda env: {'find': 'users', 'filter': {'email': env.seed['email']}, 'limit': 1,
+                               'singleBatch': True}),
+    Shape('app.save_progress upsert', 'flask', 'userId_1_courseId_1',
+          command=lambda env: {'update': 'student_progress', 'updates': [{
+              'q': {'userId': env.seed['user_id'], 'courseId': env.seed['course_id']},
+              'u': {'$set': {'progress': 50}}, 'upsert': True}]}),
+    # backend/server.py (recorded)
+    Shape('server.get_current_user', 'fastapi', 'id_1',
+          call=lambda env: env.run_handler(env.server.get_current_user(env.server.HTTPAuthorizationCredentials(
+              scheme='Bearer', credentials=env.server.create_access_token({'sub': env.seed['user_id']}))))),
+    Shape('server.login email lookup', 'fastapi', 'email_1',
+          call=lambda env: env.run_handler(env.server.login(
+              env.server.UserLogin(email=env.seed['email'], password='not-the-password')))),
+    Shape('server.get_course', 'fastapi', 'id_1',
+          call=lambda env: env.run_handler(env.server.get_course(env.seed['server_course_id']))),
+    Shape('server.get_course_lessons', 'fastapi', 'course_id_1_order_1', index_sort=True,
+          call=lambda env: env.run_handler(env.server.get_course_lessons(env.seed['server_course_id']))),
+    Shape('server.get_lesson', 'fastapi', 'id_1',
+          call=lambda env: env.run_handler(env.server.get_lesson(env.seed['server_lesson_id']))),
+]
+
+
+def seed_flask(db):
+    """Courses, lessons, videos, quizzes, users and progress in the Flask schema"""
+    course_ids = [str(i) for i in db.courses.insert_many(
+        [{'title': f'Course {i}'} for i in range(COURSES)]).inserted_ids]
+    lessons = [{'courseId': course_id, 'order': order, 'title': f'Lesson {order}'}
+               for course_id in course_ids for order in reversed(range(LESSONS_PER_COURSE))]
+    lesson_ids = [str(i) for i in db.lessons.insert_many(lessons).inserted_ids]
+    for collection in (db.videos, db.quizzes):
+        collection.insert_many([{'courseId': lesson['courseId'], 'lessonId': lesson_id, 'title': 'x'}
+                                for lesson, lesson_id in zip(lessons, lesson_ids)])
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    db.users.insert_many([{'_id': user_id, 'email': f'user{i}@example.com'} for i, user_id in enumerate(user_ids)])
+    db.student_progress.insert_many([{'userId': user_id, 'courseId': course_id, 'progress': 10}
+                                     for user_id in user_ids[:500] for course_id in course_ids[:4]])
+    # Probe the last documents inserted so an early-stopping scan cannot look cheap
+    return {'course_id': course_ids[-1], 'lesson_id': lesson_ids[-1],
+            'user_id': user_ids[499], 'email': f'user{USERS - 1}@example.com'}
+
+
+def seed_fastapi(db):
+    """Users, courses and lessons in the FastAPI schema"""
+    course_ids = [f'course-{i}' for i in range(COURSES)]
+    db.courses.insert_many([{'id': course_id} for course_id in course_ids])
+    db.lessons.insert_many([{'id': f'{course_id}-lesson-{order}', 'course_id': course_id, 'order': order}
+                            for course_id in course_ids for order in reversed(range(LESSONS_PER_COURSE))])
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    db.users.insert_many([{'id': user_id, 'email': f'user{i}@example.com'} for i, user_id in enumerate(user_ids)])
+    return {'server_course_id': course_ids[-1], 'server_lesson_id': f'{course_ids[-1]}-lesson-0',
+            'user_id': user_ids[-1], 'email': f'user{USERS - 1}@example.com'}
+
+
+def apply_registry(db, indexes):
+    for spec in indexes:
+        db[spec.collection].create_index(spec.keys, **spec.options())
+
+
+def load_server(db_name):
+    """Import backend/server.py against the scratch database; returns (module, error)"""
+    backend_dir = str(ROOT / 'backend')
+    sys.path.insert(0, backend_dir)
+    try:
+        with pytest.MonkeyPatch.context() as env:
+            env.setenv('MONGO_URL', MONGO_URL)
+            env.setenv('DB_NAME', db_name)
+            return load_module('fastapi_server', ROOT / 'backend' / 'server.py'), None
+    except ImportError as e:
+        return None, e
+    finally:
+        sys.path.remove(backend_dir)
+
+
+class PlanEnv:
+    def __init__(self, client, flask_db, fastapi_db, models, recorder, flask_seed, fastapi_seed,
+                 server=None, server_error=None, loop=None):
+        self.client = client
+        self.dbs = {'flask': flask_db, 'fastapi': fastapi_db}
+        self.models = models
+        self.recorder = recorder
+        self.seeds = {'flask': flask_seed, 'fastapi': fastapi_seed}
+        self.seed = None
+        self.server = server
+        self.server_error = server_error
+        self.loop = loop
+
+    def run_handler(self, coro):
+        """Run a server.py handler; only the queries it sends matter"""
+        try:
+            self.loop.run_until_complete(coro)
+        except Exception:
+            pass  # Seed documents are not full models, so building the response may fail
+
+    def commands_for(self, shape):
+        self.seed = self.seeds[shape.backend]
+        if shape.command:
+            return [shape.command(self)]
+        if shape.backend == 'fastapi' and self.server is None:
+            pytest.skip(f'backend/server.py cannot be imported here: {self.server_error}')
+        self.recorder.commands.clear()
+        shape.call(self)
+        return list(self.recorder.commands)
+
+
+@pytest.fixture(scope='module')
+def plan_env():
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f'No mongod at {MONGO_URL}: {e}')
+
+    suffix = uuid.uuid4().hex[:8]
+    flask_db = client[f'plan_test_flask_{suffix}']
+    fastapi_db = client[f'plan_test_fastapi_{suffix}']
+    flask_indexes = load_module('flask_db_indexes', ROOT / 'frontend' / 'backend' / 'db_indexes.py')
+    fastapi_indexes = load_module('fastapi_db_indexes', ROOT / 'backend' / 'db_indexes.py')
+
+    recorder = CommandRecorder()
+    recorded_client = pymongo.MongoClient(MONGO_URL, event_listeners=[recorder])
+    loop = asyncio.new_event_loop()
+    motor_client = None
+    try:
+        flask_seed = seed_flask(flask_db)
+        fastapi_seed = seed_fastapi(fastapi_db)
+        apply_registry(flask_db, flask_indexes.INDEXES)
+        apply_registry(fastapi_db, fastapi_indexes.INDEXES)
+
+        # Run models.py against the scratch database through the recording client
+        models = load_module('flask_models', ROOT / 'frontend' / 'backend' / 'models.py')
+        models.client.close()
+        recorded_db = recorded_client[flask_db.name]
+        for name in ('courses', 'lessons', 'videos', 'quizzes', 'student_progress'):
+            setattr(models, f'{name}_collection', recorded_db[name])
+
+        # Run the server.py handlers against it through a recording motor client
+        server, server_error = load_server(fastapi_db.name)
+        if server is not None:
+            async def recording_motor_client():
+                return server.AsyncIOMotorClient(MONGO_URL, event_listeners=[recorder])
+
+            motor_client = loop.run_until_complete(recording_motor_client())
+            server.client.close()
+            server.db = motor_client[fastapi_db.name]
+            server.user_cache.max_entries = 0  # Every get_current_user must reach the database
+
+        yield PlanEnv(client, flask_db, fastapi_db, models, recorder, flask_seed, fastapi_seed,
+                      server, server_error, loop)
+    finally:
+        client.drop_database(flask_db.name)
+        client.drop_database(fastapi_db.name)
+        if motor_client is not None:
+            motor_client.close()
+        loop.close()
+        recorded_client.close()
+        client.close()
+
+
+def plan_rows(explain):
+    """Flatten the winning plan into (depth, stage, index name) rows"""
+    plan = explain['queryPlanner']['winningPlan']
+    plan = plan.get('queryPlan', plan)  # Slot-based engine wraps the classic plan
+    rows = []
+
+    def walk(node, depth):
+        index = node.get('indexName') or ('_id_' if node.get('stage') == 'IDHACK' else None)
+        rows.append((depth, node.get('stage', '?'), index))
+        children = [node['inputStage']] if 'inputStage' in node else []
+        for child in children + node.get('inputStages', []):
+            walk(child, depth + 1)
+
+    walk(plan, 0)
+    return rows
+
+
+def plan_facts(rows, examined, bound):
+    """The properties a shape is judged on, one per line, for diffing"""
+    stages = {stage for _, stage, _ in rows}
+    indexes = sorted({index for _, _, index in rows if index})
+    return [
+        f"index: {', '.join(indexes) or 'none'}",
+        f"collection scan: {'yes' if 'COLLSCAN' in stages else 'no'}",
+        f"blocking sort: {'yes' if 'SORT' in stages else 'no'}",
+        f"docs examined within bound ({bound}): {'yes' if examined <= bound else f'no, {examined}'}",
+    ]
+
+
+@pytest.mark.parametrize('shape', SHAPES, ids=repr)
+def test_query_shape_uses_expected_plan(plan_env, shape):
+    db = plan_env.dbs[shape.backend]
+    commands = plan_env.commands_for(shape)
+    assert commands, f'{shape.name} sent no query'
+
+    for command in commands:
+        explain = db.command('explain', command, verbosity='executionStats')
+        stats = explain['executionStats']
+        bound = max(stats['nReturned'], 1) * EXAMINED_PER_RETURNED
+        rows = plan_rows(explain)
+        actual = plan_facts(rows, stats['totalDocsExamined'], bound)
+
+        expected_rows = [(0, 'IXSCAN', shape.index)]
+        expected = plan_facts(expected_rows, 0, bound)
+        if not shape.index_sort:
+            # Only shapes with a sort are required to get it from the index
+            expected[2] = actual[2]
+
+        if actual != expected:
+            tree = '\n'.join(f"    {'  ' * depth}{stage}{f' [{index}]' if index else ''}"
+                             for depth, stage, index in rows)
+            diff = '\n'.join(f'    {line}' for line in difflib.ndiff(expected, actual) if line[0] in '-+')
+            pytest.fail(
+                f'{shape.name} regressed\n'
+                f'  command: {command}\n'
+                f'  plan diff (- expected, + actual):\n{diff}\n'
+                f'  winning plan:\n{tree}',
+                pytrace=False,
+            )
@@ -0,0 +1,89 @@
+"""
+Token-bucket refill and the client refund in frontend/backend/rate_limit.py.
+"""
+import pytest
+
+from tests import ROOT, load_module
+
+pytest.importorskip('pymongo')
+rate_limit = load_module('rate_limit_under_test', ROOT / 'frontend' / 'backend' / 'rate_limit.py')
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(clock):
+    clock.install(rate_limit)
+
+
+def make_limiter(store=None, client_burst=5, global_burst=2):
+    # No refill, so the buckets only change when the test spends or refunds
+    return rate_limit.TokenBucketLimiter(store or rate_limit.LocalBucketStore(), client_burst=client_burst,
+                                         client_per_minute=0, global_burst=global_burst, global_per_minute=0)
+
+
+def test_bucket_starts_full_and_refuses_when_empty():
+    store = rate_limit.LocalBucketStore()
+    assert store.take('k', 2, capacity=3, refill_per_second=1) == (True, 1)
+    assert store.take('k', 2, capacity=3, refill_per_second=1) == (False, 1)
+
+
+def test_bucket_refills_with_elapsed_time(clock):
+    store = rate_limit.LocalBucketStore()
+    store.take('k', 3, capacity=3, refill_per_second=0.5)
+    clock.advance(2)
+    assert store.take('k', 1, capacity=3, refill_per_second=0.5) == (True, 0)
+    assert store.take('k', 1, capacity=3, refill_per_second=0.5) == (False, 0)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    store = rate_limit.LocalBucketStore()
+    store.take('k', 1, capacity=3, refill_per_second=1)
+    clock.advance(3600)
+    assert store.take('k', 0, capacity=3, refill_per_second=1) == (True, 3)
+
+
+def test_refund_is_capped_at_capacity():
+    store = rate_limit.LocalBucketStore()
+    store.take('k', 1, capacity=3, refill_per_second=0)
+    store.refund('k', 5, capacity=3)
+    assert store.take('k', 0, capacity=3, refill_per_second=0) == (True, 3)
+
+
+def test_client_is_refunded_when_the_global_bucket_refuses():
+    limiter = make_limiter(global_burst=1)
+    assert limiter.check('alice', 1, synthesis_cost=1).allowed
+
+    result = limiter.check('alice', 1, synthesis_cost=1)
+    assert not result.allowed
+    assert result.limit == 1  # Reported against the global bucket
+    assert limiter.store.take('client:alice', 0, 5, 0) == (True, 4)
+    assert limiter.stats()['limited_global'] == 1
+
+
+def test_limited_client_does_not_spend_global_tokens():
+    limiter = make_limiter(client_burst=1)
+    limiter.check('alice', 1, synthesis_cost=1)
+    assert not limiter.check('alice', 1, synthesis_cost=1).allowed
+    assert limiter.check('bob', 1, synthesis_cost=1).allowed
+    assert limiter.stats()['limited_client'] == 1
+
+
+def test_cache_hits_skip_the_global_bucket():
+    limiter = make_limiter(global_burst=0)
+    assert limiter.check('alice', 0.1).allowed
+
+
+def test_store_outage_allows_the_request():
+    class BrokenStore:
+        def take(self, *args):
+            raise ConnectionError('store down')
+
+    limiter = make_limiter(BrokenStore())
+    assert limiter.check('alice', 1, synthesis_cost=1).allowed
+    assert limiter.stats()['errors'] == 1
+
+
+def test_headers_report_retry_after_when_limited():
+    result = rate_limit.RateLimitResult(False, limit=5, remaining=0.5, refill_per_second=0.5, cost=1)
+    headers = result.headers()
+    assert headers['Retry-After'] == '1'
+    assert headers['RateLimit-Remaining'] == '0'
@@ -0,0 +1,99 @@
+"""
+Admission control for TTS synthesis: the thread-based controller in
+frontend/backend and the asyncio one in backend.
+"""
+import asyncio
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def flask_admission(flask_backend):
+    return flask_backend('tts_admission')
+
+
+@pytest.fixture
+def fastapi_admission(fastapi_backend):
+    return fastapi_backend('tts_admission')
+
+
+def hold(controller, count):
+    """Occupy `count` slots from background threads; returns the release event"""
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+
+    def worker():
+        with controller.admit():
+            entered.release()
+            release.wait(5)
+
+    for _ in range(count):
+        threading.Thread(target=worker, daemon=True).start()
+        assert entered.acquire(timeout=5)
+    return release
+
+
+def test_rejects_at_once_when_slots_and_queue_are_full(flask_admission):
+    controller = flask_admission.AdmissionController(limit=1, max_queue=0, queue_timeout=5)
+    release = hold(controller, 1)
+    with pytest.raises(flask_admission.TTSOverloadedError) as excinfo:
+        with controller.admit():
+            pass
+    release.set()
+    assert excinfo.value.retry_after >= 1
+    assert controller.stats()['rejected'] == 1
+
+
+def test_queued_caller_times_out(flask_admission):
+    controller = flask_admission.AdmissionController(limit=1, max_queue=1, queue_timeout=0.05)
+    release = hold(controller, 1)
+    with pytest.raises(flask_admission.TTSOverloadedError, match='Timed out'):
+        with controller.admit():
+            pass
+    release.set()
+    assert controller.stats()['timed_out'] == 1
+    assert controller.waiting == 0
+
+
+def test_queued_caller_gets_the_freed_slot(flask_admission):
+    controller = flask_admission.AdmissionController(limit=1, max_queue=1, queue_timeout=5)
+    release = hold(controller, 1)
+    threading.Timer(0.05, release.set).start()
+    with controller.admit():
+        assert controller.active == 1
+    assert controller.stats()['admitted'] == 2
+
+
+def test_overloaded_matches_what_admit_would_do(flask_admission):
+    controller = flask_admission.AdmissionController(limit=1, max_queue=0, queue_timeout=5)
+    assert not controller.overloaded()
+    release = hold(controller, 1)
+    assert controller.overloaded()
+    release.set()
+
+
+def test_async_controller_sheds_and_times_out(fastapi_admission):
+    async def run():
+        controller = fastapi_admission.AdmissionController(limit=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def holder():
+            async with controller.admit():
+                await release.wait()
+
+        task = asyncio.ensure_future(holder())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(controller.admit().__aenter__())
+        await asyncio.sleep(0.01)
+        with pytest.raises(fastapi_admission.TTSOverloadedError, match='backlog is full'):
+            async with controller.admit():
+                pass
+        with pytest.raises(fastapi_admission.TTSOverloadedError, match='Timed out'):
+            await waiter
+        release.set()
+        await task
+        return controller.stats()
+
+    stats = asyncio.run(run())
+    assert (stats['admitted'], stats['rejected'], stats['timed_out'], stats['active']) == (1, 1, 1, 0)
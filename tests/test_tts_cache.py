@@ -0,0 +1,132 @@
+"""
+The disk audio cache in frontend/backend/tts_cache.py.
+"""
+import pytest
+
+
+@pytest.fixture
+def tts_cache(flask_backend):
+    return flask_backend('tts_cache')
+
+
+def make_cache(tts_cache, tmp_path, max_bytes=1000):
+    return tts_cache.AudioCache(str(tmp_path / 'cache'), max_bytes=max_bytes)
+
+
+def test_keys_ignore_whitespace_and_unicode_form(tts_cache):
+    composed = tts_cache.make_cache_key('caf\u00e9  au lait ', 'EN', False, 'gtts')
+    decomposed = tts_cache.make_cache_key('cafe\u0301 au\tlait', 'en', False, 'gtts')
+    assert composed == decomposed
+
+
+@pytest.mark.parametrize('change', [
+    dict(text='Bye'), dict(lang='ta'), dict(slow=True), dict(engine='piper'),
+])
+def test_keys_differ_by_every_synthesis_input(tts_cache, change):
+    request = dict(text='Hi', lang='en', slow=False, engine='gtts')
+    assert tts_cache.make_cache_key(**request) != tts_cache.make_cache_key(**dict(request, **change))
+
+
+def test_evicts_least_recently_used_first(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path, max_bytes=250)
+    cache.put('aa01', b'x' * 100)
+    cache.put('aa02', b'x' * 100)
+    assert cache.get('aa01') is not None  # Now more recent than aa02
+    cache.put('aa03', b'x' * 100)
+    assert cache.contains('aa01') and cache.contains('aa03')
+    assert not cache.contains('aa02')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_counts_hits_per_tier_and_misses(tts_cache, tmp_path):
+    cache = tts_cache.AudioCache(str(tmp_path / 'cache'), max_bytes=1000, memory_max_bytes=100)
+    cache.put('aa01', b'x' * 10)
+    cache.put('aa02', b'x' * 500)  # Too big for the memory tier
+    cache.get('aa01')
+    cache.get('aa02')
+    cache.get('aa03')
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['memory_bytes'] == 10
+
+
+def test_index_is_rebuilt_from_disk(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    cache.put('aa01', b'x' * 10)
+    cache.put('bb02', b'x' * 20)
+    restarted = make_cache(tts_cache, tmp_path)
+    assert restarted.stats()['entries'] == 2
+    assert restarted.stats()['disk_bytes'] == 30
+    assert restarted.get('bb02') == b'x' * 20
+
+
+def test_peek_counts_nothing(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    cache.put('aa01', b'x')
+    assert cache.peek('aa01') == b'x'
+    assert cache.peek('aa02') is None
+    stats = cache.stats()
+    assert stats['memory_hits'] + stats['disk_hits'] + stats['misses'] == 0
+
+
+def test_lock_is_exclusive_until_released(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    other = make_cache(tts_cache, tmp_path)
+    assert cache.acquire_lock('aa01', stale_after=60)
+    assert not other.acquire_lock('aa01', stale_after=60)
+    cache.release_lock('aa01')
+    assert other.acquire_lock('aa01', stale_after=60)
+
+
+def test_stale_lock_is_taken_over(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    assert cache.acquire_lock('aa01', stale_after=60)
+    assert make_cache(tts_cache, tmp_path).acquire_lock('aa01', stale_after=0)
+
+
+def test_pinned_clips_survive_eviction(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path, max_bytes=250)
+    cache.put('aa01', b'x' * 100, pinned=True)
+    cache.put('aa02', b'x' * 100)
+    cache.put('aa03', b'x' * 100)
+    assert cache.contains('aa01')
+    assert not cache.contains('aa02')
+
+
+def test_unpin_from_another_process_makes_the_clip_evictable(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path, max_bytes=250)
+    cache.put('aa01', b'x' * 100, pinned=True)
+    make_cache(tts_cache, tmp_path).unpin('aa01')  # e.g. the prerender script
+    cache.put('aa02', b'x' * 100)
+    cache.put('aa03', b'x' * 100)
+    assert not cache.contains('aa01')
+    assert cache.stats()['pinned_entries'] == 0
+
+
+def test_pinned_keys_lists_pins_from_every_process(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    cache.put('aa01', b'x', pinned=True)
+    make_cache(tts_cache, tmp_path).put('bb02', b'x', pinned=True)
+    cache.put('cc03', b'x')
+    assert cache.pinned_keys() == {'aa01', 'bb02'}
+
+
+def test_pin_of_a_missing_clip_fails(tts_cache, tmp_path):
+    cache = make_cache(tts_cache, tmp_path)
+    assert cache.pin('aa01') is False
+    assert cache.pinned_keys() == set()
+
+
+def test_prerender_unpins_clips_for_edited_text(flask_backend):
+    audio_cache = flask_backend('tts_cache').audio_cache
+    prerender = flask_backend('prerender_audio')
+    audio_cache.put('aa01', b'old text', pinned=True)
+    audio_cache.put('bb02', b'current text', pinned=True)
+    jobs = [{'key': 'bb02'}]
+
+    assert prerender.unpin_stale(jobs, dry_run=True) == 1
+    assert audio_cache.pinned_keys() == {'aa01', 'bb02'}
+
+    assert prerender.unpin_stale(jobs) == 1
+    assert audio_cache.pinned_keys() == {'bb02'}
+    assert audio_cache.contains('aa01')  # Evictable now, not deleted
@@ -0,0 +1,58 @@
+"""
+The pooled provider client in backend/tts_client.py, with the SDK stubbed.
+"""
+import asyncio
+import base64
+
+import pytest
+
+pytest.importorskip('emergentintegrations')
+
+
+class FakeSDK:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_speech_base64(self, text, model, voice, speed, response_format):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+
+@pytest.fixture
+def tts_client(fastapi_backend):
+    return fastapi_backend('tts_client')
+
+
+def make_client(tts_client, sdk, pool_size=2, timeout=5.0):
+    client = tts_client.TTSClient('key', 'tts-1', pool_size=pool_size, timeout=timeout)
+    client._tts = sdk
+    return client
+
+
+def test_concurrent_calls_are_capped_at_the_pool_size(tts_client):
+    sdk = FakeSDK(delay=0.05)
+
+    async def run():
+        client = make_client(tts_client, sdk, pool_size=2)
+        return await asyncio.gather(*[client.synthesize(f'clip {i}', 'alloy', 1.0) for i in range(5)])
+
+    assert asyncio.run(run()) == [f'clip {i}'.encode('utf-8') for i in range(5)]
+    assert sdk.peak == 2
+
+
+def test_a_slow_call_times_out_and_frees_its_slot(tts_client):
+    async def run():
+        client = make_client(tts_client, FakeSDK(delay=1.0), pool_size=1, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.synthesize('slow', 'alloy', 1.0)
+        client._tts = FakeSDK()
+        return client.in_flight, await client.synthesize('fast', 'alloy', 1.0)
+
+    assert asyncio.run(run()) == (0, b'fast')
@@ -0,0 +1,50 @@
+"""
+Per-language engine selection in frontend/backend/tts_engines.py.
+"""
+import pytest
+
+pytest.importorskip('gtts')
+
+
+@pytest.fixture
+def engines(flask_backend, monkeypatch):
+    monkeypatch.setenv('TTS_ENGINES', 'en=silent, ta = espeak,bogus')
+    monkeypatch.setenv('TTS_DEFAULT_ENGINE', 'gtts')
+    return flask_backend('tts_engines')
+
+
+def test_languages_map_to_their_configured_engine(engines):
+    assert engines.engine_name_for('en') == 'silent'
+    assert engines.engine_name_for('ta') == 'espeak'
+    assert engines.engine_name_for('fr') == 'gtts'
+
+
+def test_engines_are_shared_per_process(engines):
+    assert engines.engine_for('en') is engines.get_engine('silent')
+
+
+def test_unknown_engine_is_an_engine_error(engines):
+    with pytest.raises(engines.TTSEngineError):
+        engines.get_engine('nope')
+
+
+def test_espeak_without_its_tools_is_an_engine_error(engines, monkeypatch):
+    monkeypatch.setattr(engines.shutil, 'which', lambda tool: None)
+    with pytest.raises(engines.TTSEngineError, match='espeak-ng, ffmpeg'):
+        engines.get_engine('espeak')
+
+
+def test_silent_engine_is_sized_to_the_text(engines):
+    engine = engines.get_engine('silent')
+    short, long = engine.synthesize('Hi there', 'en'), engine.synthesize('Hi there' * 10, 'en')
+    assert len(long) > 5 * len(short)
+    assert len(engine.synthesize('Hi there' * 10, 'en', slow=True)) > len(long)
+    assert not engine.remote
+
+
+def test_the_engine_is_part_of_the_cache_key(flask_backend, monkeypatch):
+    monkeypatch.setenv('TTS_ENGINES', 'ta=silent')
+    service = flask_backend('tts_service')
+    cache = flask_backend('tts_cache')
+    assert service.cache_key_for('Hi', 'ta') == cache.make_cache_key('Hi', 'ta', False, 'silent')
+    assert service.cache_key_for('Hi', 'en') == cache.make_cache_key('Hi', 'en', False, 'gtts')
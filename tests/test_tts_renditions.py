@@ -0,0 +1,72 @@
+"""
+Rendition choice and the fallback to standard audio when transcoding fails.
+
+Both backends carry a tts_renditions.py; the choice tests run on each.
+"""
+import pytest
+
+
+@pytest.fixture
+def renditions(both_backends):
+    return both_backends('tts_renditions')
+
+
+def test_explicit_quality_wins_over_client_hints(renditions):
+    assert renditions.choose_rendition('opus', save_data='on', ect='4g') == 'opus'
+    assert renditions.choose_rendition('standard', ect='2g') == renditions.STANDARD
+
+
+@pytest.mark.parametrize('save_data, ect, expected', [
+    ('on', None, 'low'),
+    (' On ', None, 'low'),
+    (None, 'slow-2g', 'low'),
+    (None, '3g', 'low'),
+    (None, '4g', 'standard'),
+    ('off', None, 'standard'),
+    (None, None, 'standard'),
+])
+def test_client_hints(renditions, save_data, ect, expected):
+    assert renditions.choose_rendition(None, save_data, ect) == expected
+
+
+def test_unknown_quality_is_rejected(renditions):
+    with pytest.raises(ValueError):
+        renditions.choose_rendition('lossless')
+
+
+def test_rendition_keys_are_distinct_per_rendition(renditions):
+    assert renditions.rendition_key('abc', renditions.STANDARD) == 'abc'
+    keys = {renditions.rendition_key('abc', name) for name in ('low', 'opus')}
+    assert len(keys) == 2 and 'abc' not in keys
+
+
+@pytest.fixture
+def tts(flask_backend):
+    pytest.importorskip('gtts')
+    return flask_backend('tts_service')
+
+
+def test_get_rendition_falls_back_to_standard_without_ffmpeg(tts, monkeypatch):
+    monkeypatch.setattr(tts, 'rendition_available', lambda name: name == tts.STANDARD)
+    assert tts.get_rendition('abc', b'mp3', 'low') == (b'mp3', tts.STANDARD)
+
+
+def test_get_rendition_caches_the_transcode(tts, monkeypatch):
+    key = tts.cache_key_for('Hello', 'en')
+    tts.audio_cache.put(key, b'mp3')
+    transcodes = []
+    monkeypatch.setattr(tts, 'rendition_available', lambda name: True)
+    monkeypatch.setattr(tts, 'transcode', lambda audio, name: transcodes.append(name) or b'small')
+
+    assert tts.get_rendition(key, b'mp3', 'low') == (b'small', 'low')
+    assert tts.get_rendition(key, b'mp3', 'low') == (b'small', 'low')
+    assert transcodes == ['low']
+
+
+def test_failed_transcode_serves_standard(tts, monkeypatch):
+    def broken(audio, name):
+        raise OSError('ffmpeg crashed')
+
+    monkeypatch.setattr(tts, 'rendition_available', lambda name: True)
+    monkeypatch.setattr(tts, 'transcode', broken)
+    assert tts.get_rendition('abc', b'mp3', 'opus') == (b'mp3', tts.STANDARD)
@@ -0,0 +1,48 @@
+"""
+Hit/miss accounting in backend/tts_store.py, against a minimal in-memory
+stand-in for the motor collection.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests import ROOT, load_module
+
+pytest.importorskip('pymongo')
+
+
+class FakeCollection:
+    """Just enough of a motor collection for TTSResultStore.get"""
+
+    def __init__(self, name='tts_cache'):
+        self.name = name
+        self.docs = {}
+        self.database = {f'{name}_locks': None}
+
+    async def find_one_and_update(self, query, update, projection=None):
+        doc = self.docs.get(query['_id'])
+        if doc is None or doc['expires_at'] <= query['expires_at']['$gt']:
+            return None
+        doc.update(update['$set'])
+        return doc
+
+
+@pytest.fixture
+def store():
+    tts_store = load_module('tts_store_under_test', ROOT / 'backend' / 'tts_store.py')
+    collection = FakeCollection()
+    collection.docs['cached'] = {'audio': b'mp3', 'expires_at': datetime.utcnow() + timedelta(hours=1)}
+    return tts_store.TTSResultStore(collection, ttl_seconds=3600, max_entries=100)
+
+
+def test_top_level_lookups_are_counted(store):
+    assert asyncio.run(store.get('cached')) == b'mp3'
+    assert asyncio.run(store.get('missing')) is None
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_lookups_on_behalf_of_another_are_not_counted(store):
+    assert asyncio.run(store.get('cached', count=False)) == b'mp3'
+    assert asyncio.run(store.get('missing', count=False)) is None
+    assert (store.hits, store.misses) == (0, 0)
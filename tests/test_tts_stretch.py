@@ -0,0 +1,40 @@
+"""
+Speed derivation settings in backend/tts_stretch.py.
+"""
+import math
+
+import pytest
+
+
+@pytest.fixture
+def stretch(fastapi_backend):
+    return fastapi_backend('tts_stretch')
+
+
+def chain_factors(chain):
+    return [float(part.split('=')[1]) for part in chain.split(',')]
+
+
+@pytest.mark.parametrize('speed', [0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0])
+def test_atempo_chain_multiplies_to_the_speed_within_range(stretch, speed):
+    factors = chain_factors(stretch._atempo_chain(speed))
+    assert math.prod(factors) == pytest.approx(speed, rel=1e-3)
+    assert all(0.5 <= factor <= 2.0 for factor in factors)
+
+
+def test_in_range_speed_is_one_filter(stretch):
+    assert stretch._atempo_chain(1.25) == 'atempo=1.2500'
+
+
+@pytest.mark.parametrize('setting', ['0', 'false', 'No'])
+def test_derivation_can_be_turned_off(stretch, monkeypatch, setting):
+    monkeypatch.setenv('TTS_DERIVE_SPEEDS', setting)
+    monkeypatch.setattr(stretch.shutil, 'which', lambda tool: '/usr/bin/ffmpeg')
+    assert stretch.stretch_enabled() is False
+
+
+def test_derivation_needs_ffmpeg(stretch, monkeypatch):
+    monkeypatch.delenv('TTS_DERIVE_SPEEDS', raising=False)
+    monkeypatch.setattr(stretch.shutil, 'which', lambda tool: None)
+    assert stretch.stretch_enabled() is False
+
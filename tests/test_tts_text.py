@@ -0,0 +1,32 @@
+"""
+Sentence splitting and chunk packing in frontend/backend/tts_text.py.
+"""
+import pytest
+
+
+@pytest.fixture
+def tts_text(flask_backend):
+    return flask_backend('tts_text')
+
+
+def test_splits_at_terminal_punctuation_and_line_breaks(tts_text):
+    text = 'Plants need light. Do they need water?  Yes!\n- Roots\n- Leaves'
+    assert tts_text.split_sentences(text) == ['Plants need light.', 'Do they need water?', 'Yes!', 'Roots', 'Leaves']
+
+
+def test_tamil_danda_ends_a_sentence(tts_text):
+    assert tts_text.split_sentences('தாவரங்கள் வளரும்। நீர் தேவை॥ சரி') == ['தாவரங்கள் வளரும்।', 'நீர் தேவை॥', 'சரி']
+
+
+def test_closing_quote_stays_with_its_sentence(tts_text):
+    assert tts_text.split_sentences('He said "stop." Then left.') == ['He said "stop."', 'Then left.']
+
+
+def test_long_sentences_break_at_clauses_then_words(tts_text):
+    chunks = tts_text.split_sentences('one two three, four five six seven eight', max_chars=15)
+    assert chunks == ['one two three,', 'four five six', 'seven eight']
+    assert all(len(chunk) <= 15 for chunk in chunks)
+
+
+def test_blank_text_has_no_sentences(tts_text):
+    assert tts_text.split_sentences(' \n\n ') == []
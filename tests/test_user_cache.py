@@ -0,0 +1,86 @@
+"""
+UserCache expiry, eviction and the version check that keeps a read which
+raced an invalidation from re-caching the old document.
+
+Both backends carry a user_cache.py; every test runs on each.
+"""
+import pytest
+
+pytest.importorskip('pymongo')
+
+
+@pytest.fixture
+def uc(both_backends, clock):
+    return clock.install(both_backends('user_cache'))
+
+
+def cached(cache, user_id, doc):
+    cache.put(user_id, doc, cache.version(user_id))
+
+
+def test_put_then_get(uc):
+    cache = uc.UserCache(max_entries=10, ttl_seconds=60)
+    cached(cache, 'u1', {'name': 'Asha'})
+    assert cache.get('u1') == {'name': 'Asha'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_expire(uc, clock):
+    cache = uc.UserCache(max_entries=10, ttl_seconds=60)
+    cached(cache, 'u1', {'name': 'Asha'})
+    clock.advance(60)
+    assert cache.get('u1') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_is_evicted(uc):
+    cache = uc.UserCache(max_entries=2, ttl_seconds=60)
+    cached(cache, 'u1', {'n': 1})
+    cached(cache, 'u2', {'n': 2})
+    cache.get('u1')
+    cached(cache, 'u3', {'n': 3})
+    assert cache.get('u2') is None
+    assert cache.get('u1') == {'n': 1}
+
+
+def test_disabled_cache_stores_nothing(uc):
+    cache = uc.UserCache(max_entries=0, ttl_seconds=60)
+    cached(cache, 'u1', {'n': 1})
+    assert cache.get('u1') is None
+
+
+def test_read_that_raced_an_invalidation_is_dropped(uc):
+    cache = uc.UserCache(max_entries=10, ttl_seconds=60)
+    version = cache.version('u1')  # Read starts
+    cache.evict('u1')              # Profile update lands meanwhile
+    cache.put('u1', {'name': 'old'}, version)
+    assert cache.get('u1') is None
+
+    cached(cache, 'u1', {'name': 'new'})
+    assert cache.get('u1') == {'name': 'new'}
+
+
+def test_invalidation_only_affects_its_user(uc):
+    cache = uc.UserCache(max_entries=10, ttl_seconds=60)
+    version = cache.version('u1')
+    cache.evict('u2')
+    cache.put('u1', {'name': 'Asha'}, version)
+    assert cache.get('u1') == {'name': 'Asha'}
+
+
+def test_read_that_raced_a_clear_is_dropped(uc):
+    cache = uc.UserCache(max_entries=10, ttl_seconds=60)
+    version = cache.version('u1')
+    cache.clear()  # Invalidation feed broke; events may have been missed
+    cache.put('u1', {'name': 'old'}, version)
+    assert cache.get('u1') is None
+
+
+def test_read_that_raced_a_version_reset_is_dropped(uc):
+    cache = uc.UserCache(max_entries=1, ttl_seconds=60)
+    version = cache.version('u1')
+    cache.evict('u1')
+    for user_id in ('u2', 'u3'):
+        cache.evict(user_id)  # Enough ids to reset the version table, so u1 is back at 0
+    cache.put('u1', {'name': 'old'}, version)
+    assert cache.get('u1') is None